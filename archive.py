@@ -0,0 +1,144 @@
+"""
+Snapshot Archive
+Scrape sırasında görülen liste, modal ve detay sayfası HTML'lerini içerik adresli, sıkıştırılmış ve tekilleştirilmiş olarak saklar.
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+
+ARCHIVE_SCHEMA = """
+-- Run başına arşivlenen sayfalar; HTML'in kendisi `digest` adıyla arşiv dizininde durur
+CREATE TABLE IF NOT EXISTS page_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    provider_key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    url TEXT,
+    position INTEGER,
+    digest TEXT NOT NULL,
+    captured_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_run ON page_snapshots (run_id);
+CREATE INDEX IF NOT EXISTS idx_snapshots_url ON page_snapshots (url, id);
+"""
+
+SNAPSHOT_KINDS = ('listing', 'modal', 'detail')
+
+
+def snapshot_path(root, digest: str) -> Path:
+    """Where the snapshot `digest` lives under the archive directory `root`."""
+    return Path(root) / "objects" / digest[:2] / f"{digest}.html.gz"
+
+
+def read_snapshot(root, digest: str) -> str:
+    """Archived HTML of `digest`; needs no database, so offline worker processes can call it."""
+    return gzip.decompress(snapshot_path(root, digest).read_bytes()).decode('utf-8')
+
+
+class SnapshotArchive:
+    """Content-addressed store of gzip-compressed HTML snapshots with a per-run manifest in SQLite.
+
+    Identical pages (same SHA-256) are written once however many runs saw them.
+    """
+
+    def __init__(self, root: str = "archive", database: str = "tarifeler.db", compression_level: int = 6):
+        self.root = Path(root)
+        self.database = database
+        self.compression_level = compression_level
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(ARCHIVE_SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Build the archive from the `archive` section of config.json; None when it is disabled."""
+        settings = config.get('archive', {})
+        if not settings.get('enabled', False):
+            return None
+        return cls(settings.get('path', 'archive'), config.get('database', 'tarifeler.db'),
+                   settings.get('compression_level', 6))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def put(self, html: str) -> str:
+        """Store `html` unless an identical page is already archived; returns its digest."""
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = snapshot_path(self.root, digest)
+        if path.exists():
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Yarım yazılmış dosya görünmesin diye önce geçici dosyaya yaz
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(data, self.compression_level))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return digest
+
+    def get(self, digest: str) -> str:
+        """The archived HTML of `digest`."""
+        return read_snapshot(self.root, digest)
+
+    def last_digest(self, url: str):
+        """Digest of the newest archived snapshot of `url`, or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT digest FROM page_snapshots WHERE url = ? ORDER BY id DESC LIMIT 1", (url,)
+            ).fetchone()
+        return row['digest'] if row else None
+
+    def save_manifest(self, run_id: int, provider_key: str, entries: list[dict]):
+        """Record which snapshots (`kind`, `url`, `position`, `digest`) belong to a run."""
+        captured_at = datetime.now().isoformat()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO page_snapshots (run_id, provider_key, kind, url, position, digest, captured_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, provider_key, e['kind'], e.get('url'), e.get('position'), e['digest'], captured_at)
+                 for e in entries]
+            )
+
+    def runs(self, provider_key: str = None, run_id: int = None, limit: int = None) -> list[dict]:
+        """Archived runs, newest first: [{run_id, provider_key, captured_at, entries}]."""
+        query = "SELECT * FROM page_snapshots WHERE 1 = 1"
+        params = []
+        if provider_key:
+            query += " AND provider_key = ?"
+            params.append(provider_key)
+        if run_id is not None:
+            query += " AND run_id = ?"
+            params.append(run_id)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query + " ORDER BY run_id DESC, id", params).fetchall()
+        runs = {}
+        for row in rows:
+            run = runs.get(row['run_id'])
+            if run is None:
+                if limit is not None and len(runs) >= limit:
+                    break
+                run = runs[row['run_id']] = {
+                    'run_id': row['run_id'], 'provider_key': row['provider_key'],
+                    'captured_at': row['captured_at'], 'entries': [],
+                }
+            run['entries'].append({'kind': row['kind'], 'url': row['url'], 'position': row['position'],
+                                   'digest': row['digest']})
+        return list(runs.values())
+
+    def stats(self) -> dict:
+        """Number of distinct snapshots and their compressed size on disk."""
+        files = list((self.root / "objects").glob("*/*.html.gz"))
+        return {'objects': len(files), 'bytes': sum(f.stat().st_size for f in files)}
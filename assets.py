@@ -0,0 +1,63 @@
+"""
+Assets
+Dashboard dosyalarını açılışta bir kez okuyup sıkıştırılmış halleriyle bellekte tutar.
+"""
+
+import gzip
+import hashlib
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # brotli opsiyonel; yoksa yalnızca gzip varyantı hazırlanır
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+
+class StaticAsset:
+    """A file held in memory with gzip/brotli variants and a strong ETag per variant."""
+
+    def __init__(self, body: bytes, media_type: str, cache_control: str):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.bodies = {None: body}
+        if media_type.startswith(COMPRESSIBLE_TYPES):
+            # mtime=0: aynı içerik her açılışta aynı byte'ları (ve ETag'i) üretir
+            self.bodies["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.bodies["br"] = brotli.compress(body, quality=11)
+
+    @classmethod
+    def from_file(cls, path: Path, media_type: str, cache_control: str, replacements: dict = None):
+        """Read `path` once; `replacements` rewrites text content before it is compressed."""
+        body = Path(path).read_bytes()
+        for old, new in (replacements or {}).items():
+            body = body.replace(old.encode("utf-8"), new.encode("utf-8"))
+        return cls(body, media_type, cache_control)
+
+    def etag(self, encoding: str = None) -> str:
+        """Strong ETag; each encoded variant gets its own since its bytes differ."""
+        suffix = f"-{encoding}" if encoding else ""
+        return f'"{self.digest[:32]}{suffix}"'
+
+    def body(self, encoding: str = None) -> bytes:
+        return self.bodies[encoding]
+
+
+def load_assets(root: Path) -> dict:
+    """Load the dashboard and its logo; the logo URL carries a content hash so it can be cached for a year."""
+    assets = {}
+    logo_path = root / "logo.png"
+    replacements = {}
+    if logo_path.exists():
+        logo = StaticAsset.from_file(logo_path, "image/png", "public, max-age=31536000, immutable")
+        assets["/logo.png"] = logo
+        replacements['src="/logo.png"'] = f'src="/logo.png?v={logo.digest[:12]}"'
+    # HTML her deploy'da değişebilir; tarayıcı ETag ile doğrular, değişmediyse 304 alır
+    assets["/"] = StaticAsset.from_file(
+        root / "index.html", "text/html; charset=utf-8", "no-cache", replacements
+    )
+    return assets
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+API Load Test
+API'yi sahte, süreç içi bir scraper ve sentetik tarife verisiyle yerelde açıp uç noktalara eş zamanlı istemcilerle yük bindirir.
+
+Kullanım:
+    python bench/load_test.py                           # varsayılan istemci dağılımı, 30 sn
+    python bench/load_test.py --duration 60 --tariffs 2000 --providers 5
+    python bench/load_test.py --clients tariffs=50 --clients download=10
+    python bench/load_test.py --no-scrape               # scrape olmadan taban çizgisi
+    python bench/load_test.py --slo-p99-ms 250 --slo-lag-ms 50   # aşılırsa çıkış kodu 1
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import uvicorn
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+
+RESULTS = BENCH_DIR / "results"
+
+# Uç nokta adı -> yol; dashboard'un yaptığı istekler
+ENDPOINTS = {
+    "tariffs": "/api/tariffs",
+    "query": "/api/tariffs?sort=price_per_gb&limit=50",
+    "compare": "/api/compare",
+    "changes": "/api/changes?limit=100",
+    "jobs": "/api/jobs",
+    "metrics": "/api/metrics",
+    "download": "/api/download?format=xlsx",
+}
+DEFAULT_CLIENTS = {"tariffs": 20, "query": 10, "compare": 5, "changes": 5, "jobs": 2, "metrics": 1, "download": 4}
+
+CATEGORIES = ["Red", "Uyumlu", "Gençlik", "Dijital", "Kurumsal", "Ek Paket"]
+GB_CHOICES = [5, 10, 15, 20, 30, 40, 50, 75, 100, "Sınırsız"]
+MINUTE_CHOICES = [250, 500, 750, 1000, 2000, "Sınırsız"]
+SMS_CHOICES = [100, 250, 500, 1000]
+
+
+async def scrape(scraper, url: str) -> list[dict]:
+    """Fake provider plugin: emits a synthetic dataset over `scrape_seconds` in progress steps.
+
+    Settings come from the `load_test` section of the generated config, so the
+    plugin works whichever module object the registry imports. Every run
+    reprices `churn` of the tariffs, which gives each snapshot a new version
+    and real rows in the change feed.
+    """
+    settings = scraper.config.get('load_test', {})
+    provider_key = url.split("://", 1)[1]
+    count = settings.get('tariffs', 500)
+    steps = max(1, settings.get('steps', 20))
+    delay = settings.get('scrape_seconds', 5) / steps
+    base = random.Random(provider_key)
+    churn = random.Random()
+    tariffs = []
+    for step in range(steps):
+        await asyncio.sleep(delay)
+        for i in range(len(tariffs), count * (step + 1) // steps):
+            category = base.choice(CATEGORIES)
+            gb = base.choice(GB_CHOICES)
+            price = base.randint(150, 1500)
+            if churn.random() < settings.get('churn', 0.05):
+                price += churn.randint(-50, 50)
+            tariffs.append({
+                'category': category,
+                'name': f"{category} {gb} GB #{i}",
+                'gb': str(gb),
+                'minutes': str(base.choice(MINUTE_CHOICES)),
+                'sms': str(base.choice(SMS_CHOICES)),
+                'price': price,
+                'no_commitment_price': price + base.randint(50, 300),
+            })
+        scraper._progress(provider_key, done=len(tariffs), total=count)
+    return tariffs
+
+
+def _load_config(tmp_dir: Path, args) -> Path:
+    """Write a config.json with fake providers, a private database and no schedules."""
+    with open(ROOT / "config.json", 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config['database'] = str(tmp_dir / "load.db")
+    config['output_file'] = str(tmp_dir / "load.xlsx")
+    config['archive'] = {'enabled': False}
+    config['jobs'].update({'mode': 'inline', 'schedules': []})
+    config['load_test'] = {
+        'tariffs': args.tariffs,
+        'scrape_seconds': args.scrape_seconds,
+        'steps': args.steps,
+        'churn': args.churn,
+    }
+    config['providers'] = {
+        f"op{n}": {
+            'name': f"Operatör {n}",
+            'urls': [f"synthetic://op{n}"],
+            'plugin': "load_test:scrape",
+            'freshness_ttl_hours': 24,
+        }
+        for n in range(1, args.providers + 1)
+    }
+    path = tmp_dir / "config.json"
+    path.write_text(json.dumps(config, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+def percentile(values: list, q: float):
+    """Nearest-rank percentile of `values` (q in 0..100); None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, math.ceil(q * len(ordered) / 100) - 1)
+    return round(ordered[rank], 2)
+
+
+def _latency_summary(values: list) -> dict:
+    return {
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": round(max(values), 2) if values else None,
+        "mean_ms": round(statistics.fmean(values), 2) if values else None,
+    }
+
+
+class LoopLagMonitor:
+    """Measures how late the API's event loop wakes up from a short sleep.
+
+    Runs inside the server loop; anything that holds the loop (CPU-bound
+    serialization, Excel generation, a blocking call in a scrape) shows up as
+    lag. Samples are taken only while `recording` is set and are split by
+    whether a scrape job was running at the time.
+    """
+
+    def __init__(self, recording, interval: float = 0.01):
+        self.recording = recording
+        self.interval = interval
+        self.samples = {"scraping": [], "idle": []}
+
+    async def run(self):
+        import server
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - started - self.interval) * 1000)
+            if self.recording.is_set():
+                busy = server.backend is not None and bool(server.backend.active())
+                self.samples["scraping" if busy else "idle"].append(lag_ms)
+
+    def summary(self) -> dict:
+        everything = self.samples["scraping"] + self.samples["idle"]
+        return {
+            "samples": len(everything),
+            **_latency_summary(everything),
+            "scraping": {"samples": len(self.samples["scraping"]), **_latency_summary(self.samples["scraping"])},
+            "idle": {"samples": len(self.samples["idle"]), **_latency_summary(self.samples["idle"])},
+        }
+
+
+def _serve(config_path: str, export_dir: str, port: int, recording, stop, lag_pipe):
+    """Child process: run server.app under uvicorn with the lag monitor in the same event loop."""
+    os.environ["TARIFE_CONFIG"] = config_path
+    import server
+    server.EXPORT_DIR = Path(export_dir)
+    monitor = LoopLagMonitor(recording)
+    app_server = uvicorn.Server(uvicorn.Config(
+        server.app, host="127.0.0.1", port=port, log_level="warning", access_log=False
+    ))
+
+    async def watch_stop():
+        while not stop.is_set():
+            await asyncio.sleep(0.1)
+        app_server.should_exit = True
+
+    async def serve():
+        tasks = [asyncio.ensure_future(monitor.run()), asyncio.ensure_future(watch_stop())]
+        try:
+            await app_server.serve()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    asyncio.run(serve())
+    lag_pipe.send(monitor.summary())
+
+
+class AppServer:
+    """Runs the API in a child process, so the load generator does not share its GIL or event loop.
+
+    Setting `stop` shuts uvicorn down gracefully (lifespan shutdown included),
+    after which the child sends back the event-loop lag it measured.
+    """
+
+    def __init__(self, config_path: Path, export_dir: Path):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        context = multiprocessing.get_context("spawn")
+        self.recording = context.Event()
+        self.stop = context.Event()
+        self._lag, child_end = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_serve, args=(str(config_path), str(export_dir), self.port, self.recording, self.stop, child_end)
+        )
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.process.start()
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                httpx.get(f"{self.base_url}/api/providers", timeout=1).raise_for_status()
+                return self
+            except httpx.HTTPError:
+                if not self.process.is_alive() or time.monotonic() > deadline:
+                    self.process.kill()
+                    raise RuntimeError("API açılamadı")
+                time.sleep(0.1)
+
+    def lag_summary(self, timeout: float = 30) -> dict:
+        """Stop the server and return its event-loop lag summary."""
+        self.stop.set()
+        summary = self._lag.recv() if self._lag.poll(timeout) else None
+        self.process.join(timeout)
+        return summary
+
+    def __exit__(self, *exc):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+async def wait_for_jobs(client: httpx.AsyncClient, job_ids: list, timeout: float = 300) -> list[dict]:
+    """Poll /api/jobs/{id} until every job has finished; returns the final jobs."""
+    deadline = time.monotonic() + timeout
+    while True:
+        jobs = [(await client.get(f"/api/jobs/{job_id}")).json() for job_id in job_ids]
+        if all(job["status"] in ("completed", "failed", "cancelled", "skipped") for job in jobs):
+            return jobs
+        if time.monotonic() > deadline:
+            raise TimeoutError("Scrape işleri zamanında bitmedi")
+        await asyncio.sleep(0.2)
+
+
+async def client_loop(client: httpx.AsyncClient, path: str, until: float, results: dict, use_etag: bool,
+                      think_ms: float):
+    """One closed-loop client: request, record latency, optionally revalidate with the last ETag."""
+    etag = None
+    while time.monotonic() < until:
+        headers = {"Accept-Encoding": "gzip"}
+        if use_etag and etag:
+            headers["If-None-Match"] = etag
+        started = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            await response.aread()
+            latency_ms = (time.perf_counter() - started) * 1000
+            if response.status_code >= 400:
+                results["errors"] += 1
+            else:
+                results["latencies"].append(latency_ms)
+                results["bytes"] += len(response.content)
+                results["not_modified"] += response.status_code == 304
+                etag = response.headers.get("etag") or etag
+        except httpx.HTTPError:
+            results["errors"] += 1
+        if think_ms:
+            await asyncio.sleep(think_ms / 1000)
+
+
+async def scrape_loop(client: httpx.AsyncClient, until: float, every: float, results: dict):
+    """Keep scrape groups running through the API for the whole load phase."""
+    while time.monotonic() < until:
+        started = time.monotonic()
+        job_ids = (await client.get("/api/scrape", params={"provider": "all", "force": "true"})).json()["jobs"]
+        jobs = await wait_for_jobs(client, job_ids)
+        results["groups"] += 1
+        results["jobs"] += len(jobs)
+        results["failed"] += sum(job["status"] != "completed" for job in jobs)
+        results["durations_ms"].append((time.monotonic() - started) * 1000)
+        await asyncio.sleep(max(0.0, every - (time.monotonic() - started)))
+
+
+def _parse_clients(values: list) -> dict:
+    clients = dict(DEFAULT_CLIENTS)
+    if values:
+        clients = {name: 0 for name in ENDPOINTS}
+        for value in values:
+            name, _, count = value.partition("=")
+            if name not in ENDPOINTS or not count.isdigit():
+                raise SystemExit(f"--clients ad=sayı olmalı; adlar: {', '.join(ENDPOINTS)}")
+            clients[name] = int(count)
+    return {name: count for name, count in clients.items() if count > 0}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_load(base_url: str, args, clients: dict, recording) -> dict:
+    limits = httpx.Limits(max_connections=sum(clients.values()) + 4, max_keepalive_connections=sum(clients.values()) + 4)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        # İlk snapshot: tüm uç noktaların dönecek verisi olsun
+        print(f"🌱 {args.providers} operatör x {args.tariffs} tarife ile ilk veri yazılıyor...")
+        seed = (await client.get("/api/scrape", params={"provider": "all"})).json()["jobs"]
+        await wait_for_jobs(client, seed)
+
+        endpoint_results = {
+            name: {"clients": count, "latencies": [], "errors": 0, "bytes": 0, "not_modified": 0}
+            for name, count in clients.items()
+        }
+        scrapes = {"groups": 0, "jobs": 0, "failed": 0, "durations_ms": []}
+        print(f"🚦 {sum(clients.values())} istemci, {args.duration} sn: "
+              + ", ".join(f"{name}={count}" for name, count in clients.items()))
+        recording.set()
+        started = time.monotonic()
+        until = started + args.duration
+        scraping = None
+        if not args.no_scrape:
+            scraping = asyncio.ensure_future(scrape_loop(client, until, args.scrape_every, scrapes))
+        await asyncio.gather(*(
+            client_loop(client, ENDPOINTS[name], until, endpoint_results[name], not args.no_etag, args.think_ms)
+            for name, count in clients.items() for _ in range(count)
+        ))
+        elapsed = time.monotonic() - started
+        recording.clear()
+        if scraping is not None:
+            # Süre dolduğunda çalışan scrape grubu bitene kadar beklenir; ölçüme dahil edilmez
+            await scraping
+
+    endpoints = {}
+    for name, r in endpoint_results.items():
+        endpoints[name] = {
+            "path": ENDPOINTS[name],
+            "clients": r["clients"],
+            "requests": len(r["latencies"]),
+            "errors": r["errors"],
+            "not_modified": r["not_modified"],
+            "rps": round(len(r["latencies"]) / elapsed, 1),
+            "mb": round(r["bytes"] / 1024 / 1024, 2),
+            **_latency_summary(r["latencies"]),
+        }
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "endpoints": endpoints,
+        "scrapes": {
+            "groups": scrapes["groups"],
+            "jobs": scrapes["jobs"],
+            "failed": scrapes["failed"],
+            "p50_ms": percentile(scrapes["durations_ms"], 50),
+        },
+    }
+
+
+def check_slo(results: dict, args) -> list[str]:
+    """SLO violations as readable lines; empty when every threshold holds."""
+    violations = []
+    for name, r in results["endpoints"].items():
+        if args.slo_p99_ms is not None and r["p99_ms"] is not None and r["p99_ms"] > args.slo_p99_ms:
+            violations.append(f"{name}: p99 {r['p99_ms']} ms > {args.slo_p99_ms} ms")
+        if args.slo_errors is not None and r["errors"] > args.slo_errors:
+            violations.append(f"{name}: {r['errors']} hata > {args.slo_errors}")
+    lag = results["event_loop_lag"]
+    if args.slo_lag_ms is not None and lag["p99_ms"] is not None and lag["p99_ms"] > args.slo_lag_ms:
+        violations.append(f"event loop: p99 gecikme {lag['p99_ms']} ms > {args.slo_lag_ms} ms")
+    return violations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="API uç noktalarına yük testi uygula.")
+    parser.add_argument("--duration", type=float, default=30, help="Yük süresi (sn)")
+    parser.add_argument("--clients", action="append", metavar="AD=SAYI",
+                        help=f"Uç nokta başına istemci; adlar: {', '.join(ENDPOINTS)} (tekrarlanabilir)")
+    parser.add_argument("--providers", type=int, default=3, help="Sentetik operatör sayısı")
+    parser.add_argument("--tariffs", type=int, default=500, help="Operatör başına tarife sayısı")
+    parser.add_argument("--scrape-seconds", type=float, default=5, help="Sahte scrape'in süresi (sn)")
+    parser.add_argument("--steps", type=int, default=20, help="Sahte scrape'in ilerleme adımı sayısı")
+    parser.add_argument("--churn", type=float, default=0.05, help="Her run'da fiyatı değişen tarife oranı")
+    parser.add_argument("--scrape-every", type=float, default=0, help="Scrape grupları arası en az süre (sn)")
+    parser.add_argument("--no-scrape", action="store_true", help="Yük sırasında scrape çalıştırma")
+    parser.add_argument("--no-etag", action="store_true", help="İstemciler If-None-Match göndermesin")
+    parser.add_argument("--think-ms", type=float, default=0, help="İstemcinin istekler arası beklemesi (ms)")
+    parser.add_argument("--timeout", type=float, default=60, help="İstek zaman aşımı (sn)")
+    parser.add_argument("--slo-p99-ms", type=float, help="Her uç nokta için p99 gecikme sınırı (ms)")
+    parser.add_argument("--slo-lag-ms", type=float, help="Event loop gecikmesi p99 sınırı (ms)")
+    parser.add_argument("--slo-errors", type=int, help="Uç nokta başına izin verilen hata sayısı")
+    parser.add_argument("--output", type=Path, help="Sonuç JSON dosyası (varsayılan: bench/results/load-<commit>.json)")
+    args = parser.parse_args()
+    clients = _parse_clients(args.clients)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        with AppServer(_load_config(tmp_dir, args), tmp_dir / "exports") as app_server:
+            results = asyncio.run(run_load(app_server.base_url, args, clients, app_server.recording))
+            results["event_loop_lag"] = app_server.lag_summary()
+        if results["event_loop_lag"] is None:
+            raise SystemExit("API event loop ölçümünü göndermeden kapandı")
+
+    violations = check_slo(results, args)
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "settings": {
+            "duration_s": args.duration, "providers": args.providers, "tariffs": args.tariffs,
+            "scrape_seconds": args.scrape_seconds, "scrape": not args.no_scrape, "etag": not args.no_etag,
+            "think_ms": args.think_ms,
+        },
+        "results": results,
+        "slo_violations": violations,
+    }
+    output = args.output or RESULTS / f"load-{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+
+    print(f"\n{'=' * 72}")
+    print(f"{'uç nokta':<10}{'istek':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'hata':>7}")
+    for name, r in results["endpoints"].items():
+        print(f"{name:<10}{r['requests']:>8}{r['rps']:>9}{r['p50_ms'] or '-':>9}{r['p95_ms'] or '-':>9}"
+              f"{r['p99_ms'] or '-':>9}{r['max_ms'] or '-':>9}{r['errors']:>7}")
+    lag = results["event_loop_lag"]
+    ms = lambda value: "-" if value is None else f"{value} ms"
+    print(f"🐢 Event loop gecikmesi: p50 {ms(lag['p50_ms'])}, p95 {ms(lag['p95_ms'])}, p99 {ms(lag['p99_ms'])}, "
+          f"max {ms(lag['max_ms'])} (scrape sırasında p99 {ms(lag['scraping']['p99_ms'])}, "
+          f"boşta p99 {ms(lag['idle']['p99_ms'])})")
+    scrapes = results["scrapes"]
+    print(f"🕷️ Scrape: {scrapes['groups']} grup, {scrapes['jobs']} iş ({scrapes['failed']} başarısız), "
+          f"grup p50 {ms(scrapes['p50_ms'])}")
+    for line in violations:
+        print(f"❌ SLO: {line}")
+    if not violations and any(v is not None for v in (args.slo_p99_ms, args.slo_lag_ms, args.slo_errors)):
+        print("✅ SLO'lar karşılandı")
+    print(f"💾 Sonuçlar: {output}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Scraper Benchmark
+Scraper'ları canlı siteler yerine kayıtlı sayfa görüntüleri üzerinde çalıştırıp ölçer.
+
+Kullanım:
+    python bench/run_bench.py                   # fixtures/*.har varsa HAR, yoksa statik HTML
+    python bench/run_bench.py --static          # her zaman statik HTML fixture'ları
+    python bench/run_bench.py --record          # canlı sitelerden fixtures/<ad>.har kaydet
+    python bench/run_bench.py --repeat 3 --only vodafone
+"""
+
+import argparse
+import asyncio
+import functools
+import http.server
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import psutil
+except ImportError:  # psutil opsiyonel; yoksa yalnızca Python sürecinin tepe RSS'i ölçülür
+    psutil = None
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+
+from browser_pool import BrowserPool
+from scraper import TarifeScraper
+from providers import ProviderRegistry
+
+FIXTURES = BENCH_DIR / "fixtures"
+RESULTS = BENCH_DIR / "results"
+
+# Operatör -> statik fixture; eklenti ve canlı URL config.json'daki `providers` bölümünden gelir
+CASES = {
+    "vodafone": "vodafone.html",
+    "turkcell": "turkcell.html",
+    "turkcell_mevcut": "turkcell_mevcut.html",
+}
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """Serves the fixtures directory on a random local port in a background thread."""
+
+    def __init__(self, directory: Path):
+        handler = functools.partial(_QuietHandler, directory=str(directory))
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class RssSampler:
+    """Samples RSS of this process and its children (Playwright driver, Chromium) to find the peak."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._task = None
+
+    def _sample(self) -> int:
+        process = psutil.Process()
+        total = 0
+        for proc in [process] + process.children(recursive=True):
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    async def _run(self):
+        while True:
+            self.peak_bytes = max(self.peak_bytes, self._sample())
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if psutil is not None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> float:
+        """Stop sampling and return the peak RSS in MB."""
+        if self._task is None:
+            # Linux'ta ru_maxrss KB cinsindendir
+            return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self.peak_bytes = max(self.peak_bytes, self._sample())
+        return round(self.peak_bytes / 1024 / 1024, 1)
+
+
+def _bench_config(tmp_dir: Path, static: bool) -> Path:
+    """Write a config.json for the run: same settings, private database, no tracker blocking locally."""
+    with open(ROOT / "config.json", 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config['database'] = str(tmp_dir / "bench.db")
+    config['output_file'] = str(tmp_dir / "bench.xlsx")
+    if static:
+        for name in CASES:
+            config['providers'][name]['block_domains'] = []
+    path = tmp_dir / "config.json"
+    path.write_text(json.dumps(config, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+def _har_setup(har_path: Path, record: bool):
+    async def setup(scrape_name, context):
+        if record:
+            await context.route_from_har(har_path, update=True, update_content="embed")
+        else:
+            await context.route_from_har(har_path, not_found="abort")
+    return setup
+
+
+async def run_case(name: str, url: str, config_path: Path, context_setup=None) -> dict:
+    """Run one scraper with a fresh browser pool and collect its measurements."""
+    sampler = RssSampler()
+    sampler.start()
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    pool = BrowserPool.from_config(config)
+    scrape = ProviderRegistry.from_config(config).get(name).load()
+    scraper = TarifeScraper(str(config_path), pool=pool, force_refresh=True, context_setup=context_setup)
+    started = time.perf_counter()
+    try:
+        tariffs = await scrape(scraper, url)
+    finally:
+        wall_ms = (time.perf_counter() - started) * 1000
+        await pool.stop()
+    peak_rss_mb = await sampler.stop()
+
+    return {
+        "wall_ms": round(wall_ms, 1),
+        "per_card_ms": round(wall_ms / len(tariffs), 1) if tariffs else None,
+        "browser_launch_ms": pool.stats["last_launch_ms"],
+        "context_startup_ms": scraper.startup_ms.get(name),
+        "peak_rss_mb": peak_rss_mb,
+        "records": len(tariffs),
+        "failures": len(scraper.failures.get(name, [])),
+        "wait_stats": scraper.wait_stats.get(name),
+        "traffic": scraper.traffic.get(name),
+    }
+
+
+def _summarize(runs: list[dict]) -> dict:
+    """Median of the timing fields across repeats; other fields from the last run."""
+    summary = dict(runs[-1])
+    for key in ("wall_ms", "per_card_ms", "browser_launch_ms", "context_startup_ms", "peak_rss_mb"):
+        values = [r[key] for r in runs if r[key] is not None]
+        summary[key] = round(statistics.median(values), 1) if values else None
+    summary["repeats"] = len(runs)
+    return summary
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Scraper'ları kayıtlı sayfalar üzerinde ölç.")
+    parser.add_argument("--only", choices=list(CASES), action="append", help="Yalnızca bu scraper(lar)")
+    parser.add_argument("--repeat", type=int, default=1, help="Her scraper kaç kez çalışsın (medyan raporlanır)")
+    parser.add_argument("--static", action="store_true", help="HAR olsa bile statik HTML fixture'ları kullan")
+    parser.add_argument("--record", action="store_true", help="Canlı sitelerden HAR kaydet ve çık")
+    parser.add_argument("--output", type=Path, help="Sonuç JSON dosyası (varsayılan: bench/results/bench-<commit>.json)")
+    args = parser.parse_args()
+
+    names = args.only or list(CASES)
+    commit = _git_commit()
+    with open(ROOT / "config.json", 'r', encoding='utf-8') as f:
+        registry = ProviderRegistry.from_config(json.load(f))
+
+    with tempfile.TemporaryDirectory() as tmp, FixtureServer(FIXTURES) as server:
+        tmp_dir = Path(tmp)
+
+        if args.record:
+            config_path = _bench_config(tmp_dir, static=False)
+            for name in names:
+                har_path = FIXTURES / f"{name}.har"
+                print(f"⏺️ {name} kaydediliyor: {har_path}")
+                await run_case(name, registry.get(name).urls[0], config_path, _har_setup(har_path, record=True))
+            return
+
+        results = {}
+        modes = {}
+        for name in names:
+            fixture, live_url = CASES[name], registry.get(name).urls[0]
+            har_path = FIXTURES / f"{name}.har"
+            use_har = har_path.exists() and not args.static
+            config_path = _bench_config(tmp_dir, static=not use_har)
+            if use_har:
+                url, setup = live_url, _har_setup(har_path, record=False)
+            else:
+                url, setup = f"{server.base_url}/{fixture}", None
+            modes[name] = "har" if use_har else "static"
+
+            runs = []
+            for i in range(args.repeat):
+                print(f"\n⏱️ {name} ({modes[name]}) {i + 1}/{args.repeat}")
+                runs.append(await run_case(name, url, config_path, setup))
+            results[name] = _summarize(runs)
+
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "modes": modes,
+        "results": results,
+    }
+    output = args.output or RESULTS / f"bench-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+
+    print(f"\n{'=' * 50}")
+    for name, r in results.items():
+        print(f"📊 {name}: {r['wall_ms']} ms, {r['records']} kayıt, {r['per_card_ms']} ms/kart, "
+              f"launch {r['browser_launch_ms']} ms, peak RSS {r['peak_rss_mb']} MB")
+    print(f"💾 Sonuçlar: {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
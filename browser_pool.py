@@ -0,0 +1,178 @@
+"""
+Browser Pool
+Scraper'lar arasında paylaşılan, uzun ömürlü Chromium havuzu.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright
+
+
+class BrowserPool:
+    """Long-lived Chromium instance that hands out isolated browser contexts."""
+
+    def __init__(self, max_contexts: int = 3, max_uses: int = 20, headless: bool = True):
+        self.max_contexts = max_contexts
+        self.max_uses = max_uses
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        self._browser_uses = 0
+        self._active = {}      # browser -> açık context sayısı
+        self._retired = set()  # geri dönüştürülmeyi bekleyen tarayıcılar
+        self._semaphore = asyncio.Semaphore(max_contexts)
+        self._lock = asyncio.Lock()
+        self.stats = {
+            "launches": 0,
+            "crashes": 0,
+            "contexts_served": 0,
+            "last_launch_ms": None,
+        }
+
+    @classmethod
+    def from_config(cls, config: dict) -> "BrowserPool":
+        """Build a pool from the `browser_pool` section of config.json."""
+        settings = config.get('browser_pool', {})
+        return cls(
+            max_contexts=settings.get('max_contexts', 3),
+            max_uses=settings.get('max_uses', 20),
+            headless=settings.get('headless', True),
+        )
+
+    async def start(self):
+        """Start Playwright and launch the first browser."""
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            await self._ensure_browser()
+
+    async def stop(self):
+        """Close every browser and stop Playwright."""
+        async with self._lock:
+            browsers = set(self._active) | self._retired
+            if self._browser is not None:
+                browsers.add(self._browser)
+            for browser in browsers:
+                await self._close_browser(browser)
+            self._browser = None
+            self._active.clear()
+            self._retired.clear()
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """Lease an isolated browser context; blocks while `max_contexts` are in use."""
+        async with self._semaphore:
+            async with self._lock:
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                browser = await self._ensure_browser()
+                self._browser_uses += 1
+                self._active[browser] = self._active.get(browser, 0) + 1
+
+            context = None
+            try:
+                context = await browser.new_context(**context_options)
+                self.stats["contexts_served"] += 1
+                yield context
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                async with self._lock:
+                    self._active[browser] -= 1
+                    if not browser.is_connected() and browser is self._browser:
+                        # Tarayıcı çöktü, bir sonraki istekte yenisi açılacak
+                        self.stats["crashes"] += 1
+                        self._retire(browser)
+                    if browser in self._retired and self._active[browser] == 0:
+                        await self._close_browser(browser)
+
+    async def _ensure_browser(self):
+        """Return a healthy browser, recycling the current one if needed. Caller holds the lock."""
+        browser = self._browser
+        if browser is not None:
+            if not browser.is_connected():
+                self.stats["crashes"] += 1
+                self._retire(browser)
+            elif self._browser_uses >= self.max_uses:
+                self._retire(browser)
+            if browser in self._retired and self._active.get(browser, 0) == 0:
+                await self._close_browser(browser)
+
+        if self._browser is None:
+            started = time.perf_counter()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self.stats["launches"] += 1
+            self.stats["last_launch_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self._browser_uses = 0
+            self._active[self._browser] = 0
+            print(f"🚀 Chromium başlatıldı ({self.stats['last_launch_ms']} ms)")
+        return self._browser
+
+    def _retire(self, browser):
+        """Stop handing out contexts from `browser`; it is closed once idle."""
+        self._retired.add(browser)
+        if browser is self._browser:
+            self._browser = None
+
+    async def _close_browser(self, browser):
+        """Close a browser and forget about it."""
+        try:
+            await browser.close()
+        except Exception:
+            pass
+        self._retired.discard(browser)
+        self._active.pop(browser, None)
+
+
+async def block_resources(context, resource_types: list, domains: list, stats: dict):
+    """Abort requests of the given resource types or to the given domains (and subdomains)."""
+    types = set(resource_types)
+    domains = tuple(domains)
+
+    async def handler(route):
+        request = route.request
+        host = urlparse(request.url).hostname or ''
+        if request.resource_type in types or any(host == d or host.endswith('.' + d) for d in domains):
+            stats['blocked'] = stats.get('blocked', 0) + 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handler)
+
+
+class PageTraffic:
+    """Counts bytes transferred by the finished requests of one page."""
+
+    def __init__(self, page):
+        self.bytes = 0
+        self.requests = 0
+        self._pending = set()
+        page.on("requestfinished", self._on_finished)
+
+    def _on_finished(self, request):
+        task = asyncio.ensure_future(self._add(request))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _add(self, request):
+        try:
+            sizes = await request.sizes()
+            self.bytes += sizes['responseBodySize'] + sizes['responseHeadersSize']
+        except Exception:
+            pass
+        self.requests += 1
+
+    async def settle(self):
+        """Wait until sizes of already finished requests are counted."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
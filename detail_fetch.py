@@ -0,0 +1,301 @@
+"""
+Detail Fetch
+Sunucuda render edilen detay sayfalarını tarayıcısız, havuzlu bir HTTP istemcisiyle çeker ve ayrıştırır.
+
+requirements.txt yalnızca httpx'i kurar; varsayılan yol HTTP/1.1 üzerinden standart kütüphanedeki
+html.parser'dır. `h2` (HTTP/2) ve `selectolax` (hızlı ayrıştırıcı) opsiyoneldir ve yalnızca kuruluysa kullanılır.
+"""
+
+import asyncio
+import importlib.util
+import json
+import re
+from html.parser import HTMLParser
+
+try:
+    import httpx
+except ImportError:  # httpx opsiyonel; yoksa detay sayfaları Chromium ile açılır
+    httpx = None
+
+try:
+    from selectolax.parser import HTMLParser as FastHTMLParser
+except ImportError:  # selectolax opsiyonel; yoksa standart kütüphanedeki html.parser kullanılır
+    FastHTMLParser = None
+
+
+ANNUAL_RE = re.compile(r'Yıllık\s*Abonelik.*?(\d+)\s*TL', re.I | re.S)
+MONTHLY_RE = re.compile(r'Aylık\s*Abonelik.*?(\d+)\s*TL', re.I | re.S)
+LABEL_PRICE_RE = re.compile(r'(\d+)\s*TL', re.I)
+GB_ONLY_RE = re.compile(r'^\d+\s*GB$', re.I)
+
+# TURKCELL_DETAIL_JS'deki seçicilerin karşılığı
+BLOCK_SELECTOR = 'h1, h2, h3, p, div[class*="packageName"]'
+LABEL_SELECTOR = 'label, .ant-radio-wrapper'
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'head', 'title'}
+NEWLINE_TAGS = {'br', 'p', 'div', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'article', 'label', 'ul', 'table'}
+
+
+def available() -> bool:
+    """True if the HTTP fetch path can be used (httpx is installed)."""
+    return httpx is not None
+
+
+class DetailDocument:
+    """The parts of a detail page the Turkcell rules read, from either HTML parser."""
+
+    def __init__(self, h1: str, h2: str, blocks: list, labels: list, body_text: str, next_data: str = None):
+        self.h1 = h1
+        self.h2 = h2
+        self.blocks = blocks        # h1/h2/h3/p/packageName metinleri, belge sırasıyla
+        self.labels = labels        # label / .ant-radio-wrapper metinleri
+        self.body_text = body_text  # document.body.innerText yaklaşığı
+        self.next_data = next_data  # gömülü __NEXT_DATA__ JSON metni
+
+    def payloads(self) -> list:
+        """Embedded JSON for `network_extract.extract_tariffs`."""
+        if not self.next_data:
+            return []
+        try:
+            return [json.loads(self.next_data)]
+        except ValueError:
+            return []
+
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+class _Collector(HTMLParser):
+    """Stdlib fallback: gathers block, label and body text in one pass."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.h1 = None
+        self.h2 = None
+        self.blocks = []
+        self.labels = []
+        self.body = []
+        self.next_data = None
+        self._stack = []    # (tag, blok indeksi, label indeksi)
+        self._skip = 0
+        self._in_next_data = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'body' and any(entry[0] == 'head' for entry in self._stack):
+            # Kapatılmamış <head> body'yi gizlemesin
+            self.handle_endtag('head')
+        if tag in NEWLINE_TAGS:
+            self.body.append("\n")
+        if tag in VOID_TAGS:
+            return
+        if tag == 'script' and attrs.get('id') == '__NEXT_DATA__':
+            self._in_next_data = True
+            self.next_data = ""
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        css = attrs.get('class') or ""
+        block = label = None
+        if tag in ('h1', 'h2', 'h3', 'p') or (tag == 'div' and 'packageName' in css):
+            block = len(self.blocks)
+            self.blocks.append("")
+        if tag == 'label' or 'ant-radio-wrapper' in css.split():
+            label = len(self.labels)
+            self.labels.append("")
+        self._stack.append((tag, block, label))
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in NEWLINE_TAGS:
+            self.body.append("\n")
+
+    def handle_endtag(self, tag):
+        if not any(entry[0] == tag for entry in self._stack):
+            return
+        # Kapatılmamış iç etiketler de kapanır (tarayıcıların hata toleransı gibi)
+        while self._stack:
+            open_tag, block, _ = self._stack.pop()
+            if open_tag in SKIP_TAGS:
+                self._skip -= 1
+                self._in_next_data = False
+            if block is not None:
+                self.blocks[block] = _clean(self.blocks[block])
+                if open_tag == 'h1' and self.h1 is None:
+                    self.h1 = self.blocks[block]
+                elif open_tag == 'h2' and self.h2 is None:
+                    self.h2 = self.blocks[block]
+            if open_tag == tag:
+                break
+        if tag in NEWLINE_TAGS:
+            self.body.append("\n")
+
+    def handle_data(self, data):
+        if self._in_next_data:
+            self.next_data += data
+            return
+        if self._skip:
+            return
+        self.body.append(data)
+        for _, block, label in self._stack:
+            if block is not None:
+                self.blocks[block] += data
+            if label is not None:
+                self.labels[label] += data
+
+
+def parse_document(html: str) -> DetailDocument:
+    """Parse a detail page with selectolax when installed, otherwise with html.parser."""
+    if FastHTMLParser is not None:
+        tree = FastHTMLParser(html)
+        h1 = tree.css_first('h1')
+        h2 = tree.css_first('h2')
+        next_data = tree.css_first('script#__NEXT_DATA__')
+        for node in tree.css('script, style, noscript, template'):
+            if node is not next_data:
+                node.decompose()
+        body = tree.body
+        return DetailDocument(
+            _clean(h1.text()) if h1 else None,
+            _clean(h2.text()) if h2 else None,
+            [_clean(node.text()) for node in tree.css(BLOCK_SELECTOR)],
+            [_clean(node.text()) for node in tree.css(LABEL_SELECTOR)],
+            body.text(separator="\n") if body else "",
+            next_data.text() if next_data else None,
+        )
+    collector = _Collector()
+    collector.feed(html)
+    collector.close()
+    return DetailDocument(
+        collector.h1, collector.h2, [_clean(text) for text in collector.blocks],
+        [_clean(text) for text in collector.labels], "".join(collector.body), collector.next_data,
+    )
+
+
+def turkcell_detail(document: DetailDocument) -> dict:
+    """Apply TURKCELL_DETAIL_JS's name, GB/minutes/SMS and annual/monthly price rules to a parsed page."""
+    name = document.h1 or document.h2 or 'Turkcell Tarife'
+    gb = minutes = sms = ''
+    for text in document.blocks:
+        text = text.upper()
+        if GB_ONLY_RE.match(text) or ('GB' in text and len(text) < 15):
+            gb = text.replace('GB', '', 1).strip()
+        elif 'DK' in text and len(text) < 15:
+            minutes = text.replace('DK', '', 1).strip()
+        elif 'SMS' in text and len(text) < 15:
+            sms = text.replace('SMS', '', 1).strip()
+
+    price = no_commitment_price = 0
+    match = ANNUAL_RE.search(document.body_text)
+    if match:
+        price = int(match.group(1))
+    match = MONTHLY_RE.search(document.body_text)
+    if match:
+        no_commitment_price = int(match.group(1))
+    # Radyo butonlarındaki fiyatlar sayfa metnindekilerden önceliklidir
+    for label in document.labels:
+        match = LABEL_PRICE_RE.search(label)
+        if match:
+            if 'YILLIK' in label.upper():
+                price = int(match.group(1))
+            elif 'AYLIK' in label.upper():
+                no_commitment_price = int(match.group(1))
+
+    return {
+        'name': name,
+        'gb': gb,
+        'minutes': minutes,
+        'sms': sms,
+        'price': price,
+        'no_commitment_price': no_commitment_price,
+    }
+
+
+def is_complete(data: dict) -> bool:
+    """An HTTP parse is trusted only with a real name, an allowance and a price; otherwise Chromium is used."""
+    return (
+        data['name'] != 'Turkcell Tarife'
+        and bool(data['gb'] or data['minutes'])
+        and (data['price'] > 0 or data['no_commitment_price'] > 0)
+    )
+
+
+class DetailFetcher:
+    """Pooled async HTTP client for detail pages: keep-alive, bounded concurrency, HTTP/1.1 by default
+    (HTTP/2 only if the optional `h2` package is installed).
+
+    After `max_errors` consecutive failures (e.g. the site blocks plain HTTP
+    clients) the fetcher disables itself so the rest of the run goes straight
+    to Chromium.
+    """
+
+    def __init__(self, concurrency: int = 8, timeout_seconds: float = 15, user_agent: str = None,
+                 cookies: dict = None, max_errors: int = 3):
+        self.concurrency = max(1, concurrency)
+        self.timeout_seconds = timeout_seconds
+        self.user_agent = user_agent
+        self.cookies = cookies or {}
+        self.max_errors = max_errors
+        self.http2 = importlib.util.find_spec('h2') is not None
+        self.disabled = False
+        self.stats = {'requests': 0, 'not_modified': 0, 'errors': 0, 'bytes': 0, 'http_version': None}
+        self._errors = 0
+        self._client = None
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    @classmethod
+    def from_settings(cls, settings: dict, user_agent: str = None, cookies: dict = None) -> "DetailFetcher":
+        """Build a fetcher from a provider's `http_*` settings in config.json."""
+        return cls(
+            concurrency=settings.get('http_concurrency', 8),
+            timeout_seconds=settings.get('http_timeout_seconds', 15),
+            user_agent=user_agent,
+            cookies=cookies,
+        )
+
+    async def __aenter__(self) -> "DetailFetcher":
+        headers = {'Accept': 'text/html,application/xhtml+xml', 'Accept-Language': 'tr-TR,tr;q=0.9'}
+        if self.user_agent:
+            headers['User-Agent'] = self.user_agent
+        self._client = httpx.AsyncClient(
+            http2=self.http2,
+            headers=headers,
+            cookies=self.cookies,
+            follow_redirects=True,
+            timeout=self.timeout_seconds,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    async def fetch(self, url: str, validator: str = None):
+        """GET `url`; returns (html, validator), or (None, validator) when the server answers 304 Not Modified.
+
+        `validator` is a cached ETag or Last-Modified value sent as a conditional request.
+        """
+        headers = {}
+        if validator:
+            headers['If-None-Match' if validator.startswith(('"', 'W/')) else 'If-Modified-Since'] = validator
+        async with self._semaphore:
+            try:
+                response = await self._client.get(url, headers=headers)
+                if response.status_code != 304:
+                    response.raise_for_status()
+            except Exception:
+                self.stats['errors'] += 1
+                self._errors += 1
+                if self._errors >= self.max_errors and not self.disabled:
+                    self.disabled = True
+                    print(f"⚠️ HTTP detay çekimi {self._errors} ardışık hatadan sonra kapatıldı; Chromium kullanılacak")
+                raise
+        self._errors = 0
+        self.stats['requests'] += 1
+        self.stats['bytes'] += len(response.content)
+        self.stats['http_version'] = response.http_version
+        new_validator = response.headers.get('etag') or response.headers.get('last-modified')
+        if response.status_code == 304:
+            self.stats['not_modified'] += 1
+            return None, new_validator or validator
+        return response.text, new_validator
@@ -0,0 +1,20 @@
+#!/bin/bash
+# Konteyner girişi: tek scrape worker'ı ve çok süreçli API (config'te "jobs.mode": "worker")
+# Süreçlerden biri durursa diğeri de durdurulur; docker stop sinyali ikisine de iletilir
+
+python scraper.py --worker &
+worker=$!
+uvicorn server:app --host 0.0.0.0 --port "${PORT}" --workers "${API_WORKERS}" &
+api=$!
+
+# Worker SIGTERM alınca başlamamış işleri kuyruğa geri bırakarak kapanır
+stop() {
+    kill -TERM "$worker" "$api" 2>/dev/null
+}
+trap stop TERM INT
+
+wait -n
+status=$?
+stop
+wait
+exit "$status"
@@ -0,0 +1,418 @@
+"""
+Engine
+Scrape işlerini çalıştıran motor: API süreci içinde (inline) ya da `python scraper.py --worker`
+ile başlatılan ayrı worker sürecinde çalışır.
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from exporter import write_xlsx
+from jobs import JobScheduler
+from metrics import Metrics
+from providers import ProviderRegistry
+from store import JobQueue, ProviderLock, TariffStore
+
+if TYPE_CHECKING:
+    # Playwright'ı yükleyen modüller ilk scrape'e kadar import edilmez
+    from browser_pool import BrowserPool
+    from scraper import TarifeScraper
+
+
+def describe_metrics(metrics: Metrics):
+    """Register the scrape metrics' types and help lines."""
+    metrics.describe("tarife_scrape_runs_total", "counter", "Scrape runs by provider and final status.")
+    metrics.describe("tarife_scrape_items_total", "counter", "Tariffs extracted by provider.")
+    metrics.describe("tarife_scrape_failures_total", "counter", "Detail links that could not be scraped.")
+    metrics.describe("tarife_scrape_duration_seconds", "histogram", "Wall time of one provider scrape.")
+    metrics.describe("tarife_scrape_phase_seconds", "histogram", "Time spent per scrape phase (goto, scroll, modal, detail, excel...).")
+    metrics.describe("tarife_scrape_completeness", "gauge", "Share of expected cards/links extracted completely in the last run.")
+    metrics.describe("tarife_circuit_open", "gauge", "1 while a provider's circuit breaker blocks new scrapes.")
+    metrics.describe("tarife_changes_total", "counter", "Tariffs added, removed or changed between snapshots.")
+    metrics.describe("tarife_browser_launches_total", "counter", "Chromium launches by the shared pool.")
+    metrics.describe("tarife_browser_crashes_total", "counter", "Chromium crashes seen by the shared pool.")
+    metrics.describe("tarife_browser_contexts_total", "counter", "Browser contexts handed out by the shared pool.")
+
+
+class IncompleteScrape(RuntimeError):
+    """The scrape finished but extracted too few of the expected cards to replace the snapshot."""
+
+    def __init__(self, message: str, tariffs: list[dict]):
+        super().__init__(message)
+        self.tariffs = tariffs
+
+
+class ScrapeEngine:
+    """Owns the browser pool and the job scheduler, runs scrapes and tracks their status.
+
+    `publish(event, data)` receives "status", "job", "progress" and "changes"
+    events; `on_data_changed()` is called once a group of jobs has written new data.
+    """
+
+    def __init__(self, config: dict, store: TariffStore, providers: ProviderRegistry, metrics: Metrics = None,
+                 publish=None, on_data_changed=None):
+        self.config = config
+        self.store = store
+        self.providers = providers
+        self.metrics = metrics or Metrics()
+        describe_metrics(self.metrics)
+        self.publish = publish or (lambda event, data: None)
+        self.on_data_changed = on_data_changed
+        # Motor boyunca yaşayan paylaşımlı Chromium havuzu (ilk scrape'te açılır)
+        self.browser_pool = None
+        self.lock = ProviderLock.from_config(config)
+        self.scheduler = JobScheduler.from_config(
+            config, self.run_job, [p.key for p in providers.enabled()], lock=self.lock,
+            on_change=self.job_changed
+        )
+        # Son scrape'in durumu (veriler SQLite deposunda tutulur)
+        self.last_scrape = {
+            "timestamp": None,
+            "status": "idle",
+            "message": "",
+            "current_provider": None,
+            "startup_ms": None,
+            "failures": [],
+            "providers": {}
+        }
+
+    async def start(self):
+        if self.last_scrape["timestamp"] is None:
+            # status_snapshot() istek başına SQLite'a gitmesin diye son run zamanı açılışta okunur
+            self.last_scrape["timestamp"] = await asyncio.to_thread(self.store.last_finished_at)
+        await self.scheduler.start()
+
+    async def stop(self):
+        await self.scheduler.stop()
+        if self.browser_pool is not None:
+            await self.browser_pool.stop()
+            self.browser_pool = None
+
+    # API'nin kullandığı iş arayüzü (worker modunda aynısını jobs.QueueClient sağlar);
+    # submit/submit_group/cancel QueueClient'ta SQLite'a yazdığı için her iki tarafta da async
+
+    async def submit(self, provider_key: str, trigger: str = "manual", options: dict = None):
+        return self.scheduler.submit(provider_key, trigger, options)
+
+    async def submit_group(self, provider_keys: list, trigger: str = "manual", options: dict = None):
+        return self.scheduler.submit_group(provider_keys, trigger, options)
+
+    def get(self, job_id: str):
+        return self.scheduler.get(job_id)
+
+    def find(self, provider_key: str = None, status: str = None, group: str = None):
+        return self.scheduler.find(provider_key, status, group)
+
+    def active(self, group: str = None):
+        return self.scheduler.active(group)
+
+    async def cancel(self, job_id: str) -> bool:
+        return self.scheduler.cancel(job_id)
+
+    def schedule_info(self) -> list[dict]:
+        return self.scheduler.schedule_info()
+
+    def circuits(self) -> dict:
+        return self.scheduler.circuits()
+
+    def lock_holders(self) -> dict:
+        return self.lock.holders()
+
+    def status_snapshot(self) -> dict:
+        """Current scrape status without the tariff data."""
+        last_scrape = self.last_scrape
+        return {
+            "timestamp": last_scrape["timestamp"],
+            "status": last_scrape["status"],
+            "message": last_scrape["message"],
+            "current_provider": last_scrape["current_provider"],
+            "startup_ms": last_scrape["startup_ms"],
+            "failures": last_scrape["failures"],
+            "provider_status": last_scrape["providers"],
+            "jobs": [job.to_dict() for job in self.scheduler.active()],
+            "browser_pool": self.browser_pool.stats if self.browser_pool else None
+        }
+
+    def metrics_text(self) -> str:
+        """Scrape metrics in Prometheus text format, with the pool and breaker gauges refreshed."""
+        if self.browser_pool is not None:
+            self.metrics.set("tarife_browser_launches_total", self.browser_pool.stats["launches"])
+            self.metrics.set("tarife_browser_crashes_total", self.browser_pool.stats["crashes"])
+            self.metrics.set("tarife_browser_contexts_total", self.browser_pool.stats["contexts_served"])
+        if self.scheduler.breaker is not None:
+            for key in self.providers.keys():
+                self.metrics.set("tarife_circuit_open", int(self.scheduler.breaker.state(key) == "open"), provider=key)
+        return self.metrics.render()
+
+    # Scrape çalıştırma
+
+    def publish_status(self):
+        """Push the current status to subscribers."""
+        self.publish("status", self.status_snapshot())
+
+    def get_browser_pool(self) -> "BrowserPool":
+        """Create the shared browser pool on first use; this is where Playwright gets imported."""
+        if self.browser_pool is None:
+            from browser_pool import BrowserPool
+            self.browser_pool = BrowserPool.from_config(self.config)
+        return self.browser_pool
+
+    def observe_phases(self, scraper: "TarifeScraper", scrape_name: str, provider_key: str, phases: tuple = None):
+        """Feed a scrape's timing spans into the phase histogram."""
+        for phase, values in scraper.phases.spans(scrape_name).items():
+            if phases is not None and phase not in phases:
+                continue
+            for ms in values:
+                self.metrics.observe("tarife_scrape_phase_seconds", ms / 1000, provider=provider_key, phase=phase)
+
+    def record_run_metrics(self, scraper: "TarifeScraper", provider_key: str, status: str, duration: float,
+                           items: int = 0):
+        """Update the run counters and histograms after one provider scrape."""
+        metrics = self.metrics
+        metrics.inc("tarife_scrape_runs_total", provider=provider_key, status=status)
+        metrics.inc("tarife_scrape_items_total", items, provider=provider_key)
+        metrics.inc("tarife_scrape_failures_total", len(scraper.failures.get(provider_key, [])), provider=provider_key)
+        metrics.observe("tarife_scrape_duration_seconds", duration, provider=provider_key)
+        completeness = scraper.completeness.get(provider_key)
+        if completeness:
+            metrics.set("tarife_scrape_completeness", completeness["ratio"], provider=provider_key)
+        self.observe_phases(scraper, provider_key, provider_key)
+
+    async def scrape_provider(self, scraper: "TarifeScraper", provider_key: str) -> list[dict]:
+        """Run one provider's scraper and track its status in `last_scrape["providers"]`."""
+        store = self.store
+        status = self.last_scrape["providers"][provider_key] = {
+            "status": "running",
+            "message": f"{provider_key} scraper başlatıldı...",
+            "count": 0,
+            "startup_ms": None,
+            "failures": [],
+            "wait_stats": None,
+            "traffic": None,
+            "cache": None,
+            "fetch": None,
+            "timings": None,
+            "completeness": None,
+            "changes": None
+        }
+        self.publish_status()
+        run_id = await asyncio.to_thread(store.start_run, provider_key)
+        started = time.perf_counter()
+        provider = self.providers.get(provider_key)
+        try:
+            tariffs = await provider.scrape(scraper)
+            run_status = scraper.run_status(provider_key)
+            if run_status == "partial":
+                ratio = scraper.completeness[provider_key]["ratio"]
+                raise IncompleteScrape(f"Eksik çekim: kartların %{round(ratio * 100)}'i okunabildi", tariffs)
+        except (Exception, asyncio.CancelledError) as e:
+            # Zaman aşımında iş iptal edilir; o ana kadar çekilenler yine de saklanır
+            partial = e.tariffs if isinstance(e, IncompleteScrape) else scraper.partial_results(provider)
+            status["status"] = "error"
+            status["message"] = f"Hata: {str(e) or type(e).__name__}"
+            status["timings"] = scraper.phases.summary(provider_key)
+            status["completeness"] = scraper.completeness.get(provider_key)
+            status["failures"] = scraper.failures.get(provider_key, [])
+            if partial:
+                status["message"] += f" ({len(partial)} kayıt kısmi olarak saklandı)"
+            self.record_run_metrics(scraper, provider_key, "partial" if partial else "error",
+                                    time.perf_counter() - started, len(partial))
+            await asyncio.to_thread(store.finish_run, run_id, "partial" if partial else "error", status["message"],
+                                    partial or None, status["timings"], status["completeness"])
+            await asyncio.to_thread(scraper.save_snapshots, provider_key, run_id)
+            self.publish_status()
+            raise
+
+        status["status"] = "completed"
+        status["message"] = f"{len(tariffs)} {provider_key} tarifesi başarıyla çekildi."
+        status["timings"] = scraper.phases.summary(provider_key)
+        status["completeness"] = scraper.completeness.get(provider_key)
+        self.record_run_metrics(scraper, provider_key, "completed", time.perf_counter() - started, len(tariffs))
+        # Run başına tek transaction ile yaz
+        status["changes"] = await asyncio.to_thread(
+            store.finish_run, run_id, "completed", status["message"], tariffs, status["timings"], status["completeness"]
+        )
+        await asyncio.to_thread(scraper.save_snapshots, provider_key, run_id)
+        for kind, count in status["changes"].items():
+            self.metrics.inc("tarife_changes_total", count, provider=provider_key, kind=kind)
+        if any(status["changes"].values()):
+            self.publish("changes", {"provider": provider_key, **status["changes"]})
+        status["count"] = len(tariffs)
+        status["startup_ms"] = scraper.startup_ms.get(provider_key)
+        status["failures"] = scraper.failures.get(provider_key, [])
+        status["wait_stats"] = scraper.wait_stats.get(provider_key)
+        status["traffic"] = scraper.traffic.get(provider_key)
+        status["cache"] = scraper.cache_stats.get(provider_key)
+        status["fetch"] = scraper.fetch_stats.get(provider_key)
+        status["shards"] = scraper.shard_stats.get(provider_key)
+        self.publish_status()
+        return tariffs
+
+    async def run_job(self, job) -> dict:
+        """Scheduler runner: scrape one provider with the shared browser pool."""
+        from scraper import TarifeScraper
+        scraper = TarifeScraper(
+            pool=self.get_browser_pool(),
+            force_refresh=job.options.get("force_refresh", False),
+            on_progress=lambda name, data: self.publish("progress", {"provider": name, **data})
+        )
+        tariffs = await self.scrape_provider(scraper, job.provider_key)
+        return {"count": len(tariffs), "failures": len(scraper.failures.get(job.provider_key, []))}
+
+    def job_changed(self, job):
+        """Mirror job state changes into the dashboard status and the event stream."""
+        last_scrape = self.last_scrape
+        self.publish("job", job.to_dict())
+        if not job.finished and last_scrape["status"] != "running":
+            # Yeni bir scrape dalgası başlıyor
+            last_scrape["status"] = "running"
+            last_scrape["message"] = f"{job.provider_key} scraper kuyruğa alındı..."
+            last_scrape["current_provider"] = job.provider_key
+            last_scrape["providers"] = {}
+        if job.finished and not self.scheduler.active(group=job.group):
+            asyncio.ensure_future(self.finish_group(job.group))
+        self.publish_status()
+
+    async def finish_group(self, group: str):
+        """Once every job of a group is done, write the Excel file and the final status."""
+        last_scrape = self.last_scrape
+        try:
+            jobs = self.scheduler.find(group=group)
+            completed = [job for job in jobs if job.status == "completed"]
+            count = sum(job.result["count"] for job in completed)
+
+            if count:
+                # Grubun operatörlerinin son snapshot'ı tek bir Excel dosyasında
+                latest = await asyncio.to_thread(self.store.latest)
+                tariffs = [t for job in reversed(completed) for t in latest.get(job.provider_key, [])]
+                output_path = self.config.get('output_file', 'tarifeler.xlsx')
+                started = time.perf_counter()
+                await asyncio.to_thread(write_xlsx, {"Tarifeler": tariffs}, output_path, False)
+                self.metrics.observe("tarife_scrape_phase_seconds", time.perf_counter() - started,
+                                     provider=jobs[0].provider_key if len(jobs) == 1 else "all", phase="excel")
+                print(f"💾 Excel dosyası kaydedildi: {output_path}")
+                if self.on_data_changed is not None:
+                    await self.on_data_changed()
+
+            errors = [job.provider_key for job in jobs if job.status != "completed"]
+            if len(jobs) == 1:
+                job = jobs[0]
+                last_scrape["current_provider"] = job.provider_key
+                last_scrape["startup_ms"] = last_scrape["providers"].get(job.provider_key, {}).get("startup_ms")
+                message = f"{count} {job.provider_key} tarifesi başarıyla çekildi." if completed else f"Hata: {job.error or job.status}"
+            else:
+                last_scrape["current_provider"] = "all"
+                message = f"{count} tarife {len(completed)} operatörden çekildi."
+                if errors:
+                    message += f" Hatalı: {', '.join(errors)}"
+            last_scrape["failures"] = [f for s in last_scrape["providers"].values() for f in s["failures"]]
+            last_scrape["message"] = message if completed or len(jobs) == 1 else "Hiçbir operatör çekilemedi."
+            if not self.scheduler.active():
+                last_scrape["timestamp"] = datetime.now().isoformat()
+                last_scrape["status"] = "completed" if completed else "error"
+        except Exception as e:
+            last_scrape["status"] = "error"
+            last_scrape["message"] = f"Hata: {str(e)}"
+            print(f"Scrape Error: {e}")
+        self.publish_status()
+
+
+class ScrapeWorker:
+    """Worker process side of the "worker" jobs mode.
+
+    Claims jobs the API processes put into the SQLite queue, runs them on its
+    own ScrapeEngine (and so its own Chromium), mirrors every job change back
+    into the queue and publishes its status, schedules, circuit breakers and
+    metrics to the `worker_state` table for the API processes to serve.
+    """
+
+    def __init__(self, config: dict, poll_seconds: float = None):
+        self.config = config
+        settings = config.get('jobs', {})
+        self.poll_seconds = poll_seconds or settings.get('poll_seconds', 1.0)
+        self.state_interval = settings.get('state_interval_seconds', 5.0)
+        self.queue = JobQueue.from_config(config)
+        self.engine = ScrapeEngine(
+            config, TariffStore.from_config(config), ProviderRegistry.from_config(config), publish=self._publish
+        )
+        self.engine.scheduler.on_change = self._job_changed
+        self.worker_id = f"{self.engine.scheduler.owner}:{uuid.uuid4().hex[:6]}"
+        self._last_state = 0.0
+        # Event loop SQLite'ı beklemesin: iş ve durum değişiklikleri biriktirilip her turda tek seferde yazılır
+        self._pending_jobs = {}
+        self._pending_states = {}
+
+    def _job_changed(self, job):
+        self._pending_jobs[job.id] = job.to_dict()
+        self.engine.job_changed(job)
+
+    def _publish(self, event: str, data: dict):
+        # SSE yayını API süreçlerinde; worker yalnızca son durumu ve son ilerlemeyi paylaşır
+        if event == "status":
+            self._pending_states["status"] = data
+        elif event == "progress":
+            self._pending_states[f"progress:{data['provider']}"] = data
+
+    def _write(self, jobs: dict, states: dict):
+        """Write the batched job rows and state entries (runs in a thread)."""
+        for data in jobs.values():
+            self.queue.save(data, self.worker_id)
+        for key, value in states.items():
+            self.queue.set_state(key, value)
+
+    async def flush(self):
+        """Write what changed since the last flush, off the event loop."""
+        if not self._pending_jobs and not self._pending_states:
+            return
+        jobs, states = self._pending_jobs, self._pending_states
+        self._pending_jobs, self._pending_states = {}, {}
+        await asyncio.to_thread(self._write, jobs, states)
+
+    def publish_state(self):
+        """Share schedules, breakers and metrics with the API processes; doubles as a heartbeat."""
+        self.queue.set_state("worker", {"id": self.worker_id, "heartbeat": datetime.now().isoformat()})
+        self.queue.set_state("schedules", self.engine.schedule_info())
+        self.queue.set_state("circuits", self.engine.circuits())
+        self.queue.set_state("metrics", self.engine.metrics_text())
+        self._last_state = time.monotonic()
+
+    def _read(self):
+        """Newly queued jobs and pending cancellations for this worker (runs in a thread)."""
+        return self.queue.claim(self.worker_id), self.queue.cancel_requests(self.worker_id)
+
+    async def poll(self):
+        """Hand newly queued jobs to the scheduler and forward cancellation requests."""
+        scheduler = self.engine.scheduler
+        rows, cancels = await asyncio.to_thread(self._read)
+        for row in rows:
+            job = scheduler.submit(row["provider"], row["trigger"], row["options"], row["group"], job_id=row["id"])
+            if job.id != row["id"]:
+                # Operatörün kuyrukta bekleyen işi zaten var; kopya iş çalıştırılmaz
+                self._pending_jobs[row["id"]] = {**row, "status": "skipped", "error": f"{job.id} işi zaten kuyrukta",
+                                                 "finished_at": datetime.now().isoformat()}
+        for job_id in cancels:
+            scheduler.cancel(job_id)
+
+    async def run(self):
+        """Poll the queue until cancelled."""
+        stranded = await asyncio.to_thread(self.queue.recover, self.worker_id)
+        if stranded:
+            print(f"⚠️ Önceki worker'dan yarım kalan {stranded} iş başarısız sayıldı")
+        await self.engine.start()
+        self._publish("status", self.engine.status_snapshot())
+        print(f"👷 Scrape worker başladı: {self.worker_id} (kuyruk: {self.queue.path})")
+        try:
+            while True:
+                await self.poll()
+                await self.flush()
+                if time.monotonic() - self._last_state >= self.state_interval:
+                    await asyncio.to_thread(self.publish_state)
+                await asyncio.sleep(self.poll_seconds)
+        finally:
+            await self.engine.stop()
+            await self.flush()
+            # Başlamamış işler bir sonraki worker'a kalır
+            await asyncio.to_thread(self.queue.release, self.worker_id)
@@ -0,0 +1,52 @@
+"""
+Events
+Scrape ilerlemesini server-sent events ile dashboard'a ileten basit yayın kanalı.
+"""
+
+import asyncio
+import json
+
+
+class EventBus:
+    """In-process pub/sub; each subscriber gets its own bounded queue."""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers = set()
+
+    def publish(self, event: str, data: dict):
+        """Send an event to every subscriber; slow subscribers drop their oldest events."""
+        message = (event, data)
+        for queue in list(self._subscribers):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(message)
+
+    async def subscribe(self, initial: list = (), keepalive: float = 15.0):
+        """Yield SSE-formatted messages until the client goes away.
+
+        `initial` (event, data) pairs are sent first, e.g. the current status snapshot.
+        """
+        queue = asyncio.Queue(self.max_queue)
+        self._subscribers.add(queue)
+        try:
+            yield "retry: 3000\n\n"
+            for event, data in initial:
+                yield self._format(event, data)
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    # Proxy'lerin bağlantıyı kapatmaması için yorum satırı gönder
+                    yield ": keepalive\n\n"
+                    continue
+                yield self._format(event, data)
+        finally:
+            self._subscribers.discard(queue)
+
+    @staticmethod
+    def _format(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
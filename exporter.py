@@ -0,0 +1,188 @@
+"""
+Exporter
+Tarife verilerini Excel (write-only), CSV ve Parquet olarak dışa aktarır.
+openpyxl ilk Excel yazımında import edilir; API açılışını yavaşlatmaz.
+"""
+
+import csv
+from datetime import datetime
+from pathlib import Path
+
+from tariffs import TariffColumns, format_amount
+
+
+HEADERS = ["Kategori", "Paket Adı", "İnternet (GB)", "Dakika", "SMS", "Fiyat (₺/ay)", "Taahhütsüz Fiyat (₺/ay)", "Kaynak", "Tarih"]
+FIELDS = ['category', 'name', 'gb', 'minutes', 'sms', 'price', 'no_commitment_price', 'provider', 'scraped_at']
+COLUMN_WIDTHS = {'A': 30, 'B': 40, 'C': 15, 'D': 12, 'E': 10, 'F': 15, 'G': 25, 'H': 12, 'I': 18}
+
+FORMATS = {
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    'csv': "text/csv; charset=utf-8",
+    'parquet': "application/vnd.apache.parquet",
+}
+
+# Sayfa adları Excel'de en fazla 31 karakter olabilir
+SHEET_TITLES = {
+    'vodafone': "Vodafone",
+    'turkcell': "Turkcell",
+    'turkcell_mevcut': "Turkcell (Mevcut)",
+}
+
+
+def _named_styles() -> tuple:
+    """Header and body styles shared by every cell instead of one Border object per cell."""
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    header = NamedStyle(name="tarife_header")
+    header.font = Font(bold=True, color="FFFFFF", size=12)
+    header.fill = PatternFill(start_color="E60000", end_color="E60000", fill_type="solid")
+    header.alignment = Alignment(horizontal="center", vertical="center")
+    header.border = border
+
+    body = NamedStyle(name="tarife_cell")
+    body.border = border
+    return header, body
+
+
+def _styled_row(ws, values, style: str) -> list:
+    from openpyxl.cell import WriteOnlyCell
+
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        cells.append(cell)
+    return cells
+
+
+def _row_values(tariff: dict, default_date: str) -> list:
+    return [
+        tariff.get('category', ''),
+        tariff.get('name', ''),
+        tariff.get('gb', ''),
+        tariff.get('minutes', ''),
+        tariff.get('sms', ''),
+        tariff.get('price', ''),
+        tariff.get('no_commitment_price', ''),
+        tariff.get('provider', 'Vodafone'),
+        (tariff.get('scraped_at') or default_date)[:16].replace('T', ' '),
+    ]
+
+
+def _write_tariff_sheet(wb, title: str, tariffs):
+    ws = wb.create_sheet(title[:31])
+    for column, width in COLUMN_WIDTHS.items():
+        ws.column_dimensions[column].width = width
+    ws.append(_styled_row(ws, HEADERS, "tarife_header"))
+    today = datetime.now().strftime("%Y-%m-%d %H:%M")
+    for tariff in tariffs:
+        ws.append(_styled_row(ws, _row_values(tariff, today), "tarife_cell"))
+
+
+def comparison_rows(datasets: dict) -> list:
+    """Cheapest tariff per GB level for each provider, like the dashboard's comparison view."""
+    best = {}
+    for key, tariffs in datasets.items():
+        columns = TariffColumns.from_records(tariffs)
+        for gb, index in columns.cheapest_by('gb').items():
+            best.setdefault(gb, {})[key] = (columns, index)
+    rows = []
+    # Sınırsız paketler (UNLIMITED) en sona düşer
+    for gb in sorted(best):
+        row = [int(gb) if gb.is_integer() else format_amount(gb)]
+        for key in datasets:
+            if key in best[gb]:
+                columns, index = best[gb][key]
+                tariff = columns.tariff(index).to_record()
+                row.extend([tariff['price'], tariff['name']])
+            else:
+                row.extend(['', ''])
+        rows.append(row)
+    return rows
+
+
+def write_xlsx(datasets: dict, output_path, comparison: bool = True):
+    """Stream `{provider_key: tariffs}` into a write-only workbook, one sheet per provider.
+
+    `tariffs` may be any iterable, so history exports can be fed straight from a DB cursor.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    header, body = _named_styles()
+    wb.add_named_style(header)
+    wb.add_named_style(body)
+
+    for key, tariffs in datasets.items():
+        _write_tariff_sheet(wb, SHEET_TITLES.get(key, key), tariffs)
+
+    if comparison and len(datasets) > 1:
+        ws = wb.create_sheet("Karşılaştırma")
+        ws.column_dimensions['A'].width = 15
+        headers = ["İnternet (GB)"]
+        for key in datasets:
+            title = SHEET_TITLES.get(key, key)
+            headers.extend([f"{title} Fiyat", f"{title} Paket"])
+        ws.append(_styled_row(ws, headers, "tarife_header"))
+        for row in comparison_rows(datasets):
+            ws.append(_styled_row(ws, row, "tarife_cell"))
+
+    wb.save(output_path)
+
+
+def write_csv(tariffs, output_path):
+    """Write tariffs to a UTF-8 CSV (with BOM so Excel shows Turkish characters)."""
+    today = datetime.now().strftime("%Y-%m-%d %H:%M")
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        for tariff in tariffs:
+            writer.writerow(_row_values(tariff, today))
+
+
+def write_parquet(tariffs, output_path, batch_size: int = 10000):
+    """Write tariffs to Parquet in batches; requires the optional `pyarrow` package."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet için pyarrow kurulu olmalı: pip install pyarrow")
+
+    schema = pa.schema([(field, pa.string()) for field in FIELDS])
+    with pq.ParquetWriter(str(output_path), schema) as writer:
+        batch = []
+        for tariff in tariffs:
+            batch.append({field: None if tariff.get(field) in (None, '') else str(tariff.get(field)) for field in FIELDS})
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+
+def cached_export(export_dir, name: str, version, fmt: str, build) -> Path:
+    """Return the export file for `version`, calling `build(path)` only if it does not exist yet.
+
+    Older versions of the same export are removed once a new one is written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Bilinmeyen format: {fmt}")
+    export_dir = Path(export_dir)
+    export_dir.mkdir(parents=True, exist_ok=True)
+    path = export_dir / f"{name}-v{version}.{fmt}"
+    if path.exists():
+        return path
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        build(tmp_path)
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    for old in export_dir.glob(f"{name}-v*.{fmt}"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
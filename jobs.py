@@ -0,0 +1,616 @@
+"""
+Jobs
+Scrape işlerini operatör bazlı kuyruklarda çalıştıran asyncio iş zamanlayıcısı.
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from resilience import CircuitBreaker
+
+
+FINISHED_STATES = ("completed", "failed", "cancelled", "skipped")
+
+CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 6),
+)
+
+
+class LockBusy(RuntimeError):
+    """Another worker holds the provider's scrape lock."""
+
+
+class CronSchedule:
+    """Five-field cron expression ("minute hour day month weekday"), weekday 0 = Sunday."""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron ifadesi 5 alan içermeli: {expression!r}")
+        self.fields = {}
+        for part, (name, low, high) in zip(parts, CRON_FIELDS):
+            self.fields[name] = self._parse(part, low, high, name)
+        # Standart cron: gün ve haftanın günü ikisi de kısıtlıysa biri eşleşmesi yeter
+        self._day_any = parts[2] == "*"
+        self._weekday_any = parts[4] == "*"
+
+    @staticmethod
+    def _parse(part: str, low: int, high: int, name: str) -> set:
+        values = set()
+        for item in part.split(","):
+            step = 1
+            if "/" in item:
+                item, step_text = item.split("/", 1)
+                step = int(step_text)
+            if item == "*":
+                start, end = low, high
+            elif "-" in item:
+                start, end = (int(v) for v in item.split("-", 1))
+            else:
+                start = end = int(item)
+            if name == "weekday":
+                # 7 de pazar olarak kabul edilir
+                high = 7
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Geçersiz cron alanı ({name}): {part!r}")
+            values.update(v % 7 if name == "weekday" else v for v in range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day = dt.day in self.fields["day"]
+        weekday = (dt.isoweekday() % 7) in self.fields["weekday"]
+        if self._day_any or self._weekday_any:
+            return day and weekday
+        return day or weekday
+
+    def matches(self, dt: datetime) -> bool:
+        return (
+            dt.minute in self.fields["minute"]
+            and dt.hour in self.fields["hour"]
+            and dt.month in self.fields["month"]
+            and self._day_matches(dt)
+        )
+
+    def next_after(self, dt: datetime):
+        """First matching minute strictly after `dt` (within a year), or None."""
+        candidate = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366)
+        while candidate < limit:
+            if candidate.month not in self.fields["month"] or not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.fields["hour"]:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute in self.fields["minute"]:
+                return candidate
+            candidate += timedelta(minutes=1)
+        return None
+
+
+class Job:
+    """One scrape of one provider, with its attempts and outcome."""
+
+    def __init__(self, provider_key: str, trigger: str = "manual", options: dict = None, group: str = None,
+                 job_id: str = None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.provider_key = provider_key
+        self.trigger = trigger          # manual | schedule | revalidate
+        self.options = options or {}    # ör. {"force_refresh": True}
+        self.group = group or self.id   # "all" ile birlikte gönderilen işler aynı grubu paylaşır
+        self.status = "queued"
+        self.attempts = 0
+        self.error = None
+        self.result = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.next_attempt_at = None
+        self._task = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "provider": self.provider_key,
+            "trigger": self.trigger,
+            "options": self.options,
+            "group": self.group,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "next_attempt_at": self.next_attempt_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        """Rebuild a job from `to_dict()` output (e.g. a row of the worker queue)."""
+        job = cls(data["provider"], data["trigger"], data["options"], data["group"], data["id"])
+        for field in ("status", "attempts", "error", "result", "created_at", "started_at", "finished_at",
+                      "next_attempt_at"):
+            setattr(job, field, data[field])
+        return job
+
+
+class JobScheduler:
+    """Runs scrape jobs one at a time per provider, with retries, timeouts, cancellation and cron schedules.
+
+    `runner(job)` does the actual scrape and returns a small result dict.
+    `lock` (e.g. store.ProviderLock) keeps other worker processes off the same provider.
+    `breaker` (resilience.CircuitBreaker) stops starting scrapes of a provider that keeps failing.
+    A schedule for "all" queues one job per key in `providers`.
+    """
+
+    def __init__(self, runner, providers: list = (), lock=None, max_attempts: int = 3, backoff_seconds: float = 30,
+                 backoff_max_seconds: float = 600, timeout_seconds: float = 900, history: int = 200,
+                 schedules: list = (), on_change=None, breaker: CircuitBreaker = None):
+        self.runner = runner
+        self.providers = list(providers)
+        self.lock = lock
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.timeout_seconds = timeout_seconds
+        self.history = history
+        self.breaker = breaker
+        # İş her durum değiştirdiğinde çağrılır: on_change(job)
+        self.on_change = on_change
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.schedules = []
+        for entry in schedules:
+            if entry["provider"] != "all" and entry["provider"] not in self.providers:
+                raise ValueError(f"Zamanlamada bilinmeyen operatör: {entry['provider']}")
+            self.schedules.append({
+                "provider": entry["provider"],
+                "cron": CronSchedule(entry["cron"]),
+                "options": {"force_refresh": entry.get("force", False)},
+            })
+        self.jobs = {}      # id -> Job, eskiden yeniye
+        self._queues = {}   # provider -> asyncio.Queue
+        self._workers = {}  # provider -> worker task
+        self._cron_task = None
+        self._running = False
+
+    @classmethod
+    def from_config(cls, config: dict, runner, providers: list, lock=None, on_change=None) -> "JobScheduler":
+        """Build a scheduler from the `jobs` section of config.json."""
+        settings = config.get('jobs', {})
+        return cls(
+            runner,
+            providers,
+            lock=lock,
+            max_attempts=settings.get('max_attempts', 3),
+            backoff_seconds=settings.get('backoff_seconds', 30),
+            backoff_max_seconds=settings.get('backoff_max_seconds', 600),
+            timeout_seconds=settings.get('timeout_seconds', 900),
+            history=settings.get('history', 200),
+            schedules=settings.get('schedules', []),
+            on_change=on_change,
+            breaker=CircuitBreaker.from_config(config),
+        )
+
+    async def start(self):
+        """Start the cron loop; provider workers start lazily on the first job."""
+        self._running = True
+        if self.schedules:
+            self._cron_task = asyncio.ensure_future(self._cron_loop())
+
+    async def stop(self):
+        """Cancel the cron loop, running jobs and workers."""
+        self._running = False
+        tasks = list(self._workers.values())
+        if self._cron_task is not None:
+            tasks.append(self._cron_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers.clear()
+        self._cron_task = None
+
+    def submit(self, provider_key: str, trigger: str = "manual", options: dict = None, group: str = None,
+               job_id: str = None) -> Job:
+        """Queue a scrape of `provider_key`; an already queued job for it is returned instead of a duplicate.
+
+        `job_id` keeps the id a job was given elsewhere (the worker queue).
+        """
+        for job in self.jobs.values():
+            if job.provider_key == provider_key and job.status == "queued":
+                return job
+
+        job = Job(provider_key, trigger, options, group, job_id)
+        self.jobs[job.id] = job
+        self._prune()
+        queue = self._queues.get(provider_key)
+        if queue is None:
+            queue = self._queues[provider_key] = asyncio.Queue()
+        queue.put_nowait(job)
+        worker = self._workers.get(provider_key)
+        if worker is None or worker.done():
+            self._workers[provider_key] = asyncio.ensure_future(self._worker(provider_key))
+        self._changed(job)
+        return job
+
+    def submit_group(self, provider_keys: list, trigger: str = "manual", options: dict = None) -> list[Job]:
+        """Queue one job per provider under a shared group id."""
+        group = uuid.uuid4().hex[:12]
+        return [self.submit(key, trigger, options, group) for key in provider_keys]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it already finished or does not exist."""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job._task is not None:
+            job._task.cancel()
+        else:
+            job.status = "cancelled"
+            job.finished_at = datetime.now().isoformat()
+            self._changed(job)
+        return True
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def find(self, provider_key: str = None, status: str = None, group: str = None) -> list[Job]:
+        """Jobs, newest first, optionally filtered."""
+        jobs = reversed(list(self.jobs.values()))
+        return [
+            job for job in jobs
+            if (provider_key is None or job.provider_key == provider_key)
+            and (status is None or job.status == status)
+            and (group is None or job.group == group)
+        ]
+
+    def active(self, group: str = None) -> list[Job]:
+        """Jobs that are queued, running or waiting for a retry."""
+        return [job for job in self.find(group=group) if not job.finished]
+
+    def circuits(self) -> dict:
+        """Circuit breaker state of the providers with recent failures."""
+        return self.breaker.describe() if self.breaker is not None else {}
+
+    def schedule_info(self) -> list[dict]:
+        """Configured schedules with their next run time."""
+        now = datetime.now()
+        info = []
+        for entry in self.schedules:
+            next_run = entry["cron"].next_after(now)
+            info.append({
+                "provider": entry["provider"],
+                "cron": entry["cron"].expression,
+                "options": entry["options"],
+                "next_run": next_run.isoformat() if next_run else None,
+            })
+        return info
+
+    def _changed(self, job: Job):
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(job)
+        except Exception as e:
+            print(f"⚠️ İş durumu bildirilemedi: {e}")
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond `history`."""
+        excess = len(self.jobs) - self.history
+        if excess <= 0:
+            return
+        for job_id in [job.id for job in self.jobs.values() if job.finished][:excess]:
+            del self.jobs[job_id]
+
+    async def _worker(self, provider_key: str):
+        """Run this provider's jobs one after another."""
+        queue = self._queues[provider_key]
+        while self._running:
+            job = await queue.get()
+            if job.status != "queued":
+                continue
+            job._task = asyncio.ensure_future(self._execute(job))
+            await job._task
+
+    async def _execute(self, job: Job):
+        """Run a job with timeout and exponential backoff between attempts."""
+        # Bu iş yarı açık devrenin deneme hakkını aldıysa ve sonucu henüz kaydedilmediyse True
+        trial = False
+        try:
+            while True:
+                half_open = self.breaker is not None and self.breaker.state(job.provider_key) == "half_open"
+                if self.breaker is not None and not self.breaker.allow(job.provider_key):
+                    # Devre açık: tarayıcı açılmadan iş atlanır (denemeleri sürerken açıldıysa başarısız sayılır)
+                    job.status = "failed" if job.attempts else "skipped"
+                    job.error = (f"Devre açık: {job.provider_key} {self.breaker.retry_at(job.provider_key)} "
+                                 f"tarihine kadar çekilmeyecek")
+                    break
+                trial = half_open
+                job.attempts += 1
+                job.status = "running"
+                job.started_at = datetime.now().isoformat()
+                job.next_attempt_at = None
+                self._changed(job)
+                try:
+                    job.result = await self._attempt(job)
+                    job.status = "completed"
+                    job.error = None
+                    self._record(job, True)
+                    trial = False
+                    break
+                except LockBusy as e:
+                    job.error = str(e)
+                    if self.breaker is not None:
+                        # Kilit yüzünden başlamayan run devre için sayılmaz
+                        self.breaker.release(job.provider_key)
+                    trial = False
+                    if job.trigger != "manual":
+                        # Aynı zamanlamayı / yenilemeyi başka bir worker zaten çalıştırıyor
+                        job.status = "skipped"
+                        break
+                except asyncio.TimeoutError:
+                    job.error = f"Zaman aşımı ({self.timeout_seconds} sn)"
+                    self._record(job, False)
+                    trial = False
+                except Exception as e:
+                    job.error = str(e) or type(e).__name__
+                    self._record(job, False)
+                    trial = False
+
+                if job.attempts >= self.max_attempts:
+                    job.status = "failed"
+                    break
+                delay = min(self.backoff_seconds * 2 ** (job.attempts - 1), self.backoff_max_seconds)
+                job.status = "retrying"
+                job.next_attempt_at = (datetime.now() + timedelta(seconds=delay)).isoformat()
+                print(f"🔁 {job.provider_key} işi {round(delay)} sn sonra tekrar denenecek: {job.error}")
+                self._changed(job)
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        finally:
+            if trial:
+                # İptal edilen deneme run'ı sonuç kaydetmedi; deneme hakkı geri verilmezse operatör hep bloklu kalır
+                self.breaker.release(job.provider_key)
+            job._task = None
+            job.finished_at = datetime.now().isoformat()
+            self._changed(job)
+
+    def _record(self, job: Job, ok: bool):
+        if self.breaker is None:
+            return
+        if ok:
+            self.breaker.record_success(job.provider_key)
+        else:
+            self.breaker.record_failure(job.provider_key)
+
+    async def _attempt(self, job: Job):
+        """One try: take the provider lock, then run the scrape within the timeout."""
+        owner = f"{self.owner}:{job.id}"
+        if self.lock is not None:
+            # Süreç ölürse kilit zaman aşımından sonra devralınabilir
+            acquired = await asyncio.to_thread(
+                self.lock.acquire, job.provider_key, owner, self.timeout_seconds + 60
+            )
+            if not acquired:
+                raise LockBusy(f"{job.provider_key} başka bir worker tarafından çekiliyor")
+        try:
+            return await asyncio.wait_for(self.runner(job), self.timeout_seconds)
+        finally:
+            if self.lock is not None:
+                await asyncio.to_thread(self.lock.release, job.provider_key, owner)
+
+    async def _cron_loop(self):
+        """Every minute, submit the jobs whose schedule matches."""
+        while True:
+            now = datetime.now()
+            await asyncio.sleep(60 - now.second - now.microsecond / 1_000_000)
+            minute = datetime.now().replace(second=0, microsecond=0)
+            for entry in self.schedules:
+                if entry["cron"].matches(minute):
+                    print(f"⏰ Zamanlanmış scrape: {entry['provider']} ({entry['cron'].expression})")
+                    keys = self.providers if entry["provider"] == "all" else [entry["provider"]]
+                    self.submit_group(keys, "schedule", dict(entry["options"]))
+
+
+
+class QueueClient:
+    """API-process side of the "worker" jobs mode.
+
+    Offers the job interface of `engine.ScrapeEngine`, but jobs go into the
+    SQLite queue (`store.JobQueue`) and run in the scrape worker process. A
+    poll loop mirrors the queue and the worker's shared state into memory,
+    so reads never touch the database, and turns what changed into
+    `publish(event, data)` calls ("job", "status", "progress").
+    `on_data_changed()` is awaited when a group of jobs finished with new data.
+    """
+
+    def __init__(self, queue, lock=None, publish=None, on_data_changed=None, poll_seconds: float = 1.0,
+                 stale_seconds: float = 60):
+        self.queue = queue
+        self.lock = lock
+        self.publish = publish or (lambda event, data: None)
+        self.on_data_changed = on_data_changed
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self.jobs = {}      # id -> Job, eskiden yeniye
+        self.state = {}     # worker'ın paylaştığı son durum: status, schedules, circuits, metrics, worker
+        self._seq = 0
+        self._state_at = 0.0
+        self._status_at = 0.0   # worker'ın "status" kaydını en son yazdığı an
+        self._submitted_at = 0.0
+        self._submitted_group = None
+        self._task = None
+
+    @classmethod
+    def from_config(cls, config: dict, queue, lock=None, publish=None, on_data_changed=None) -> "QueueClient":
+        settings = config.get('jobs', {})
+        return cls(queue, lock, publish, on_data_changed, settings.get('poll_seconds', 1.0),
+                   settings.get('worker_stale_seconds', 60))
+
+    async def start(self):
+        """Load the current queue and worker state, then start polling."""
+        jobs, states = await asyncio.to_thread(self._read)
+        for data in reversed(jobs):
+            self.jobs[data["id"]] = Job.from_dict(data)
+        self.state.update(states)
+        self._task = asyncio.ensure_future(self._poll_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def submit(self, provider_key: str, trigger: str = "manual", options: dict = None,
+                     group: str = None) -> Job:
+        """Queue a scrape for the worker; an already queued job of the provider is returned instead."""
+        # BEGIN IMMEDIATE worker yazarken busy timeout kadar bekleyebilir; event loop'ta çalışmamalı
+        data = await asyncio.to_thread(self.queue.enqueue, Job(provider_key, trigger, options, group).to_dict())
+        self._submitted_at = max(self._submitted_at, datetime.fromisoformat(data["created_at"]).timestamp())
+        self._submitted_group = data["group"]
+        return self._apply(data)
+
+    async def submit_group(self, provider_keys: list, trigger: str = "manual", options: dict = None) -> list[Job]:
+        group = uuid.uuid4().hex[:12]
+        return [await self.submit(key, trigger, options, group) for key in provider_keys]
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel an unclaimed job at once or ask the worker to cancel it."""
+        if not await asyncio.to_thread(self.queue.request_cancel, job_id):
+            return False
+        data = await asyncio.to_thread(self.queue.get, job_id)
+        if data is not None:
+            self._apply(data)
+        return True
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def find(self, provider_key: str = None, status: str = None, group: str = None) -> list[Job]:
+        """Jobs, newest first, optionally filtered."""
+        return [
+            job for job in reversed(list(self.jobs.values()))
+            if (provider_key is None or job.provider_key == provider_key)
+            and (status is None or job.status == status)
+            and (group is None or job.group == group)
+        ]
+
+    def active(self, group: str = None) -> list[Job]:
+        return [job for job in self.find(group=group) if not job.finished]
+
+    def schedule_info(self) -> list[dict]:
+        return self.state.get("schedules", [])
+
+    def circuits(self) -> dict:
+        return self.state.get("circuits", {})
+
+    def lock_holders(self) -> dict:
+        return self.lock.holders() if self.lock is not None else {}
+
+    def worker_info(self) -> dict:
+        """The worker's id and heartbeat, and whether it is considered alive."""
+        worker = dict(self.state.get("worker") or {})
+        heartbeat = worker.get("heartbeat")
+        age = (datetime.now() - datetime.fromisoformat(heartbeat)).total_seconds() if heartbeat else None
+        worker["alive"] = age is not None and age <= self.stale_seconds
+        return worker
+
+    def status_snapshot(self) -> dict:
+        """The worker's last published status, with the worker's liveness.
+
+        The stored status may predate the jobs submitted from here (it still says
+        "completed" for the previous run until the worker claims them), so while
+        jobs are unfinished, or until the worker writes again, the status comes
+        from the job queue instead.
+        """
+        status = dict(self.state.get("status") or {
+            "timestamp": None, "status": "idle", "message": "", "current_provider": None, "startup_ms": None,
+            "failures": [], "provider_status": {}, "jobs": [], "browser_pool": None,
+        })
+        active = self.active()
+        if active:
+            running = [job for job in active if job.status != "queued"]
+            job = (running or active)[-1]
+            status["status"] = "running" if running else "queued"
+            status["current_provider"] = job.provider_key
+            if not running:
+                status["message"] = f"{job.provider_key} scraper kuyruğa alındı..."
+        elif self._status_at < self._submitted_at:
+            # İşler bitti ama worker son durumu henüz yazmadı; hiçbiri başlamadıysa (kuyrukta iptal) yazmayacak
+            submitted = self.find(group=self._submitted_group)
+            if any(job.started_at for job in submitted):
+                status["status"] = "running"
+            elif submitted:
+                job = submitted[0]
+                status["status"] = "error"
+                status["current_provider"] = job.provider_key
+                status["message"] = f"Hata: {job.error or job.status}"
+        status["jobs"] = [job.to_dict() for job in active]
+        status["worker"] = self.worker_info()
+        return status
+
+    def metrics_text(self) -> str:
+        return self.state.get("metrics", "")
+
+    def _read(self):
+        """Queue rows and worker state written since the last poll (runs in a thread)."""
+        jobs, self._seq = self.queue.changes(self._seq)
+        states, written = self.queue.states(self._state_at)
+        self._state_at = max(written.values(), default=self._state_at)
+        self._status_at = written.get("status", self._status_at)
+        return jobs, states
+
+    def _apply(self, data: dict) -> Job:
+        """Merge one queue row into the in-memory mirror."""
+        job = self.jobs.get(data["id"])
+        if job is None:
+            job = self.jobs[data["id"]] = Job.from_dict(data)
+            excess = len(self.jobs) - self.queue.history
+            for job_id in [j.id for j in self.jobs.values() if j.finished][:max(0, excess)]:
+                del self.jobs[job_id]
+        else:
+            for field in ("status", "attempts", "error", "result", "started_at", "finished_at", "next_attempt_at"):
+                setattr(job, field, data[field])
+        return job
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                jobs, states = await asyncio.to_thread(self._read)
+            except Exception as e:
+                print(f"⚠️ İş kuyruğu okunamadı: {e}")
+                continue
+            finished_groups = set()
+            for data in jobs:
+                previous = self.jobs.get(data["id"])
+                was_finished = previous is not None and previous.finished
+                job = self._apply(data)
+                self.publish("job", job.to_dict())
+                if job.finished and not was_finished:
+                    finished_groups.add(job.group)
+            for key, value in states.items():
+                self.state[key] = value
+                if key.startswith("progress:"):
+                    self.publish("progress", value)
+            if jobs or "status" in states:
+                self.publish("status", self.status_snapshot())
+            # Worker grup bitince veriyi yazmış olur; API tarafı indeksini ısıtıp istemcilere duyurur
+            for group in finished_groups:
+                if self.on_data_changed is None or self.active(group=group):
+                    continue
+                if any(job.status == "completed" for job in self.find(group=group)):
+                    await self.on_data_changed()
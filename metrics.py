@@ -0,0 +1,124 @@
+"""
+Metrics
+Scrape aşamalarının süre ölçümü ve Prometheus formatında metrik kaydı.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Saniye cinsinden histogram sınırları; modal tıklamasından tam scrape'e kadar
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class PhaseTimer:
+    """Collects timing spans per (scrape, phase) for one scraper instance."""
+
+    def __init__(self):
+        self._spans = {}  # scrape -> phase -> [ms, ...]
+
+    def reset(self, scrape: str):
+        """Forget earlier spans of `scrape` (a new run is starting)."""
+        self._spans[scrape] = {}
+
+    def add(self, scrape: str, phase: str, ms: float):
+        self._spans.setdefault(scrape, {}).setdefault(phase, []).append(ms)
+
+    @contextmanager
+    def span(self, scrape: str, phase: str):
+        """Time the enclosed block, including any awaits inside it."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(scrape, phase, (time.perf_counter() - started) * 1000)
+
+    def spans(self, scrape: str) -> dict:
+        """Raw durations: {phase: [ms, ...]}."""
+        return self._spans.get(scrape, {})
+
+    def summary(self, scrape: str) -> dict:
+        """{phase: {count, total_ms, max_ms}} for one scrape."""
+        return {
+            phase: {
+                'count': len(values),
+                'total_ms': round(sum(values), 1),
+                'max_ms': round(max(values), 1),
+            }
+            for phase, values in self.spans(scrape).items()
+        }
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _le(bound) -> str:
+    return 'le="%s"' % bound
+
+
+class Metrics:
+    """Minimal in-process registry of labelled counters, gauges and histograms."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._meta = {}        # name -> (type, help)
+        self._values = {}      # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, help_text: str):
+        """Register a metric's type ("counter", "gauge" or "histogram") and help line."""
+        self._meta[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Add one observation (in seconds for durations) to a histogram."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name in sorted(set(self._values) | set(self._histograms)):
+                kind, help_text = self._meta.get(name, ("histogram" if name in self._histograms else "gauge", ""))
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(self._values.get(name, {}).items()):
+                    lines.append(f"{name}{_labels(key)} {value}")
+                for key, counts in sorted(self._histograms.get(name, {}).items()):
+                    for bound, count in zip(self.buckets, counts):
+                        lines.append(f"{name}_bucket{_labels(key, _le(bound))} {count}")
+                    lines.append(f"{name}_bucket{_labels(key, _le('+Inf'))} {counts[-1]}")
+                    lines.append(f"{name}_sum{_labels(key)} {round(counts[-2], 6)}")
+                    lines.append(f"{name}_count{_labels(key)} {counts[-1]}")
+        return "\n".join(lines) + "\n"
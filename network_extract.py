@@ -0,0 +1,182 @@
+"""
+Network Extract
+Operatör sayfalarının XHR/JSON yanıtlarından ve __NEXT_DATA__ içeriğinden tarife çıkarır.
+"""
+
+import asyncio
+import json
+import re
+
+
+# Anahtar adları küçük harfe çevrilerek karşılaştırılır
+NAME_KEYS = {'name', 'title', 'packagename', 'displayname', 'tariffname', 'offername'}
+PRICE_KEYS = {'price', 'amount', 'fee', 'monthlyprice', 'discountedprice', 'campaignprice', 'saleprice'}
+NO_COMMITMENT_KEYS = {'nocommitmentprice', 'withoutcommitmentprice', 'noncommitmentprice', 'taahhutsuzfiyat', 'listprice'}
+GB_KEYS = {'gb', 'data', 'internet', 'dataamount', 'internetamount'}
+MINUTE_KEYS = {'dk', 'minute', 'minutes', 'voice', 'voiceamount'}
+SMS_KEYS = {'sms', 'smsamount'}
+CATEGORY_KEYS = {'category', 'categoryname', 'group', 'groupname'}
+
+GB_RE = re.compile(r'(\d+)\s*GB', re.I)
+DK_RE = re.compile(r'(\d+)\s*(?:DK|Dakika)', re.I)
+SMS_RE = re.compile(r'(\d+)\s*SMS', re.I)
+NO_COMMITMENT_RE = re.compile(r'Taahhütsüz.*?(\d{2,4})\s*TL', re.I | re.S)
+
+
+class ResponseCapture:
+    """Collects JSON bodies of XHR/fetch responses seen by a Playwright page."""
+
+    def __init__(self):
+        self.payloads = []
+        self._pending = set()
+
+    def attach(self, page):
+        """Start listening to `page` responses; call before `page.goto`."""
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        task = asyncio.ensure_future(self._read(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _read(self, response):
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return
+        if 'json' not in response.headers.get('content-type', ''):
+            return
+        try:
+            self.payloads.append(await response.json())
+        except Exception:
+            pass
+
+    async def collect(self, page) -> list:
+        """Return captured payloads plus the page's embedded `__NEXT_DATA__` JSON."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        payloads = list(self.payloads)
+        next_data = await page.evaluate("""
+            () => {
+                const el = document.getElementById('__NEXT_DATA__');
+                return el ? el.textContent : null;
+            }
+        """)
+        if next_data:
+            try:
+                payloads.append(json.loads(next_data))
+            except ValueError:
+                pass
+        return payloads
+
+
+def extract_tariffs(payloads: list, provider: str) -> list[dict]:
+    """Find tariff-like objects in JSON payloads and map them to scraper records."""
+    results = []
+    seen = set()
+    for payload in payloads:
+        for record in _walk(payload, 'Diğer Tarifeler'):
+            key = (record['name'], record['gb'], record['price'])
+            if key in seen:
+                continue
+            seen.add(key)
+            record['provider'] = provider
+            results.append(record)
+    return results
+
+
+def _walk(node, category: str):
+    """Yield tariff records depth-first; dicts that look like tariffs are not descended."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk(item, category)
+        return
+    if not isinstance(node, dict):
+        return
+
+    record = _to_record(node, category)
+    if record:
+        yield record
+        return
+
+    # Tarife olmayan ama başlığı olan nesneler (ör. kategori grupları) alt düğümlere kategori verir
+    title = _first(node, NAME_KEYS | CATEGORY_KEYS)
+    child_category = title.strip() if isinstance(title, str) and 0 < len(title.strip()) < 60 else category
+    for value in node.values():
+        if isinstance(value, (dict, list)):
+            yield from _walk(value, child_category)
+
+
+def _to_record(node: dict, category: str):
+    """Map a dict to a tariff record, or return None when it does not look like one."""
+    name = _first(node, NAME_KEYS)
+    if not isinstance(name, str) or not 3 <= len(name.strip()) <= 80:
+        return None
+    price = _to_number(_first(node, PRICE_KEYS))
+    if not price:
+        return None
+
+    text = ' '.join(_leaf_strings(node))
+    gb = _amount(node, GB_KEYS, GB_RE, text)
+    if not gb:
+        return None
+
+    no_commitment = _to_number(_first(node, NO_COMMITMENT_KEYS))
+    if not no_commitment:
+        match = NO_COMMITMENT_RE.search(text)
+        no_commitment = int(match.group(1)) if match else None
+
+    own_category = _first(node, CATEGORY_KEYS)
+    return {
+        'category': own_category.strip() if isinstance(own_category, str) and own_category.strip() else category,
+        'name': name.strip()[:60],
+        'gb': gb,
+        'minutes': _amount(node, MINUTE_KEYS, DK_RE, text),
+        'sms': _amount(node, SMS_KEYS, SMS_RE, text),
+        'price': price,
+        'no_commitment_price': str(no_commitment) if no_commitment else '',
+    }
+
+
+def _first(node: dict, keys: set):
+    """Return the value of the first key of `node` whose lower-cased name is in `keys`."""
+    for key, value in node.items():
+        if key.lower() in keys and value not in (None, ''):
+            return value
+    return None
+
+
+def _amount(node: dict, keys: set, pattern, text: str) -> str:
+    """Read a GB/DK/SMS amount from a dedicated key, falling back to a text regex."""
+    value = _to_number(_first(node, keys))
+    if value:
+        return str(value)
+    match = pattern.search(text)
+    return match.group(1) if match else ''
+
+
+def _to_number(value):
+    """Parse ints, floats, Turkish-formatted strings ("1.250,00 TL") and {"amount": ..} dicts."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, dict):
+        return _to_number(_first(value, {'amount', 'value', 'price'}))
+    if isinstance(value, str):
+        match = re.search(r'\d[\d.]*(?:,\d+)?', value)
+        if match:
+            return int(float(match.group(0).replace('.', '').replace(',', '.')))
+    return None
+
+
+def _leaf_strings(node, depth: int = 0):
+    """Yield string leaves of `node` up to a small depth."""
+    if depth > 3:
+        return
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, dict):
+        for value in node.values():
+            yield from _leaf_strings(value, depth + 1)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _leaf_strings(value, depth + 1)
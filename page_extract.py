@@ -0,0 +1,318 @@
+"""
+Page Extract
+Arşivlenmiş liste, modal ve detay HTML'lerinden tarayıcısız tarife çıkarımı; kart script'lerinin Python karşılığı.
+"""
+
+import re
+from html.parser import HTMLParser
+
+from archive import read_snapshot
+from detail_fetch import is_complete, parse_document, turkcell_detail
+
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+# innerText'te satır sonu üreten etiketler (CSS düzeni bilinmediği için yaklaşık)
+BLOCK_TAGS = {'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt', 'fieldset', 'figure', 'footer',
+              'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre',
+              'section', 'table', 'tr', 'ul'}
+HIDDEN_TAGS = {'script', 'style', 'noscript', 'template', 'head', 'title'}
+
+VODAFONE_PRICE_RE = re.compile(r'(\d{2,4})\s*₺|₺\s*(\d{2,4})')
+GB_RE = re.compile(r'(\d+)\s*GB', re.I)
+DK_RE = re.compile(r'(\d+)\s*DK', re.I)
+SMS_RE = re.compile(r'(\d+)\s*SMS', re.I)
+NO_COMMITMENT_FEE_RE = re.compile(r'Taahhütsüz.*?(?:ücreti|Ücreti)\s*:?\s*(\d{2,4})\s*TL', re.I)
+NO_COMMITMENT_RE = re.compile(r'Taahhütsüz.*?(\d{2,4})\s*TL', re.I)
+DIGITS_RE = re.compile(r'(\d+)')
+
+
+class Node:
+    """Minimal DOM element: enough of the tree to replay the card scripts' queries."""
+
+    __slots__ = ('tag', 'attrs', 'parent', 'children')
+
+    def __init__(self, tag: str, attrs: dict = None, parent: "Node" = None):
+        self.tag = tag
+        self.attrs = attrs or {}
+        self.parent = parent
+        self.children = []  # Node ya da metin
+
+    def has_class(self, name: str) -> bool:
+        return name in (self.attrs.get('class') or "").split()
+
+    def elements(self):
+        return [child for child in self.children if isinstance(child, Node)]
+
+    def iter(self):
+        """Descendant elements in document order (like querySelectorAll)."""
+        for child in self.children:
+            if isinstance(child, Node):
+                yield child
+                yield from child.iter()
+
+    def find_all(self, predicate) -> list["Node"]:
+        return [node for node in self.iter() if predicate(node)]
+
+    def find(self, predicate):
+        return next((node for node in self.iter() if predicate(node)), None)
+
+    def closest(self, predicate):
+        node = self
+        while node is not None and node.tag != '#document':
+            if predicate(node):
+                return node
+            node = node.parent
+        return None
+
+    def text_content(self) -> str:
+        return "".join(child if isinstance(child, str) else child.text_content() for child in self.children)
+
+    def inner_text(self) -> str:
+        """Approximation of `innerText`: hidden elements dropped, block elements on their own lines."""
+        parts = []
+        self._inner_text(parts)
+        lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+        return "\n".join(line for line in lines if line)
+
+    def _inner_text(self, parts: list):
+        for child in self.children:
+            if isinstance(child, str):
+                parts.append(child)
+            elif child.tag == 'br':
+                parts.append("\n")
+            elif child.tag not in HIDDEN_TAGS:
+                block = child.tag in BLOCK_TAGS
+                if block:
+                    parts.append("\n")
+                child._inner_text(parts)
+                if block:
+                    parts.append("\n")
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node('#document')
+        self._current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {name: value or "" for name, value in attrs}, self._current)
+        self._current.children.append(node)
+        if tag not in VOID_TAGS:
+            self._current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self._current.children.append(Node(tag, {name: value or "" for name, value in attrs}, self._current))
+
+    def handle_endtag(self, tag):
+        node = self._current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            # Kapatılmamış iç etiketler de kapanır
+            self._current = node.parent
+
+    def handle_data(self, data):
+        self._current.children.append(data)
+
+
+def parse_html(html: str) -> Node:
+    """Parse a page (or an element's outerHTML) into a `Node` tree."""
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def _class(name: str):
+    return lambda node: node.has_class(name)
+
+
+def _button_with(node: Node, tags: tuple, text: str):
+    return node.find(lambda n: n.tag in tags and text in n.text_content())
+
+
+def vodafone_cards(listing_html: str, modals: dict) -> tuple[list[dict], int, int]:
+    """VODAFONE_CARDS_JS on an archived listing; `modals` maps card index to the modal's outerHTML.
+
+    Returns the records, the number of cards and the number of complete cards.
+    """
+    document = parse_html(listing_html)
+    results = []
+    complete_cards = 0
+    index = 0
+    for container in document.find_all(_class('css-1iqevk5')):
+        header = container.find(lambda n: n.tag == 'p')
+        category = header.text_content().strip() if header else 'Diğer Tarifeler'
+        buttons = container.find_all(lambda n: n.has_class('chakra-button') and 'Tarifeyi seç' in n.text_content())
+        for button in buttons:
+            position, index = index, index + 1
+            card = (button.closest(_class('css-1ir1t9b')) or button.closest(_class('css-0'))
+                    or button.parent.parent)
+            text = card.inner_text()
+            price_match = VODAFONE_PRICE_RE.search(text)
+            gb_match = GB_RE.search(text)
+            if not price_match or not gb_match:
+                continue
+            dk_match = DK_RE.search(text)
+            sms_match = SMS_RE.search(text)
+
+            lines = [line for line in text.split("\n") if line.strip()]
+            name = lines[0] if lines else ''
+            if len(name) < 5 or name.strip().isdigit():
+                for line in lines:
+                    if 5 < len(line) < 50 and '₺' not in line:
+                        name = line
+                        break
+
+            no_commitment_price = ''
+            complete = True
+            if _button_with(card, ('button',), 'Detayları gör') is not None:
+                modal = modals.get(position)
+                if modal is None:
+                    complete = False
+                else:
+                    modal_text = parse_html(modal).inner_text()
+                    match = NO_COMMITMENT_FEE_RE.search(modal_text) or NO_COMMITMENT_RE.search(modal_text)
+                    if match:
+                        no_commitment_price = match.group(1)
+
+            complete_cards += complete
+            results.append({
+                'category': category,
+                'name': name.strip()[:60],
+                'gb': gb_match.group(1),
+                'minutes': dk_match.group(1) if dk_match else '',
+                'sms': sms_match.group(1) if sms_match else '',
+                'price': int(price_match.group(1) or price_match.group(2)),
+                'no_commitment_price': no_commitment_price,
+                'provider': 'Vodafone',
+            })
+    return results, index, complete_cards
+
+
+def turkcell_cards(listing_html: str, modals: dict) -> tuple[list[dict], int, int]:
+    """TURKCELL_CARDS_JS on an archived listing; `modals` maps card index to the modal's outerHTML."""
+    cards = parse_html(listing_html).find_all(_class('molecules-teasy-card_m-teasy-card__Ly4fG'))
+    results = []
+    complete_cards = 0
+    for position, card in enumerate(cards):
+        def text_of(name):
+            node = card.find(_class(name))
+            return node.text_content().strip() if node else ''
+
+        name = text_of('molecules-teasy-card_m-teasy-card__title__h0CO1') or 'Turkcell Tarife'
+        badge = text_of('molecules-teasy-card_m-teasy-card__badge__nd1eJ')
+        lower_name, lower_badge = name.lower(), badge.lower()
+        category = 'Diğer Tarifeler'
+        if 'online' in lower_badge:
+            category = "Online'a Özel Tarifeler"
+        elif 'platinum' in lower_badge or 'platinum' in lower_name:
+            category = "Platinum Tarifeleri"
+        elif 'gnç' in lower_badge or 'gnç' in lower_name:
+            category = "GNÇ Tarifeleri"
+        elif badge:
+            category = badge + " Tarifeleri"
+
+        gb_match = DIGITS_RE.search(text_of('molecules-teasy-card_m-teasy-card__text__container__UY7Ei'))
+        dk_match = DIGITS_RE.search(text_of('molecules-teasy-card_m-teasy-card__subtext__3SrTQ'))
+        # '.atom-price_a-price__7lMAa span:first-child'
+        price_text = ''
+        price_el = card.find(_class('atom-price_a-price__7lMAa'))
+        if price_el is not None:
+            span = price_el.find(lambda n: n.tag == 'span' and n.parent.elements()[0] is n)
+            price_text = span.text_content().strip() if span else ''
+        digits = re.sub(r'\D', '', price_text)
+
+        sms = ''
+        complete = True
+        if _button_with(card, ('button', 'a'), 'DETAY') is not None:
+            modal = modals.get(position)
+            if modal is None:
+                complete = False
+            else:
+                match = SMS_RE.search(parse_html(modal).inner_text())
+                if match:
+                    sms = match.group(1)
+
+        complete_cards += complete
+        results.append({
+            'category': category,
+            'name': name,
+            'gb': gb_match.group(1) if gb_match else '',
+            'minutes': dk_match.group(1) if dk_match else '',
+            'sms': sms,
+            'price': int(digits) if digits else 0,
+            'no_commitment_price': '',
+            'provider': 'Turkcell',
+        })
+    return results, len(cards), complete_cards
+
+
+def turkcell_mevcut_record(data: dict) -> dict:
+    """Turn raw Turkcell detail-page fields into a Turkcell (Mevcut) record with its category."""
+    if data['price'] == 0 and data['no_commitment_price'] > 0:
+        data['price'] = data['no_commitment_price'] # Fallback
+
+    category = 'Diğer Tarifeler'
+    lowerName = data['name'].lower()
+    if 'platinum' in lowerName: category = 'Platinum Tarifeleri'
+    elif 'star' in lowerName: category = 'Star Tarifeleri'
+    elif 'esneyen' in lowerName: category = 'Esneyen Tarifeler'
+    elif 'gnç' in lowerName: category = 'GNÇ Tarifeleri'
+
+    return {
+        'category': category,
+        'name': data['name'],
+        'gb': data['gb'],
+        'minutes': data['minutes'],
+        'sms': data['sms'],
+        'price': data['price'],
+        'no_commitment_price': data['no_commitment_price'],
+        'provider': 'Turkcell (Mevcut)'
+    }
+
+
+def order_by_category(tariffs: list[dict]) -> list[dict]:
+    """Categories in first-seen order, each sorted by price (Vodafone's listing order)."""
+    grouped = {}
+    for tariff in tariffs:
+        grouped.setdefault(tariff['category'], []).append(tariff)
+    return [t for group in grouped.values() for t in sorted(group, key=lambda x: x['price'])]
+
+
+def order_by_price(tariffs: list[dict], unpriced_last: bool = False) -> list[dict]:
+    """Cheapest first; with `unpriced_last` tariffs without a price go to the end."""
+    if unpriced_last:
+        return sorted(tariffs, key=lambda x: x['price'] if x['price'] > 0 else 9999)
+    return sorted(tariffs, key=lambda x: x['price'])
+
+
+def reextract(root: str, provider_key: str, entries: list[dict]) -> dict:
+    """Re-run a provider's extraction on one archived run; safe to call in a worker process.
+
+    Returns {records, expected, complete}.
+    """
+    def html(entry):
+        return read_snapshot(root, entry['digest'])
+
+    listing = next((e for e in entries if e['kind'] == 'listing'), None)
+    modals = {e['position']: html(e) for e in entries if e['kind'] == 'modal'}
+    if provider_key in ('vodafone', 'turkcell'):
+        if listing is None:
+            return {'records': [], 'expected': 0, 'complete': 0}
+        extract = vodafone_cards if provider_key == 'vodafone' else turkcell_cards
+        records, expected, complete = extract(html(listing), modals)
+        order = order_by_category if provider_key == 'vodafone' else order_by_price
+        return {'records': order(records), 'expected': expected, 'complete': complete}
+    if provider_key == 'turkcell_mevcut':
+        details = sorted((e for e in entries if e['kind'] == 'detail'), key=lambda e: e['position'])
+        records = []
+        complete = 0
+        for entry in details:
+            data = turkcell_detail(parse_document(html(entry)))
+            complete += is_complete(data)
+            records.append(turkcell_mevcut_record(data))
+        return {'records': order_by_price(records, unpriced_last=True), 'expected': len(details),
+                'complete': complete}
+    raise ValueError(f"Arşivden yeniden çıkarım desteklenmiyor: {provider_key}")
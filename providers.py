@@ -0,0 +1,93 @@
+"""
+Providers
+config.json'daki `providers` bölümünden okunan operatör eklentileri.
+"""
+
+import importlib
+
+from tariffs import normalize
+
+
+class Provider:
+    """One operator: its URLs, scrape plugin and scrape settings from config.json.
+
+    `plugin` is "module:attribute", resolving to an async callable
+    `scrape(scraper, url) -> list[dict]`; a TarifeScraper method such as
+    "scraper:TarifeScraper.scrape_vodafone" fits that signature as is.
+    The module is imported on first use only.
+    """
+
+    def __init__(self, key: str, settings: dict):
+        self.key = key
+        self.settings = settings
+        self.name = settings.get('name', key)
+        self.urls = settings.get('urls') or ([settings['url']] if settings.get('url') else [])
+        self.plugin = settings.get('plugin', '')
+        self.enabled = settings.get('enabled', True)
+        self._scrape = None
+        if ':' not in self.plugin:
+            raise ValueError(f"{key}: plugin 'modül:nesne' biçiminde olmalı, bulunan: {self.plugin!r}")
+        if not self.urls:
+            raise ValueError(f"{key}: en az bir URL tanımlanmalı")
+
+    def load(self):
+        """Import the plugin module and return the scrape callable."""
+        if self._scrape is None:
+            module_name, _, attribute = self.plugin.partition(':')
+            target = importlib.import_module(module_name)
+            for part in attribute.split('.'):
+                target = getattr(target, part)
+            self._scrape = target
+        return self._scrape
+
+    async def scrape(self, scraper) -> list[dict]:
+        """Run the plugin on each of the provider's URLs and return the normalized results."""
+        scrape = self.load()
+        tariffs = []
+        for url in self.urls:
+            tariffs.extend(await scrape(scraper, url))
+        # Eklentiler ham kayıt döndürebilir; tipler burada tek biçime getirilir
+        return normalize(tariffs, self.name)
+
+    def describe(self) -> dict:
+        """Public view of the provider and the settings that shape its scrape."""
+        return {
+            "key": self.key,
+            "name": self.name,
+            "urls": self.urls,
+            "enabled": self.enabled,
+            "plugin": self.plugin,
+            "extraction": self.settings.get('extraction', 'dom'),
+            "wait_until": self.settings.get('wait_until'),
+            "concurrency": self.settings.get('concurrency'),
+            "rate_per_sec": self.settings.get('rate_per_sec'),
+            "burst": self.settings.get('burst'),
+            "freshness_ttl_hours": self.settings.get('freshness_ttl_hours', 12),
+        }
+
+
+class ProviderRegistry:
+    """Ordered set of providers, keyed like the `providers` section of config.json."""
+
+    def __init__(self, providers: list[Provider]):
+        self._providers = {provider.key: provider for provider in providers}
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ProviderRegistry":
+        return cls([Provider(key, settings) for key, settings in config.get('providers', {}).items()])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._providers
+
+    def __iter__(self):
+        return iter(self._providers.values())
+
+    def get(self, key: str) -> Provider:
+        return self._providers[key]
+
+    def keys(self) -> list[str]:
+        return list(self._providers)
+
+    def enabled(self) -> list[Provider]:
+        """Providers that "all" and the CLI scrape."""
+        return [provider for provider in self if provider.enabled]
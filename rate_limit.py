@@ -0,0 +1,55 @@
+"""
+Rate Limit
+Operatör sitelerine giden istekler için host bazlı token bucket.
+"""
+
+import asyncio
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and consume it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """One token bucket per host, created on first use; a rate of 0 (or None) means no limit."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        rate = rate or 0
+        if rate < 0:
+            raise ValueError(f"rate_per_sec negatif olamaz: {rate}")
+        if rate and capacity < 1:
+            raise ValueError(f"burst en az 1 olmalı: {capacity}")
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}
+
+    async def acquire(self, url: str):
+        """Wait for the bucket of the host that `url` points to."""
+        if not self.rate:
+            return
+        host = urlparse(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.capacity)
+        await bucket.acquire()
@@ -0,0 +1,129 @@
+"""
+Resilience
+Sayfa ve kart düzeyinde üstel geri çekilmeli yeniden deneme ve operatör bazlı devre kesici.
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime
+
+
+def backoff_delay(attempt: int, base_seconds: float, max_seconds: float) -> float:
+    """Delay before retry number `attempt` (1-based): doubling, capped, with up to 20% jitter."""
+    delay = min(base_seconds * 2 ** (attempt - 1), max_seconds)
+    return delay * random.uniform(0.8, 1.0)
+
+
+async def retry_async(operation, attempts: int = 3, base_seconds: float = 1.0, max_seconds: float = 10.0,
+                      on_retry=None):
+    """Await `operation()` up to `attempts` times, backing off between failures.
+
+    `on_retry(attempt, error, delay)` is called before each wait. The last error is re-raised.
+    """
+    attempts = max(1, attempts)
+    for attempt in range(1, attempts + 1):
+        try:
+            return await operation()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if attempt >= attempts:
+                raise
+            delay = backoff_delay(attempt, base_seconds, max_seconds)
+            if on_retry is not None:
+                on_retry(attempt, e, delay)
+            await asyncio.sleep(delay)
+
+
+def retry_settings(config: dict, provider_key: str = None) -> dict:
+    """The `retry` section of config.json, overridden by the provider's own `retry` block."""
+    settings = {
+        "page_attempts": 3,
+        "card_attempts": 2,
+        "backoff_seconds": 1.0,
+        "backoff_max_seconds": 8.0,
+        "min_completeness": 0.5,
+    }
+    settings.update(config.get('retry', {}))
+    if provider_key:
+        settings.update(config.get('providers', {}).get(provider_key, {}).get('retry', {}))
+    return settings
+
+
+class CircuitBreaker:
+    """Per-provider circuit breaker for scrape runs.
+
+    After `failure_threshold` consecutive failed runs the circuit opens and no
+    scrape (and so no browser) is started for `reset_seconds`. Then a single
+    trial run is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 1800, clock=time.time):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self._failures = {}     # operatör -> art arda başarısız run sayısı
+        self._opened_at = {}    # operatör -> devrenin açıldığı an
+        self._trials = set()    # yarı açık durumda deneme run'ı süren operatörler
+
+    @classmethod
+    def from_config(cls, config: dict) -> "CircuitBreaker":
+        """Build a breaker from the `circuit_failure_threshold` / `circuit_reset_seconds` job settings."""
+        settings = config.get('jobs', {})
+        return cls(settings.get('circuit_failure_threshold', 3), settings.get('circuit_reset_seconds', 1800))
+
+    def state(self, key: str) -> str:
+        """Current state of `key`: closed, open or half_open."""
+        opened_at = self._opened_at.get(key)
+        if opened_at is None:
+            return "closed"
+        if key in self._trials or self.clock() - opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self, key: str) -> bool:
+        """True if a run of `key` may start now; takes the trial slot when half-open."""
+        state = self.state(key)
+        if state == "closed":
+            return True
+        if state == "half_open" and key not in self._trials:
+            self._trials.add(key)
+            return True
+        return False
+
+    def retry_at(self, key: str):
+        """When an open circuit lets a trial run through (ISO timestamp), or None."""
+        opened_at = self._opened_at.get(key)
+        if opened_at is None:
+            return None
+        return datetime.fromtimestamp(opened_at + self.reset_seconds).isoformat(timespec="seconds")
+
+    def release(self, key: str):
+        """Give back a trial slot taken by `allow` when the run never started."""
+        self._trials.discard(key)
+
+    def record_success(self, key: str):
+        self._failures.pop(key, None)
+        self._opened_at.pop(key, None)
+        self._trials.discard(key)
+
+    def record_failure(self, key: str):
+        failures = self._failures[key] = self._failures.get(key, 0) + 1
+        if key in self._trials or failures >= self.failure_threshold:
+            if self._opened_at.get(key) is None or key in self._trials:
+                print(f"🚫 {key} için devre açıldı: {failures} başarısız run, "
+                      f"{round(self.reset_seconds)} sn boyunca scrape başlatılmayacak")
+            self._opened_at[key] = self.clock()
+            self._trials.discard(key)
+
+    def describe(self) -> dict:
+        """{provider: {state, failures, retry_at}} for providers with recent failures."""
+        return {
+            key: {
+                "state": self.state(key),
+                "failures": failures,
+                "retry_at": self.retry_at(key),
+            }
+            for key, failures in self._failures.items()
+        }
@@ -4,311 +4,965 @@ Vodafone Tarife Scraper
 Vodafone ve benzeri operatör sitelerinden tarife bilgilerini çekip Excel'e kaydeder.
 """
 
+import argparse
 import asyncio
+import hashlib
 import json
+import os
 import re
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from playwright.async_api import async_playwright
+import detail_fetch
+import page_extract
+from archive import SnapshotArchive
+from browser_pool import BrowserPool, PageTraffic, block_resources
+from detail_fetch import DetailFetcher, is_complete, parse_document, turkcell_detail
+from exporter import write_xlsx
+from metrics import PhaseTimer
+from network_extract import ResponseCapture, extract_tariffs
+from providers import ProviderRegistry
+from rate_limit import HostRateLimiter
+from resilience import retry_async, retry_settings
+from store import DetailCache, TariffStore
+from tariffs import diff, normalize
+
+
+# Sabit beklemeler yerine MutationObserver ile olay bazlı bekleme yardımcıları.
+# Her bekleme eski sabit bekleme süresiyle sınırlıdır; `stats` kazanılan süreyi ve kart başına modal süresini tutar.
+WAIT_HELPERS_JS = """
+() => {
+    if (window.__tarife) return;
+    const stats = { waits: 0, waited_ms: 0, budget_ms: 0, timeouts: 0, modal_ms: [],
+                    cards_expected: 0, cards_complete: 0, card_retries: 0, card_errors: [] };
+    
+    const isVisible = el => !!el && el.isConnected && el.getClientRects().length > 0;
+    
+    const waitFor = (check, timeout) => new Promise(resolve => {
+        const started = performance.now();
+        stats.waits++;
+        stats.budget_ms += timeout;
+        
+        let observer = null;
+        let timer = null;
+        const finish = (value, timedOut) => {
+            if (observer) observer.disconnect();
+            if (timer) clearTimeout(timer);
+            stats.waited_ms += performance.now() - started;
+            if (timedOut) stats.timeouts++;
+            resolve(value);
+        };
+        
+        const initial = check();
+        if (initial) return finish(initial, false);
+        
+        observer = new MutationObserver(() => {
+            const value = check();
+            if (value) finish(value, false);
+        });
+        observer.observe(document.body, { childList: true, subtree: true, attributes: true, characterData: true });
+        timer = setTimeout(() => finish(check() || null, true), timeout);
+    });
+    
+    window.__tarife = {
+        stats,
+        partial: [],
+        // Arşiv açıksa kart indeksi -> okunan modalın outerHTML'i
+        snapshots: {},
+        isVisible,
+        waitFor,
+        lastVisible: selector => {
+            const els = Array.from(document.querySelectorAll(selector)).filter(isVisible);
+            return els[els.length - 1] || null;
+        },
+        waitForGone: (el, timeout) => waitFor(() => !isVisible(el), timeout),
+        waitForCount: async (selector, previous, timeout) => {
+            const count = () => document.querySelectorAll(selector).length;
+            return (await waitFor(() => count() > previous ? count() : 0, timeout)) || count();
+        }
+    };
+}
+"""
+
+# Vodafone kartlarını okuyan, her kart için detay modalını açıp taahhütsüz fiyatı alan script.
+# Okunamayan kart `options.attempts` kez, her seferinde iki katı beklemeyle yeniden denenir;
+# son denemede modal yine açılmazsa kart taahhütsüz fiyatsız (eksik) olarak eklenir.
+# `options.enumerate` ile modal açmadan yalnızca kart anahtarlarını listeler; `options.positions`
+# (anahtar -> kart indeksi) verilirse sadece o kartları okur (paralel context'lere bölme).
+VODAFONE_CARDS_JS = """
+async (options) => {
+    const results = [];
+    const stats = window.__tarife.stats;
+    // Çalıştırma yarıda kalırsa Python tarafı kısmi sonuçları buradan okur
+    window.__tarife.partial = results;
+    const attempts = Math.max(1, options.attempts || 1);
+    const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+    const containers = document.querySelectorAll('.css-1iqevk5');
+    const cardOf = btn => btn.closest('.css-1ir1t9b') || btn.closest('.css-0') || btn.parentElement.parentElement;
+    
+    // Sayfa sırasıyla tüm kartlar; anahtar kategori + kart metninden oluşur, böylece
+    // başka bir context'te yüklenen aynı sayfada da aynı kart bulunur
+    const cards = [];
+    const seen = {};
+    for (const container of containers) {
+        const headerEl = container.querySelector('p');
+        const categoryName = headerEl ? headerEl.textContent.trim() : 'Diğer Tarifeler';
+        const selectBtns = Array.from(container.querySelectorAll('.chakra-button')).filter(b => b.textContent.includes('Tarifeyi seç'));
+        for (const btn of selectBtns) {
+            const base = categoryName + '|' + (cardOf(btn).innerText || '').replace(/\\s+/g, ' ').trim().substring(0, 200);
+            seen[base] = (seen[base] || 0) + 1;
+            cards.push({ btn, categoryName, key: base + '#' + seen[base] });
+        }
+    }
+    if (options.enumerate) return cards.map(c => ({ key: c.key, category: c.categoryName }));
+    
+    const readCard = async (btn, categoryName, index, final) => {
+        const card = cardOf(btn);
+        const text = card.innerText || '';
+        
+        // Temel bilgiler
+        const priceMatch = text.match(/(\\d{2,4})\\s*₺|₺\\s*(\\d{2,4})/);
+        const gbMatch = text.match(/(\\d+)\\s*GB/i);
+        const dkMatch = text.match(/(\\d+)\\s*DK/i);
+        const smsMatch = text.match(/(\\d+)\\s*SMS/i);
+        
+        if (!priceMatch || !gbMatch) throw new Error('Fiyat veya GB okunamadı');
+        const price = parseInt(priceMatch[1] || priceMatch[2]);
+        const gb = gbMatch[1];
+        const dk = dkMatch ? dkMatch[1] : '';
+        const sms = smsMatch ? smsMatch[1] : '';
+        
+        const lines = text.split('\\n').filter(l => l.trim());
+        let name = lines[0] || '';
+        if (name.length < 5 || /^\\d+$/.test(name.trim())) {
+            for (const line of lines) {
+                if (line.length > 5 && line.length < 50 && !line.includes('₺')) {
+                    name = line;
+                    break;
+                }
+            }
+        }
+
+        // Detayları gör butonunu bul ve tıkla
+        let noCommitmentPrice = '';
+        let complete = true;
+        const detailBtn = Array.from(card.querySelectorAll('button')).find(b => b.textContent.includes('Detayları gör'));
+        
+        if (detailBtn) {
+            const modalStarted = performance.now();
+            detailBtn.click();
+            // Modalın içeriği gelene kadar bekle (en fazla 1800 ms)
+            const modalSelector = '[role="dialog"], .modal-content, [class*="Modal_content"]';
+            const lastModal = () => {
+                const modals = Array.from(document.querySelectorAll(modalSelector));
+                return modals[modals.length - 1];
+            };
+            
+            // Sayfadaki en son açılan veya görünür olan modalı yakala
+            const modal = await window.__tarife.waitFor(() => {
+                const m = window.__tarife.lastVisible(modalSelector);
+                return m && /Taahhütsüz.*?\\d{2,4}\\s*TL/is.test(m.innerText) ? m : null;
+            }, 1800) || lastModal();
+            window.__tarife.stats.modal_ms.push(performance.now() - modalStarted);
+            
+            if (modal) {
+                if (options.snapshots) window.__tarife.snapshots[index] = modal.outerHTML;
+                const modalText = modal.innerText;
+                // Kullanıcının belirttiği "Taahhütsüz Aylık Tarife Ücreti" keywordünü 
+                // ve diğer varyasyonları (küçük/büyük harf, boşluklar) regex ile arıyoruz.
+                const tcMatch = modalText.match(/Taahhütsüz.*?(?:ücreti|Ücreti)\\s*:?\\s*(\\d{2,4})\\s*TL/i) || 
+                               modalText.match(/Taahhütsüz.*?(\\d{2,4})\\s*TL/i);
+                
+                if (tcMatch) {
+                    noCommitmentPrice = tcMatch[1];
+                }
+                
+                // Kapatma butonu - Vodafone modal yapısına özel alternatifler
+                const closeBtn = modal.querySelector('button[aria-label="Close"]') || 
+                               Array.from(modal.querySelectorAll('button, span, i')).find(b => 
+                                    b.innerText === '✕' || b.innerText === 'X' || 
+                                    b.innerText.includes('Kapat') || 
+                                    b.className.includes('close')
+                               );
+                if (closeBtn) {
+                    closeBtn.click();
+                    await window.__tarife.waitForGone(modal, 800);
+                }
+            } else if (!final) {
+                throw new Error('Detay modalı açılmadı');
+            } else {
+                complete = false;
+            }
+        }
+        
+        return {
+            complete,
+            record: {
+                category: categoryName,
+                name: name.trim().substring(0, 60),
+                gb: gb,
+                minutes: dk,
+                sms: sms,
+                price: price,
+                no_commitment_price: noCommitmentPrice,
+                provider: 'Vodafone'
+            }
+        };
+    };
+    
+    for (let i = 0; i < cards.length; i++) {
+        const { btn, categoryName, key } = cards[i];
+        const index = options.positions ? options.positions[key] : i;
+        if (index === undefined) continue;
+        stats.cards_expected++;
+        for (let attempt = 1; attempt <= attempts; attempt++) {
+            try {
+                const { record, complete } = await readCard(btn, categoryName, index, attempt === attempts);
+                // Parçalardan gelen sonuçlar Python tarafında kart indeksine göre birleştirilir
+                if (options.positions) record.card_index = index;
+                results.push(record);
+                if (complete) stats.cards_complete++;
+                break;
+            } catch (e) {
+                if (attempt === attempts) {
+                    stats.card_errors.push({ card: `${categoryName} #${index + 1}`, index, error: String(e.message || e) });
+                } else {
+                    stats.card_retries++;
+                    await sleep(options.backoffMs * 2 ** (attempt - 1));
+                }
+            }
+        }
+    }
+    return results;
+}
+"""
+
+# Turkcell kartlarını okuyan, detay modalından SMS bilgisini alan script; yeniden deneme Vodafone'daki gibi
+TURKCELL_CARDS_JS = """
+async (options) => {
+    const results = [];
+    const stats = window.__tarife.stats;
+    window.__tarife.partial = results;
+    const attempts = Math.max(1, options.attempts || 1);
+    const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+    // Turkcell kart seçici
+    const cards = document.querySelectorAll('.molecules-teasy-card_m-teasy-card__Ly4fG');
+    
+    const readCard = async (card, index, final) => {
+        const titleEl = card.querySelector('.molecules-teasy-card_m-teasy-card__title__h0CO1');
+        const name = titleEl?.textContent?.trim() || 'Turkcell Tarife';
+        const badgeEl = card.querySelector('.molecules-teasy-card_m-teasy-card__badge__nd1eJ');
+        const badgeText = badgeEl?.textContent?.trim() || '';
+        
+        // Kategori belirleme mantığı
+        let category = 'Diğer Tarifeler';
+        const lowerName = name.toLowerCase();
+        const lowerBadge = badgeText.toLowerCase();
+        
+        if (lowerBadge.includes('online')) {
+            category = "Online'a Özel Tarifeler";
+        } else if (lowerBadge.includes('platinum') || lowerName.includes('platinum')) {
+            category = "Platinum Tarifeleri";
+        } else if (lowerBadge.includes('gnç') || lowerName.includes('gnç')) {
+            category = "GNÇ Tarifeleri";
+        } else if (badgeText) {
+            category = badgeText + " Tarifeleri";
+        }
+        
+        const gbText = card.querySelector('.molecules-teasy-card_m-teasy-card__text__container__UY7Ei')?.textContent?.trim() || '';
+        const dkText = card.querySelector('.molecules-teasy-card_m-teasy-card__subtext__3SrTQ')?.textContent?.trim() || '';
+        const priceText = card.querySelector('.atom-price_a-price__7lMAa span:first-child')?.textContent?.trim() || '';
+        
+        // Sayılar temizle
+        const gb = gbText.match(/(\\d+)/)?.[1] || '';
+        const price = parseInt(priceText.replace(/\\D/g, '')) || 0;
+        const dk = dkText.match(/(\\d+)/)?.[1] || '';
+        
+        let sms = '';
+        let complete = true;
+        
+        // Detay modalını açıp SMS bilgisi almayı dene
+        const detailBtn = Array.from(card.querySelectorAll('button, a')).find(el => el.textContent.includes('DETAY'));
+        if (detailBtn) {
+            const modalStarted = performance.now();
+            detailBtn.click();
+            // SMS bilgisi görünene kadar bekle (en fazla 1200 ms)
+            const modal = await window.__tarife.waitFor(() => {
+                const m = window.__tarife.lastVisible('.ant-modal-content');
+                return m && /\\d+\\s*SMS/i.test(m.innerText) ? m : null;
+            }, 1200) || window.__tarife.lastVisible('.ant-modal-content');
+            window.__tarife.stats.modal_ms.push(performance.now() - modalStarted);
+            if (modal) {
+                if (options.snapshots) window.__tarife.snapshots[index] = modal.outerHTML;
+                const modalText = modal.innerText;
+                const smsMatch = modalText.match(/(\\d+)\\s*SMS/i);
+                if (smsMatch) sms = smsMatch[1];
+                
+                // Modalı kapat
+                const closeBtn = Array.from(modal.querySelectorAll('button, span, div')).find(el => el.textContent.trim() === 'Vazgeç' || el.classList.contains('ant-modal-close'));
+                if (closeBtn) {
+                    closeBtn.click();
+                    await window.__tarife.waitForGone(modal, 500);
+                }
+            } else if (!final) {
+                throw new Error('Detay modalı açılmadı');
+            } else {
+                complete = false;
+            }
+        }
+        
+        return {
+            complete,
+            record: {
+                category: category,
+                name: name,
+                gb: gb,
+                minutes: dk,
+                sms: sms,
+                price: price,
+                no_commitment_price: '',
+                provider: 'Turkcell'
+            }
+        };
+    };
+    
+    for (const card of cards) {
+        stats.cards_expected++;
+        for (let attempt = 1; attempt <= attempts; attempt++) {
+            try {
+                const { record, complete } = await readCard(card, stats.cards_expected - 1, attempt === attempts);
+                results.push(record);
+                if (complete) stats.cards_complete++;
+                break;
+            } catch (e) {
+                if (attempt === attempts) {
+                    stats.card_errors.push({ card: `#${stats.cards_expected}`, error: String(e.message || e) });
+                } else {
+                    stats.card_retries++;
+                    await sleep(options.backoffMs * 2 ** (attempt - 1));
+                }
+            }
+        }
+    }
+    return results;
+}
+"""
+
+# Turkcell detay sayfasından paket bilgilerini okuyan script
+TURKCELL_DETAIL_JS = """
+() => {
+    const name = document.querySelector('h1')?.textContent?.trim() || 
+                 document.querySelector('h2')?.textContent?.trim() || 'Turkcell Tarife';
+    
+    let gb = '', dk = '', sms = '';
+    // Daha geniş bir seçici grubu
+    const elements = Array.from(document.querySelectorAll('h1, h2, h3, p, div[class*="packageName"]'));
+    elements.forEach(el => {
+        const txt = el.innerText.toUpperCase();
+        if (/^\\d+\\s*GB$/i.test(txt) || (txt.includes('GB') && txt.length < 15)) {
+            gb = txt.replace('GB', '').trim();
+        } else if (txt.includes('DK') && txt.length < 15) {
+            dk = txt.replace('DK', '').trim();
+        } else if (txt.includes('SMS') && txt.length < 15) {
+            sms = txt.replace('SMS', '').trim();
+        }
+    });
+    
+    let price = 0;
+    let noCommitmentPrice = 0;
+    
+    // Fiyatları sayfa metni içinde ara
+    const bodyText = document.body.innerText;
+    
+    // Yıllık Taahhütlü Fiyat
+    const annualMatch = bodyText.match(/Yıllık\\s*Abonelik.*?(\\d+)\\s*TL/is);
+    if (annualMatch) price = parseInt(annualMatch[1]);
+    
+    // Aylık Taahhütsüz Fiyat
+    const monthlyMatch = bodyText.match(/Aylık\\s*Abonelik.*?(\\d+)\\s*TL/is);
+    if (monthlyMatch) noCommitmentPrice = parseInt(monthlyMatch[1]);
+    
+    // Alternatif: Radyo butonlarından çekmeyi dene (görseldeki yapı)
+    const priceLabels = Array.from(document.querySelectorAll('label, .ant-radio-wrapper'));
+    priceLabels.forEach(label => {
+        const lText = label.innerText.toUpperCase();
+        const pMatch = label.innerText.match(/(\\d+)\\s*TL/i);
+        if (pMatch) {
+            const val = parseInt(pMatch[1]);
+            if (lText.includes('YILLIK')) price = val;
+            else if (lText.includes('AYLIK')) noCommitmentPrice = val;
+        }
+    });
+
+    return {
+        name: name,
+        gb: gb,
+        minutes: dk,
+        sms: sms,
+        price: price,
+        no_commitment_price: noCommitmentPrice
+    };
+}
+"""
 
 
 class TarifeScraper:
     """Web scraper for mobile tariff data."""
     
-    def __init__(self, config_path: str = "config.json"):
-        self.config = self._load_config(config_path)
+    def __init__(self, config_path: str = None, pool: BrowserPool = None, force_refresh: bool = False,
+                 on_progress=None, context_setup=None):
+        # Yol verilmezse sunucuyla aynı config kullanılır (TARIFE_CONFIG ya da çalışma dizinindeki config.json)
+        self.config = self._load_config(config_path or os.environ.get("TARIFE_CONFIG") or "config.json")
         self.tariffs = []
+        self.pool = pool
+        # True ise detay sayfası önbelleği okunmaz, her link yeniden çekilir
+        self.force_refresh = force_refresh
+        # İlerleme bildirimi: on_progress(scrape_name, data) (ör. SSE yayını)
+        self.on_progress = on_progress
+        # Yeni açılan her context için çağrılır: await context_setup(scrape_name, context)
+        # (ör. benchmark'ta HAR kaydı/tekrarı)
+        self.context_setup = context_setup
+        # Scrape başına tarayıcı context'inin hazır olma süresi (ms)
+        self.startup_ms = {}
+        # Scrape başına çekilemeyen linkler ve hata mesajları
+        self.failures = {}
+        # Scrape başına olay bazlı beklemelerin özeti
+        self.wait_stats = {}
+        self._skipped_wait_ms = {}
+        # Scrape başına aktarılan byte, yükleme süresi ve engellenen istek sayısı
+        self.traffic = {}
+        self._page_traffic = {}
+        # Scrape başına detay sayfası önbelleği isabet/ıskalama sayıları
+        self.cache_stats = {}
+        self._detail_cache = None
+        # Scrape başına HTTP ile çekilen / Chromium'a düşen detay sayfası sayıları
+        self.fetch_stats = {}
+        # Scrape başına aşama süreleri (goto, scroll, modal, detail, excel...)
+        self.phases = PhaseTimer()
+        # Scrape başına beklenen / eksiksiz çekilen kart sayısı ve oranı
+        self.completeness = {}
+        # Scrape başına o ana kadar çekilen kayıtlar; scrape yarıda kalırsa bunlar saklanır
+        self.checkpoints = {}
+        # Ham sayfa arşivi (config.json `archive.enabled`) ve scrape başına arşivlenen sayfalar
+        self.archive = SnapshotArchive.from_config(self.config)
+        self.snapshots = {}
+        # Scrape başına kart çıkarımının parçaları: kart sayısı, süre ve hata (config.json `shards`)
+        self.shard_stats = {}
+        # Açık scrape'lerin context havuzu; ek parça context'leri de buradan kiralanır
+        self._pools = {}
         
     def _load_config(self, path: str) -> dict:
         """Load configuration from JSON file."""
         with open(path, 'r', encoding='utf-8') as f:
             return json.load(f)
+
+    def _settings(self, scrape_name: str) -> dict:
+        """The provider's section under `providers` in config.json."""
+        return self.config.get('providers', {}).get(scrape_name, {})
+
+    @asynccontextmanager
+    async def _browser_context(self, scrape_name: str, **context_options):
+        """Lease a browser context from the shared pool, or a private one-off pool."""
+        pool = self.pool
+        own_pool = pool is None
+        if own_pool:
+            pool = BrowserPool.from_config(self.config)
+
+        self.phases.reset(scrape_name)
+        self.checkpoints[scrape_name] = []
+        self.snapshots[scrape_name] = []
+        self.completeness.pop(scrape_name, None)
+        self.traffic[scrape_name] = {'pages': 0, 'bytes': 0, 'load_ms': 0.0, 'blocked': 0}
+        self._pools[scrape_name] = pool
+        started = time.perf_counter()
+        try:
+            async with self._pool_context(pool, scrape_name, **context_options) as context:
+                self.startup_ms[scrape_name] = round((time.perf_counter() - started) * 1000, 1)
+                self.phases.add(scrape_name, "context", self.startup_ms[scrape_name])
+                print(f"⏱️ Tarayıcı hazır: {self.startup_ms[scrape_name]} ms")
+                yield context
+        finally:
+            self._pools.pop(scrape_name, None)
+            if own_pool:
+                await pool.stop()
+
+    @asynccontextmanager
+    async def _pool_context(self, pool: BrowserPool, scrape_name: str, **context_options):
+        """Lease a context with the provider's resource blocking and `context_setup` applied."""
+        async with pool.context(**context_options) as context:
+            settings = self._settings(scrape_name)
+            if settings.get('block_resources') or settings.get('block_domains'):
+                await block_resources(
+                    context,
+                    settings.get('block_resources', []),
+                    settings.get('block_domains', []),
+                    self.traffic[scrape_name]
+                )
+            if self.context_setup is not None:
+                await self.context_setup(scrape_name, context)
+            yield context
     
-    async def scrape_vodafone(self, url: str) -> list[dict]:
-        """Scrape tariff data from Vodafone website."""
-        tariffs = []
+    async def _new_page(self, context):
+        """Open a page whose transferred bytes are measured."""
+        page = await context.new_page()
+        self._page_traffic[page] = PageTraffic(page)
+        page.on("close", lambda p: self._page_traffic.pop(p, None))
+        return page
+
+    async def _goto(self, page, scrape_name: str, url: str, ready_selector: str = None,
+                    wait_until: str = "networkidle", timeout: int = 30000, ready_timeout: int = 20000):
+        """Navigate, wait for `ready_selector` and log bytes transferred and load time.
+
+        `wait_until` is only the default; config.json can override it per provider.
+        Returns `(response, ready)`; `ready` is False if `ready_selector` did not appear in time.
+        """
+        wait_until = self._settings(scrape_name).get('wait_until', wait_until)
+        meter = self._page_traffic.get(page)
+        bytes_before = meter.bytes if meter else 0
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            
-            print(f"🌐 Sayfa açılıyor: {url}")
-            await page.goto(url, wait_until="networkidle")
-            
-            # Cookie popup'ı kapat
+        started = time.perf_counter()
+        retry = retry_settings(self.config, scrape_name)
+        response = await retry_async(
+            lambda: page.goto(url, wait_until=wait_until, timeout=timeout),
+            retry['page_attempts'], retry['backoff_seconds'], retry['backoff_max_seconds'],
+            on_retry=lambda attempt, e, delay: print(f"🔁 Sayfa açılamadı ({attempt}. deneme), "
+                                                    f"{delay:.1f} sn sonra tekrar: {e}")
+        )
+        ready = True
+        if ready_selector:
+            try:
+                await page.wait_for_selector(ready_selector, timeout=ready_timeout)
+            except Exception:
+                ready = False
+        load_ms = (time.perf_counter() - started) * 1000
+        self.phases.add(scrape_name, "goto", load_ms)
+        
+        page_bytes = 0
+        if meter:
+            await meter.settle()
+            page_bytes = meter.bytes - bytes_before
+        traffic = self.traffic.setdefault(scrape_name, {'pages': 0, 'bytes': 0, 'load_ms': 0.0, 'blocked': 0})
+        traffic['pages'] += 1
+        traffic['bytes'] += page_bytes
+        traffic['load_ms'] = round(traffic['load_ms'] + load_ms, 1)
+        print(f"📦 {round(page_bytes / 1024)} KB, {round(load_ms)} ms ({wait_until}): {url}")
+        return response, ready
+
+    def _progress(self, scrape_name: str, **data):
+        """Report progress to `on_progress`; callback errors never break a scrape."""
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress(scrape_name, data)
+        except Exception as e:
+            print(f"⚠️ İlerleme bildirilemedi: {e}")
+
+    def _report_phases(self, scrape_name: str):
+        """Print where the time of one scrape went, slowest phase first."""
+        summary = self.phases.summary(scrape_name)
+        parts = [
+            f"{phase} {round(s['total_ms'])} ms" + (f" ({s['count']}x)" if s['count'] > 1 else "")
+            for phase, s in sorted(summary.items(), key=lambda item: -item[1]['total_ms'])
+        ]
+        print(f"⏱️ Aşamalar: {', '.join(parts)}")
+
+    def _card_options(self, scrape_name: str) -> dict:
+        """Retry options passed to the card extraction scripts."""
+        retry = retry_settings(self.config, scrape_name)
+        return {"attempts": retry['card_attempts'], "backoffMs": retry['backoff_seconds'] * 1000,
+                "snapshots": self.archive is not None}
+
+    async def _extract_cards(self, page, scrape_name: str, script: str, options: dict = None,
+                             listing: bool = True) -> list[dict]:
+        """Run a card extraction script; if it breaks midway, keep the cards read so far as a checkpoint.
+
+        `options` are merged into the retry options; `listing=False` skips archiving the listing
+        (extra shards load the same page the first one already archived).
+        """
+        if self.archive is not None and listing:
+            # Modallar açılmadan önceki liste; çevrimdışı çıkarım kartları bunun üzerinden sayar
+            await self._snapshot(scrape_name, "listing", await page.content(), page.url)
+        try:
+            with self.phases.span(scrape_name, "extract"):
+                return await page.evaluate(script, {**self._card_options(scrape_name), **(options or {})})
+        except Exception:
+            try:
+                partial = await page.evaluate("() => window.__tarife ? window.__tarife.partial : []")
+                self.checkpoints[scrape_name] = self.checkpoints.get(scrape_name, []) + partial
+            except Exception:
+                pass
+            raise
+        finally:
+            if self.archive is not None:
+                try:
+                    modals = await page.evaluate("() => window.__tarife ? window.__tarife.snapshots : {}")
+                except Exception:
+                    modals = {}
+                for position, html in modals.items():
+                    await self._snapshot(scrape_name, "modal", html, page.url, int(position))
+
+    async def _snapshot(self, scrape_name: str, kind: str, html: str = None, url: str = None, position: int = None):
+        """Archive one page; without `html` the newest archived copy of `url` is referenced (e.g. on a 304)."""
+        if self.archive is None:
+            return
+        if html is None:
+            digest = await asyncio.to_thread(self.archive.last_digest, url)
+            if digest is None:
+                return
+        else:
+            digest = await asyncio.to_thread(self.archive.put, html)
+        self.snapshots.setdefault(scrape_name, []).append(
+            {'kind': kind, 'url': url, 'position': position, 'digest': digest}
+        )
+
+    def save_snapshots(self, scrape_name: str, run_id: int):
+        """Attach the pages archived during a scrape to its stored run."""
+        entries = self.snapshots.get(scrape_name)
+        if self.archive is None or not entries:
+            return
+        self.archive.save_manifest(run_id, scrape_name, entries)
+        print(f"🗄️ Arşiv: {len(entries)} sayfa run {run_id} ile kaydedildi")
+
+    def _set_completeness(self, scrape_name: str, expected: int, complete: int):
+        """Record how many of the expected cards/links were extracted completely."""
+        ratio = round(complete / expected, 3) if expected else 0.0
+        self.completeness[scrape_name] = {'expected': expected, 'complete': complete, 'ratio': ratio}
+        print(f"🧩 Tamlık: {complete}/{expected} (%{round(ratio * 100)})")
+
+    def run_status(self, scrape_name: str) -> str:
+        """Run status to store: "completed", or "partial" when the completeness ratio is below `retry.min_completeness`."""
+        completeness = self.completeness.get(scrape_name)
+        if completeness is None:
+            return "completed"
+        minimum = retry_settings(self.config, scrape_name)['min_completeness']
+        return "completed" if completeness['ratio'] >= minimum else "partial"
+
+    def _extraction_mode(self, scrape_name: str) -> str:
+        """Return the configured extraction mode for a scraper: "dom" or "network"."""
+        return self._settings(scrape_name).get('extraction', 'dom')
+
+    async def _network_tariffs(self, page, scrape_name: str, capture: ResponseCapture, provider: str) -> list[dict]:
+        """Try to read tariffs from captured JSON; an empty list means fall back to the DOM."""
+        tariffs = extract_tariffs(await capture.collect(page), provider)
+        if tariffs:
+            # JSON yanıtında kart sayısı bilinmez; okunan her kayıt eksiksiz sayılır
+            self._set_completeness(scrape_name, len(tariffs), len(tariffs))
+            print(f"📡 {len(tariffs)} tarife JSON yanıtlarından okundu, modallar atlanıyor.")
+        else:
+            print("⚠️ JSON yanıtlarında tarife bulunamadı, DOM yöntemine dönülüyor.")
+        return tariffs
+
+    async def _install_wait_helpers(self, page):
+        """Inject the MutationObserver wait helpers into the current document."""
+        await page.evaluate(WAIT_HELPERS_JS)
+
+    async def _scroll_until_stable(self, page, scrape_name: str, selector: str, max_steps: int, delta: int, settle_ms: int) -> int:
+        """Scroll until the number of `selector` matches stops growing; return the final count."""
+        with self.phases.span(scrape_name, "scroll"):
+            return await self._scroll_steps(page, scrape_name, selector, max_steps, delta, settle_ms)
+
+    async def _scroll_steps(self, page, scrape_name: str, selector: str, max_steps: int, delta: int, settle_ms: int) -> int:
+        await self._install_wait_helpers(page)
+        count = await page.evaluate("s => document.querySelectorAll(s).length", selector)
+        stable_steps = 0
+        steps = 0
+        while steps < max_steps:
+            steps += 1
+            await page.mouse.wheel(0, delta)
+            new_count = await page.evaluate(
+                "([s, n, t]) => window.__tarife.waitForCount(s, n, t)", [selector, count, settle_ms]
+            )
+            if new_count > count:
+                count = new_count
+                stable_steps = 0
+            else:
+                stable_steps += 1
+                if stable_steps >= 2:
+                    break
+        # Atlanan scroll adımlarının sabit beklemesi de kazanç sayılır
+        self._skipped_wait_ms[scrape_name] = (max_steps - steps) * settle_ms
+        return count
+
+    async def _report_wait_stats(self, page, scrape_name: str, stats: dict = None):
+        """Store and print how much time the event-driven waits saved; `stats` overrides the page's own."""
+        if stats is None:
+            stats = await self._wait_stats(page)
+        if not stats:
+            return
+        for ms in stats.get('modal_ms', []):
+            self.phases.add(scrape_name, "modal", ms)
+        if stats.get('cards_expected'):
+            self._set_completeness(scrape_name, stats['cards_expected'], stats['cards_complete'])
+            # Sessizce atlanan kart kalmasın: okunamayanlar hata listesine yazılır
+            self.failures[scrape_name] = stats['card_errors']
+            if stats['card_retries'] or stats['card_errors']:
+                print(f"🔁 {stats['card_retries']} kart tekrar denendi, {len(stats['card_errors'])} kart okunamadı")
+        skipped = self._skipped_wait_ms.get(scrape_name, 0)
+        budget = stats['budget_ms'] + skipped
+        waited = stats['waited_ms']
+        self.wait_stats[scrape_name] = {
+            'waits': stats['waits'],
+            'timeouts': stats['timeouts'],
+            'waited_ms': round(waited),
+            'budget_ms': round(budget),
+            'saved_ms': round(budget - waited),
+        }
+        print(f"⚡ Bekleme: {round(waited)} ms (sabit beklemeye göre {round(budget - waited)} ms tasarruf)")
+
+    @staticmethod
+    async def _wait_stats(page):
+        return await page.evaluate("() => window.__tarife ? window.__tarife.stats : null")
+
+    async def _open_vodafone(self, page, url: str):
+        """Load the Vodafone listing, dismiss the cookie popup and scroll until every card is rendered."""
+        print(f"🌐 Sayfa açılıyor: {url}")
+        await self._goto(page, "vodafone", url, ready_selector='.css-1iqevk5', timeout=60000)
+        
+        # Cookie popup'ı kapat
+        with self.phases.span("vodafone", "popup"):
             try:
                 reject_btn = page.locator("text=Reddet").first
                 if await reject_btn.is_visible(timeout=3000):
                     await reject_btn.click()
-                    await page.wait_for_timeout(500)
+                    await reject_btn.wait_for(state="hidden", timeout=500)
             except:
                 pass
+        
+        # Sayfayı scroll yaparak tüm içeriği yükle, kart sayısı artmayınca dur
+        print("📜 Sayfa scroll ediliyor...")
+        await self._scroll_until_stable(page, "vodafone", '.css-1iqevk5 .chakra-button', max_steps=8, delta=1000, settle_ms=500)
+
+    def _shard_count(self, scrape_name: str, cards: int) -> int:
+        """How many contexts read the cards: config.json `shards`, capped by the pool size and the card count."""
+        shards = self._settings(scrape_name).get('shards', 1)
+        pool = self._pools.get(scrape_name)
+        if pool is not None:
+            shards = min(shards, pool.max_contexts)
+        return max(1, min(shards, cards))
+
+    async def _vodafone_sharded(self, page, url: str, cards: list[dict], shards: int) -> list[dict]:
+        """Read Vodafone modals in `shards` contexts at once and merge the cards back into listing order.
+
+        The first shard reuses the already loaded page; every other shard leases its own
+        context, loads the listing and reads only its share of the enumerated cards (by key).
+        Cards a shard could not find or whose shard failed are read on the first page at the end.
+        """
+        positions = {card['key']: index for index, card in enumerate(cards)}
+        keys = list(positions)
+        # Kategoriler parçalara eşit dağılsın diye kartlar sırayla dağıtılır
+        shares = [{key: positions[key] for key in keys[shard::shards]} for shard in range(shards)]
+        shard_stats = self.shard_stats["vodafone"] = []
+        print(f"🔀 {len(cards)} kart {shards} context'e bölünüyor")
+
+        async def read_share(shard: int) -> dict:
+            share = shares[shard]
+            started = time.perf_counter()
+            entry = {'shard': shard + 1, 'cards': len(share), 'read': 0, 'load_ms': 0.0, 'ms': 0.0, 'error': None}
+            shard_stats.append(entry)
+            try:
+                async with self._pool_context(self._pools["vodafone"], "vodafone") as context:
+                    share_page = await self._new_page(context)
+                    await self._open_vodafone(share_page, url)
+                    entry['load_ms'] = round((time.perf_counter() - started) * 1000, 1)
+                    await self._install_wait_helpers(share_page)
+                    records = await self._extract_cards(share_page, "vodafone", VODAFONE_CARDS_JS,
+                                                        {"positions": share}, listing=False)
+                    stats = await self._wait_stats(share_page)
+            except Exception as e:
+                entry['error'] = str(e)
+                print(f"⚠️ Parça {shard + 1}/{shards} başarısız, kartları ilk sayfada okunacak: {e}")
+                return {'records': [], 'stats': None}
+            finally:
+                entry['ms'] = round((time.perf_counter() - started) * 1000, 1)
+                self.phases.add("vodafone", "shard", entry['ms'])
+            entry['read'] = len(records)
+            print(f"🔀 Parça {shard + 1}/{shards}: {len(records)}/{len(share)} kart, {round(entry['ms'])} ms "
+                  f"(yükleme {round(entry['load_ms'])} ms)")
+            return {'records': records, 'stats': stats}
+
+        # İlk sayfanın sayaçları tekrar okumada da birikir; istatistikleri en sonda okunur
+        results = await asyncio.gather(
+            self._extract_cards(page, "vodafone", VODAFONE_CARDS_JS, {"positions": shares[0]}, listing=False),
+            *(read_share(shard) for shard in range(1, shards)),
+            return_exceptions=True,
+        )
+        if isinstance(results[0], BaseException):
+            self.checkpoints["vodafone"] = self._merge_shards(
+                self.checkpoints.get("vodafone", []) + [r for part in results[1:] if isinstance(part, dict)
+                                                        for r in part['records']]
+            )
+            raise results[0]
+        records = list(results[0])
+        stats = []
+        for part in results[1:]:
+            if isinstance(part, BaseException):
+                raise part
+            records.extend(part['records'])
+            if part['stats']:
+                stats.append(part['stats'])
+
+        # Bulunamayan ya da parçası çöken kartlar ilk sayfada bir kez daha denenir
+        done = {r['card_index'] for r in records}
+        done.update(e['index'] for s in stats for e in s['card_errors'])
+        leftover = {key: index for key, index in positions.items() if index not in done}
+        if leftover:
+            print(f"🔁 {len(leftover)} kart ilk sayfada yeniden okunuyor")
+            try:
+                records.extend(await self._extract_cards(page, "vodafone", VODAFONE_CARDS_JS,
+                                                         {"positions": leftover}, listing=False))
+            except Exception:
+                self.checkpoints["vodafone"] = self._merge_shards(self.checkpoints.get("vodafone", []) + records)
+                raise
+        stats.append(await self._wait_stats(page))
+
+        # Parçaların sayaçları toplanır; bulunamayan kartlar da beklenen sayılır (eksik)
+        merged = {'waits': 0, 'waited_ms': 0, 'budget_ms': 0, 'timeouts': 0, 'modal_ms': [],
+                  'cards_expected': 0, 'cards_complete': 0, 'card_retries': 0, 'card_errors': []}
+        for part in stats:
+            for field, value in part.items():
+                if field in merged:
+                    merged[field] += value
+        merged['cards_expected'] = len(cards)
+        await self._report_wait_stats(page, "vodafone", merged)
+
+        return self._merge_shards(records)
+
+    @staticmethod
+    def _merge_shards(records: list[dict]) -> list[dict]:
+        """Records from all shards in card order, once per card and without `card_index`.
+
+        Sorted by card index the result is the same as a single context would have produced.
+        """
+        by_index = {}
+        for record in records:
+            by_index.setdefault(record['card_index'], record)
+        return [
+            {field: value for field, value in by_index[index].items() if field != 'card_index'}
+            for index in sorted(by_index)
+        ]
+
+    async def scrape_vodafone(self, url: str) -> list[dict]:
+        """Scrape tariff data from Vodafone website."""
+        tariffs = []
+        
+        async with self._browser_context("vodafone") as context:
+            page = await self._new_page(context)
+            capture = None
+            if self._extraction_mode("vodafone") == "network":
+                capture = ResponseCapture()
+                capture.attach(page)
             
-            # Sayfayı scroll yaparak tüm içeriği yükle
-            print("📜 Sayfa scroll ediliyor...")
-            for _ in range(8):
-                await page.mouse.wheel(0, 1000)
-                await page.wait_for_timeout(500)
-            
-            # Tarife verilerini çek
-            print("📊 Tarife detayları çekiliyor (Bu işlem biraz zaman alabilir)...")
-            
-            # Önce temel konteynerları bulalım
-            tariff_data = await page.evaluate("""
-                async () => {
-                    const results = [];
-                    const containers = document.querySelectorAll('.css-1iqevk5');
-                    
-                    for (const container of containers) {
-                        const headerEl = container.querySelector('p');
-                        const categoryName = headerEl ? headerEl.textContent.trim() : 'Diğer Tarifeler';
-                        
-                        const selectBtns = Array.from(container.querySelectorAll('.chakra-button')).filter(b => b.textContent.includes('Tarifeyi seç'));
-                        
-                        for (const btn of selectBtns) {
-                            const card = btn.closest('.css-1ir1t9b') || btn.closest('.css-0') || btn.parentElement.parentElement;
-                            const text = card.innerText || '';
-                            
-                            // Temel bilgiler
-                            const priceMatch = text.match(/(\\d{2,4})\\s*₺|₺\\s*(\\d{2,4})/);
-                            const gbMatch = text.match(/(\\d+)\\s*GB/i);
-                            const dkMatch = text.match(/(\\d+)\\s*DK/i);
-                            const smsMatch = text.match(/(\\d+)\\s*SMS/i);
-                            
-                            if (priceMatch && gbMatch) {
-                                const price = parseInt(priceMatch[1] || priceMatch[2]);
-                                const gb = gbMatch[1];
-                                const dk = dkMatch ? dkMatch[1] : '';
-                                const sms = smsMatch ? smsMatch[1] : '';
-                                
-                                const lines = text.split('\\n').filter(l => l.trim());
-                                let name = lines[0] || '';
-                                if (name.length < 5 || /^\\d+$/.test(name.trim())) {
-                                    for (const line of lines) {
-                                        if (line.length > 5 && line.length < 50 && !line.includes('₺')) {
-                                            name = line;
-                                            break;
-                                        }
-                                    }
-                                }
-
-                                // Detayları gör butonunu bul ve tıkla
-                                let noCommitmentPrice = '';
-                                const detailBtn = Array.from(card.querySelectorAll('button')).find(b => b.textContent.includes('Detayları gör'));
-                                
-                                if (detailBtn) {
-                                    detailBtn.click();
-                                    // Modalın içeriğinin tamamen gelmesini bekle
-                                    await new Promise(r => setTimeout(r, 1800));
-                                    
-                                    // Sayfadaki en son açılan veya görünür olan modalı yakala
-                                    const modals = Array.from(document.querySelectorAll('[role="dialog"], .modal-content, [class*="Modal_content"]'));
-                                    const modal = modals[modals.length - 1];
-                                    
-                                    if (modal) {
-                                        const modalText = modal.innerText;
-                                        // Kullanıcının belirttiği "Taahhütsüz Aylık Tarife Ücreti" keywordünü 
-                                        // ve diğer varyasyonları (küçük/büyük harf, boşluklar) regex ile arıyoruz.
-                                        const tcMatch = modalText.match(/Taahhütsüz.*?(?:ücreti|Ücreti)\s*:?\s*(\d{2,4})\s*TL/i) || 
-                                                       modalText.match(/Taahhütsüz.*?(\d{2,4})\s*TL/i);
-                                        
-                                        if (tcMatch) {
-                                            noCommitmentPrice = tcMatch[1];
-                                        }
-                                        
-                                        // Kapatma butonu - Vodafone modal yapısına özel alternatifler
-                                        const closeBtn = modal.querySelector('button[aria-label="Close"]') || 
-                                                       Array.from(modal.querySelectorAll('button, span, i')).find(b => 
-                                                            b.innerText === '✕' || b.innerText === 'X' || 
-                                                            b.innerText.includes('Kapat') || 
-                                                            b.className.includes('close')
-                                                       );
-                                        if (closeBtn) closeBtn.click();
-                                        await new Promise(r => setTimeout(r, 800));
-                                    }
-                                }
-                                
-                                results.push({
-                                    category: categoryName,
-                                    name: name.trim().substring(0, 60),
-                                    gb: gb,
-                                    minutes: dk,
-                                    sms: sms,
-                                    price: price,
-                                    no_commitment_price: noCommitmentPrice,
-                                    provider: 'Vodafone'
-                                });
-                            }
-                        }
-                    }
-                    return results;
-                }
-            """)
+            await self._open_vodafone(page, url)
             
-            # Fiyata göre sıralama (Python tarafında yapalım daha temiz olur)
-            from collections import defaultdict
-            grouped = defaultdict(list)
-            for t in tariff_data:
-                grouped[t['category']].append(t)
+            tariff_data = []
+            if capture:
+                with self.phases.span("vodafone", "network"):
+                    tariff_data = await self._network_tariffs(page, "vodafone", capture, 'Vodafone')
             
-            tariffs = []
-            for category in grouped:
-                grouped[category].sort(key=lambda x: x['price'])
-                tariffs.extend(grouped[category])
+            if not tariff_data:
+                # Tarife verilerini çek
+                print("📊 Tarife detayları çekiliyor (Bu işlem biraz zaman alabilir)...")
+                await self._install_wait_helpers(page)
+                
+                # Önce kartları modal açmadan listele, sonra modalları gerekirse birkaç context'e bölerek oku
+                cards = await page.evaluate(VODAFONE_CARDS_JS, {"enumerate": True})
+                shards = self._shard_count("vodafone", len(cards))
+                if shards > 1:
+                    if self.archive is not None:
+                        await self._snapshot("vodafone", "listing", await page.content(), page.url)
+                    tariff_data = await self._vodafone_sharded(page, url, cards, shards)
+                else:
+                    tariff_data = await self._extract_cards(page, "vodafone", VODAFONE_CARDS_JS)
+                    await self._report_wait_stats(page, "vodafone")
             
-            await browser.close()
+            # Kategori sırası korunarak her kategori fiyata göre sıralanır
+            tariffs = page_extract.order_by_category(tariff_data)
             
         print(f"✅ {len(tariffs)} tarife bulundu")
+        self._report_phases("vodafone")
         return tariffs
 
     async def scrape_turkcell(self, url: str) -> list[dict]:
         """Scrape tariff data from Turkcell website."""
         tariffs = []
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
+        async with self._browser_context("turkcell") as context:
+            page = await self._new_page(context)
+            capture = None
+            if self._extraction_mode("turkcell") == "network":
+                capture = ResponseCapture()
+                capture.attach(page)
             
             print(f"🌐 Sayfa açılıyor: {url}")
-            await page.goto(url, wait_until="networkidle")
+            await self._goto(page, "turkcell", url, ready_selector='.molecules-teasy-card_m-teasy-card__Ly4fG', timeout=60000)
             
             # Popupları kapat
-            try:
-                # Cookie kabul
-                accept_btn = page.locator("text=Kabul Et").first
-                if await accept_btn.is_visible(timeout=5000):
-                    await accept_btn.click()
-                
-                # Bildirim uyarısı (Daha Sonra)
-                later_btn = page.locator("#btn-later").first
-                if await later_btn.is_visible(timeout=3000):
-                    await later_btn.click()
-            except:
-                pass
+            with self.phases.span("turkcell", "popup"):
+                try:
+                    # Cookie kabul
+                    accept_btn = page.locator("text=Kabul Et").first
+                    if await accept_btn.is_visible(timeout=5000):
+                        await accept_btn.click()
+                    
+                    # Bildirim uyarısı (Daha Sonra)
+                    later_btn = page.locator("#btn-later").first
+                    if await later_btn.is_visible(timeout=3000):
+                        await later_btn.click()
+                except:
+                    pass
             
-            # Sayfayı scroll yaparak tüm içeriği yükle
+            # Sayfayı scroll yaparak tüm içeriği yükle, kart sayısı artmayınca dur
             print("📜 Sayfa scroll ediliyor...")
-            for _ in range(10):
-                await page.mouse.wheel(0, 1000)
-                await page.wait_for_timeout(500)
-            
-            # Tarife verilerini çek
-            print("📊 Turkcell tarifeleri çekiliyor...")
+            await self._scroll_until_stable(page, "turkcell", '.molecules-teasy-card_m-teasy-card__Ly4fG', max_steps=10, delta=1000, settle_ms=500)
             
-            tariff_data = await page.evaluate("""
-                async () => {
-                    const results = [];
-                    // Turkcell kart seçici
-                    const cards = document.querySelectorAll('.molecules-teasy-card_m-teasy-card__Ly4fG');
-                    
-                    for (const card of cards) {
-                        try {
-                            const titleEl = card.querySelector('.molecules-teasy-card_m-teasy-card__title__h0CO1');
-                            const name = titleEl?.textContent?.trim() || 'Turkcell Tarife';
-                            const badgeEl = card.querySelector('.molecules-teasy-card_m-teasy-card__badge__nd1eJ');
-                            const badgeText = badgeEl?.textContent?.trim() || '';
-                            
-                            // Kategori belirleme mantığı
-                            let category = 'Diğer Tarifeler';
-                            const lowerName = name.toLowerCase();
-                            const lowerBadge = badgeText.toLowerCase();
-                            
-                            if (lowerBadge.includes('online')) {
-                                category = "Online'a Özel Tarifeler";
-                            } else if (lowerBadge.includes('platinum') || lowerName.includes('platinum')) {
-                                category = "Platinum Tarifeleri";
-                            } else if (lowerBadge.includes('gnç') || lowerName.includes('gnç')) {
-                                category = "GNÇ Tarifeleri";
-                            } else if (badgeText) {
-                                category = badgeText + " Tarifeleri";
-                            }
-                            
-                            const gbText = card.querySelector('.molecules-teasy-card_m-teasy-card__text__container__UY7Ei')?.textContent?.trim() || '';
-                            const dkText = card.querySelector('.molecules-teasy-card_m-teasy-card__subtext__3SrTQ')?.textContent?.trim() || '';
-                            const priceText = card.querySelector('.atom-price_a-price__7lMAa span:first-child')?.textContent?.trim() || '';
-                            
-                            // Sayılar temizle
-                            const gb = gbText.match(/(\\d+)/)?.[1] || '';
-                            const price = parseInt(priceText.replace(/\\D/g, '')) || 0;
-                            const dk = dkText.match(/(\\d+)/)?.[1] || '';
-                            
-                            let sms = '';
-                            
-                            // Detay modalını açıp SMS bilgisi almayı dene
-                            const detailBtn = Array.from(card.querySelectorAll('button, a')).find(el => el.textContent.includes('DETAY'));
-                            if (detailBtn) {
-                                detailBtn.click();
-                                await new Promise(r => setTimeout(r, 1200));
-                                
-                                const modal = document.querySelector('.ant-modal-content');
-                                if (modal) {
-                                    const modalText = modal.innerText;
-                                    const smsMatch = modalText.match(/(\\d+)\\s*SMS/i);
-                                    if (smsMatch) sms = smsMatch[1];
-                                    
-                                    // Modalı kapat
-                                    const closeBtn = Array.from(modal.querySelectorAll('button, span, div')).find(el => el.textContent.trim() === 'Vazgeç' || el.classList.contains('ant-modal-close'));
-                                    if (closeBtn) closeBtn.click();
-                                    await new Promise(r => setTimeout(r, 500));
-                                }
-                            }
-                            
-                            results.push({
-                                category: category,
-                                name: name,
-                                gb: gb,
-                                minutes: dk,
-                                sms: sms,
-                                price: price,
-                                no_commitment_price: '',
-                                provider: 'Turkcell'
-                            });
-                        } catch (e) {
-                            console.error('Card extraction error:', e);
-                        }
-                    }
-                    return results;
-                }
-            """)
+            tariff_data = []
+            if capture:
+                with self.phases.span("turkcell", "network"):
+                    tariff_data = await self._network_tariffs(page, "turkcell", capture, 'Turkcell')
             
-            tariffs = sorted(tariff_data, key=lambda x: x['price'])
-            await browser.close()
+            if not tariff_data:
+                # Tarife verilerini çek
+                print("📊 Turkcell tarifeleri çekiliyor...")
+                await self._install_wait_helpers(page)
+                
+                tariff_data = await self._extract_cards(page, "turkcell", TURKCELL_CARDS_JS)
+                
+                await self._report_wait_stats(page, "turkcell")
+            tariffs = page_extract.order_by_price(tariff_data)
             
         print(f"✅ {len(tariffs)} Turkcell tarifesi bulundu")
+        self._report_phases("turkcell")
         return tariffs
 
     async def scrape_turkcell_mevcut(self, url: str) -> list[dict]:
         """Scrape Turkcell existing customer tariffs."""
         tariffs = []
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36")
-            page = await context.new_page()
+        async with self._browser_context("turkcell_mevcut", user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36") as context:
+            page = await self._new_page(context)
             
             print(f"🌐 Liste sayfası açılıyor: {url}")
-            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
-            
             # Kartların yüklenmesini bekle
-            try:
-                await page.wait_for_selector('a.molecule-dynamic-card_linkDecoration__cDpXS', timeout=20000)
-            except:
+            _, ready = await self._goto(page, "turkcell_mevcut", url, ready_selector='a.molecule-dynamic-card_linkDecoration__cDpXS',
+                                        wait_until="domcontentloaded", timeout=60000)
+            if not ready:
                 print("⚠️ Uyarı: Kartlar beklenen sürede yüklenmedi, yine de devam ediliyor.")
 
             # Popupları kapatmayı dene
-            try:
-                accept_btn = page.locator("text=Kabul Et").first
-                if await accept_btn.is_visible(timeout=3000):
-                    await accept_btn.click()
-            except: pass
+            with self.phases.span("turkcell_mevcut", "popup"):
+                try:
+                    accept_btn = page.locator("text=Kabul Et").first
+                    if await accept_btn.is_visible(timeout=3000):
+                        await accept_btn.click()
+                except: pass
             
-            # Sayfayı scroll yaparak tüm içeriği yükle
-            for _ in range(3):
-                await page.mouse.wheel(0, 1500)
-                await page.wait_for_timeout(800)
+            # Sayfayı scroll yaparak tüm içeriği yükle, kart sayısı artmayınca dur
+            await self._scroll_until_stable(page, "turkcell_mevcut", 'a.molecule-dynamic-card_linkDecoration__cDpXS', max_steps=3, delta=1500, settle_ms=800)
+            await self._report_wait_stats(page, "turkcell_mevcut")
             
             # Linkleri topla
             tariff_links = await page.evaluate("""
@@ -321,180 +975,308 @@ class TarifeScraper:
             
             if not tariff_links:
                 print("❌ Hata: Hiç tarife linki bulunamadı. Seçici değişmiş olabilir.")
-                await browser.close()
                 return []
 
             print(f"🔗 {len(tariff_links)} adet tarife linki bulundu. Detaylar çekiliyor...")
+            if self.archive is not None:
+                await self._snapshot("turkcell_mevcut", "listing", await page.content(), page.url)
             
-            detail_page = await context.new_page()
+            settings = self._settings('turkcell_mevcut')
+            # Aynı anda açık Chromium sekmesi sayısı her durumda `concurrency` ile sınırlıdır
+            browser_concurrency = max(1, min(settings.get('concurrency', 4), len(tariff_links)))
+            concurrency = browser_concurrency
+            # Sabit bekleme yerine host başına token bucket; bloklanmamak için istek hızını sınırlar
+            limiter = HostRateLimiter(settings.get('rate_per_sec', 2.0), settings.get('burst', 2))
             
-            for i, link in enumerate(tariff_links, 1):
-                try:
-                    print(f"📝 ({i}/{len(tariff_links)}) taranıyor: {link}")
-                    await detail_page.goto(link, wait_until="domcontentloaded", timeout=30000)
-                    # Çok hızlı gidince bloklanmamak için kısa bekleme
-                    await detail_page.wait_for_timeout(1000) 
-                    
-                    data = await detail_page.evaluate("""
-                        () => {
-                            const name = document.querySelector('h1')?.textContent?.trim() || 
-                                         document.querySelector('h2')?.textContent?.trim() || 'Turkcell Tarife';
-                            
-                            let gb = '', dk = '', sms = '';
-                            // Daha geniş bir seçici grubu
-                            const elements = Array.from(document.querySelectorAll('h1, h2, h3, p, div[class*="packageName"]'));
-                            elements.forEach(el => {
-                                const txt = el.innerText.toUpperCase();
-                                if (/^\\d+\\s*GB$/i.test(txt) || (txt.includes('GB') && txt.length < 15)) {
-                                    gb = txt.replace('GB', '').trim();
-                                } else if (txt.includes('DK') && txt.length < 15) {
-                                    dk = txt.replace('DK', '').trim();
-                                } else if (txt.includes('SMS') && txt.length < 15) {
-                                    sms = txt.replace('SMS', '').trim();
-                                }
-                            });
-                            
-                            let price = 0;
-                            let noCommitmentPrice = 0;
-                            
-                            // Fiyatları sayfa metni içinde ara
-                            const bodyText = document.body.innerText;
-                            
-                            // Yıllık Taahhütlü Fiyat
-                            const annualMatch = bodyText.match(/Yıllık\\s*Abonelik.*?(\\d+)\\s*TL/is);
-                            if (annualMatch) price = parseInt(annualMatch[1]);
-                            
-                            // Aylık Taahhütsüz Fiyat
-                            const monthlyMatch = bodyText.match(/Aylık\\s*Abonelik.*?(\\d+)\\s*TL/is);
-                            if (monthlyMatch) noCommitmentPrice = parseInt(monthlyMatch[1]);
-                            
-                            // Alternatif: Radyo butonlarından çekmeyi dene (görseldeki yapı)
-                            const priceLabels = Array.from(document.querySelectorAll('label, .ant-radio-wrapper'));
-                            priceLabels.forEach(label => {
-                                const lText = label.innerText.toUpperCase();
-                                const pMatch = label.innerText.match(/(\\d+)\\s*TL/i);
-                                if (pMatch) {
-                                    const val = parseInt(pMatch[1]);
-                                    if (lText.includes('YILLIK')) price = val;
-                                    else if (lText.includes('AYLIK')) noCommitmentPrice = val;
-                                }
-                            });
-
-                            return {
-                                name: name,
-                                gb: gb,
-                                minutes: dk,
-                                sms: sms,
-                                price: price,
-                                no_commitment_price: noCommitmentPrice
-                            };
-                        }
-                    """)
-                    
-                    if data['price'] == 0 and data['no_commitment_price'] > 0:
-                        data['price'] = data['no_commitment_price'] # Fallback
-
-                    category = 'Diğer Tarifeler'
-                    lowerName = data['name'].toLowerCase()
-                    if 'platinum' in lowerName: category = 'Platinum Tarifeleri'
-                    elif 'star' in lowerName: category = 'Star Tarifeleri'
-                    elif 'esneyen' in lowerName: category = 'Esneyen Tarifeler'
-                    elif 'gnç' in lowerName: category = 'GNÇ Tarifeleri'
-                    
-                    tariffs.append({
-                        'category': category,
-                        'name': data['name'],
-                        'gb': data['gb'],
-                        'minutes': data['minutes'],
-                        'sms': data['sms'],
-                        'price': data['price'],
-                        'no_commitment_price': data['no_commitment_price'],
-                        'provider': 'Turkcell (Mevcut)'
-                    })
-                    
-                except Exception as e:
-                    print(f"⚠️ Hata (Atlanıyor - {link}): {str(e)}")
-                    continue
+            self._detail_cache = DetailCache.from_config(self.config, 'turkcell_mevcut')
+            self.cache_stats['turkcell_mevcut'] = {'hits': 0, 'misses': 0, 'not_modified': 0}
             
-            await browser.close()
+            # Sunucuda render edilen detay sayfaları tarayıcısız HTTP ile okunabilir; liste sayfası yine Chromium'da
+            fetcher = None
+            if settings.get('detail_fetch', 'browser') == "http":
+                if detail_fetch.available():
+                    cookies = {c['name']: c['value'] for c in await context.cookies()}
+                    user_agent = await page.evaluate("() => navigator.userAgent")
+                    fetcher = DetailFetcher.from_settings(settings, user_agent, cookies)
+                    # HTTP istekleri `http_concurrency` kadar worker ile gider; Chromium'a düşenler yine sekme havuzunu bekler
+                    concurrency = max(1, min(fetcher.concurrency, len(tariff_links)))
+                    self.fetch_stats['turkcell_mevcut'] = {'http': 0, 'browser_fallbacks': 0}
+                else:
+                    print("⚠️ httpx kurulu değil; detay sayfaları Chromium ile açılacak")
+            
+            results = [None] * len(tariff_links)
+            # Worker'lar sonuçları bu listeye yazar; scrape yarıda kalırsa çekilenler korunur
+            self.checkpoints['turkcell_mevcut'] = results
+            retry = retry_settings(self.config, 'turkcell_mevcut')
+            failures = []
+            done = 0
+            queue = asyncio.Queue()
+            for item in enumerate(tariff_links):
+                queue.put_nowait(item)
+            # Worker'ların paylaştığı Chromium sekmeleri; en fazla `browser_concurrency` sekme açılır
+            browser_slots = asyncio.Semaphore(browser_concurrency)
+            idle_pages = []
+            open_pages = []
+            
+            @asynccontextmanager
+            async def browser_page():
+                # Chromium sekmesi yalnızca gerçekten gerekince açılır
+                async with browser_slots:
+                    if idle_pages:
+                        detail_page = idle_pages.pop()
+                    else:
+                        detail_page = await self._new_page(context)
+                        open_pages.append(detail_page)
+                    try:
+                        yield detail_page
+                    finally:
+                        idle_pages.append(detail_page)
+            
+            async def worker():
+                nonlocal done
+                while True:
+                    try:
+                        i, link = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    try:
+                        print(f"📝 ({i + 1}/{len(tariff_links)}) taranıyor: {link}")
+                        with self.phases.span("turkcell_mevcut", "rate_limit"):
+                            await limiter.acquire(link)
+                        results[i] = await retry_async(
+                            lambda: self._turkcell_detail(fetcher, browser_page, link, i),
+                            retry['card_attempts'], retry['backoff_seconds'], retry['backoff_max_seconds'],
+                            on_retry=lambda attempt, e, delay: print(
+                                f"🔁 ({i + 1}/{len(tariff_links)}) {delay:.1f} sn sonra tekrar: {e}")
+                        )
+                    except Exception as e:
+                        print(f"⚠️ Hata (Atlanıyor - {link}): {str(e)}")
+                        failures.append({'link': link, 'error': str(e)})
+                    done += 1
+                    self._progress("turkcell_mevcut", done=done, total=len(tariff_links), link=link,
+                                   ok=results[i] is not None)
+
+            try:
+                if fetcher is not None:
+                    async with fetcher:
+                        await asyncio.gather(*(worker() for _ in range(concurrency)))
+                    fetch_stats = self.fetch_stats['turkcell_mevcut']
+                    fetch_stats.update(fetcher.stats)
+                    print(f"⚡ HTTP: {fetch_stats['http']} sayfa ({fetch_stats['http_version'] or '-'}), "
+                          f"{fetch_stats['browser_fallbacks']} sayfa Chromium'a düştü")
+                else:
+                    await asyncio.gather(*(worker() for _ in range(concurrency)))
+            finally:
+                for detail_page in open_pages:
+                    await detail_page.close()
+                self._detail_cache.prune()
+                self._detail_cache.close()
+                self._detail_cache = None
+            
+            cache_stats = self.cache_stats['turkcell_mevcut']
+            print(f"🗃️ Önbellek: {cache_stats['hits']} isabet "
+                  f"({cache_stats['not_modified']} indirilmeden), {cache_stats['misses']} ıskalama")
+            
+            # Link sırasını koru, başarısız olanları çıkar
+            tariffs = [t for t in results if t is not None]
+            self.failures['turkcell_mevcut'] = failures
+            self._set_completeness('turkcell_mevcut', len(tariff_links), len(tariffs))
+            if failures:
+                print(f"⚠️ {len(failures)} link çekilemedi.")
             
         # Fiyata göre sırala
-        tariffs = sorted(tariffs, key=lambda x: x['price'] if x['price'] > 0 else 9999)
+        tariffs = page_extract.order_by_price(tariffs, unpriced_last=True)
         print(f"✅ Bitti: {len(tariffs)} Turkcell Mevcut tarifesi çekildi.")
+        self._report_phases("turkcell_mevcut")
         return tariffs
     
-    def save_to_excel(self, tariffs: list[dict], output_path: str):
-        """Save tariff data to Excel file."""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Tarifeler"
-        
-        # Başlık stili
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        header_fill = PatternFill(start_color="E60000", end_color="E60000", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+    async def _turkcell_detail(self, fetcher, browser_page, link: str, position: int = None) -> dict:
+        """One detail record: over HTTP when a fetcher is given, in Chromium if that fails or parses incompletely.
+
+        `browser_page()` is an async context manager lending a Chromium page from the bounded pool.
+        `position` is the link's index on the listing, kept with the archived page.
+        """
+        if fetcher is not None and not fetcher.disabled:
+            try:
+                with self.phases.span("turkcell_mevcut", "detail_http"):
+                    record = await self._fetch_turkcell_detail(fetcher, link, position)
+            except Exception as e:
+                print(f"⚠️ HTTP ile okunamadı, Chromium'a geçiliyor ({link}): {e}")
+                record = None
+            if record is not None:
+                self.fetch_stats['turkcell_mevcut']['http'] += 1
+                return record
+            self.fetch_stats['turkcell_mevcut']['browser_fallbacks'] += 1
+        async with browser_page() as page:
+            with self.phases.span("turkcell_mevcut", "detail"):
+                return await self._scrape_turkcell_detail(page, link, position)
+
+    async def _fetch_turkcell_detail(self, fetcher: DetailFetcher, link: str, position: int = None):
+        """Fetch and parse one detail page without a browser; None if the parse is incomplete."""
+        cache = self._detail_cache
+        stats = self.cache_stats.setdefault('turkcell_mevcut', {'hits': 0, 'misses': 0, 'not_modified': 0})
+        entry = cache.get(link) if cache and not self.force_refresh else None
+        
+        # Önbellekteki ETag/Last-Modified koşullu istek olarak gider; 304 gelirse gövde hiç inmez
+        html, validator = await fetcher.fetch(link, entry['validator'] if entry else None)
+        if html is None:
+            cache.touch(link)
+            stats['hits'] += 1
+            stats['not_modified'] += 1
+            await self._snapshot("turkcell_mevcut", "detail", None, link, position)
+            return entry['record']
+        
+        document = parse_document(html)
+        text_hash = hashlib.sha1(document.body_text.encode('utf-8')).hexdigest()
+        if entry and entry['text_hash'] == text_hash:
+            record = entry['record']
+            stats['hits'] += 1
+        else:
+            data = None
+            if self._extraction_mode("turkcell_mevcut") == "network":
+                records = extract_tariffs(document.payloads(), 'Turkcell (Mevcut)')
+                if records:
+                    data = self._network_detail(records[0])
+            if data is None:
+                data = turkcell_detail(document)
+            if not is_complete(data):
+                return None
+            record = self._turkcell_record(data)
+            stats['misses'] += 1
+        
+        if cache:
+            cache.put(link, validator, text_hash, record)
+        await self._snapshot("turkcell_mevcut", "detail", html, link, position)
+        return record
+
+    async def _scrape_turkcell_detail(self, page, link: str, position: int = None) -> dict:
+        """Return one Turkcell detail page's tariff record, reusing the cached one if unchanged."""
+        cache = self._detail_cache
+        stats = self.cache_stats.setdefault('turkcell_mevcut', {'hits': 0, 'misses': 0, 'not_modified': 0})
+        entry = cache.get(link) if cache and not self.force_refresh else None
+        
+        # Sunucu ETag/Last-Modified veriyorsa HEAD ile kontrol et, değişmediyse sayfayı hiç açma
+        if entry and entry['validator']:
+            try:
+                head = await page.context.request.head(link, timeout=10000)
+                if self._validator(head.headers) == entry['validator']:
+                    cache.touch(link)
+                    stats['hits'] += 1
+                    stats['not_modified'] += 1
+                    await self._snapshot("turkcell_mevcut", "detail", None, link, position)
+                    return entry['record']
+            except Exception:
+                pass
+        
+        response, _ = await self._goto(page, "turkcell_mevcut", link, ready_selector='h1, h2',
+                                       wait_until="domcontentloaded", ready_timeout=5000)
+        validator = self._validator(response.headers) if response else None
+        text = await page.evaluate("() => document.body.innerText")
+        text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        
+        if entry and entry['text_hash'] == text_hash:
+            # İçerik aynı, önceki kaydı yeniden kullan
+            record = entry['record']
+            stats['hits'] += 1
+        else:
+            record = await self._extract_turkcell_detail(page)
+            stats['misses'] += 1
         
-        # Başlıklar
-        headers = ["Kategori", "Paket Adı", "İnternet (GB)", "Dakika", "SMS", "Fiyat (₺/ay)", "Taahhütsüz Fiyat (₺/ay)", "Kaynak", "Tarih"]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
-        
-        # Veri satırları
-        today = datetime.now().strftime("%Y-%m-%d %H:%M")
-        for row, tariff in enumerate(tariffs, 2):
-            provider = tariff.get('provider', 'Vodafone')
-            ws.cell(row=row, column=1, value=tariff.get('category', '')).border = thin_border
-            ws.cell(row=row, column=2, value=tariff.get('name', '')).border = thin_border
-            ws.cell(row=row, column=3, value=tariff.get('gb', '')).border = thin_border
-            ws.cell(row=row, column=4, value=tariff.get('minutes', '')).border = thin_border
-            ws.cell(row=row, column=5, value=tariff.get('sms', '')).border = thin_border
-            ws.cell(row=row, column=6, value=tariff.get('price', '')).border = thin_border
-            ws.cell(row=row, column=7, value=tariff.get('no_commitment_price', '')).border = thin_border
-            ws.cell(row=row, column=8, value=provider).border = thin_border
-            ws.cell(row=row, column=9, value=today).border = thin_border
-        
-        # Sütun genişlikleri
-        ws.column_dimensions['A'].width = 30
-        ws.column_dimensions['B'].width = 40
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 12
-        ws.column_dimensions['E'].width = 10
-        ws.column_dimensions['F'].width = 15
-        ws.column_dimensions['G'].width = 25
-        ws.column_dimensions['H'].width = 12
-        ws.column_dimensions['I'].width = 18
-        
-        wb.save(output_path)
+        if cache:
+            cache.put(link, validator, text_hash, record)
+        if self.archive is not None:
+            await self._snapshot("turkcell_mevcut", "detail", await page.content(), link, position)
+        return record
+
+    @staticmethod
+    def _validator(headers: dict):
+        """Return the ETag or Last-Modified header used as a content fingerprint."""
+        return headers.get('etag') or headers.get('last-modified')
+
+    async def _extract_turkcell_detail(self, page) -> dict:
+        """Extract the tariff record from an opened Turkcell detail page."""
+        data = None
+        if self._extraction_mode("turkcell_mevcut") == "network":
+            # Sunucuda render edilen sayfanın gömülü __NEXT_DATA__ içeriğini dene
+            records = extract_tariffs(await ResponseCapture().collect(page), 'Turkcell (Mevcut)')
+            if records:
+                data = self._network_detail(records[0])
+        if data is None:
+            data = await page.evaluate(TURKCELL_DETAIL_JS)
+        return self._turkcell_record(data)
+
+    @staticmethod
+    def _network_detail(record: dict) -> dict:
+        """An embedded-JSON record with the price types TURKCELL_DETAIL_JS returns."""
+        record['price'] = record['price'] or 0
+        record['no_commitment_price'] = int(record['no_commitment_price'] or 0)
+        return record
+
+    @staticmethod
+    def _turkcell_record(data: dict) -> dict:
+        """Turn raw detail-page fields into a Turkcell (Mevcut) record with its category."""
+        return page_extract.turkcell_mevcut_record(data)
+    
+    def save_to_excel(self, tariffs: list[dict], output_path: str, scrape_name: str = "all"):
+        """Save tariff data to Excel file."""
+        # Write-only workbook ve paylaşılan stiller; büyük listelerde bellek sabit kalır
+        with self.phases.span(scrape_name, "excel"):
+            write_xlsx({"Tarifeler": tariffs}, output_path, comparison=False)
         print(f"💾 Excel dosyası kaydedildi: {output_path}")
     
+    async def _scrape_provider(self, provider) -> list[dict]:
+        """Scrape one registered provider and store the result."""
+        print(f"\n{'='*50}")
+        print(f"📱 {provider.name} tarifelerini çekiyor...")
+        print(f"{'='*50}")
+        
+        store = TariffStore.from_config(self.config)
+        try:
+            tariffs = await provider.scrape(self)
+        except Exception as e:
+            # Yarıda kalan scrape'in çekilebilen kayıtları "partial" run olarak saklanır, diğer operatörler devam eder
+            partial = self.partial_results(provider)
+            print(f"❌ {provider.name} çekilemedi: {e}" + (f" ({len(partial)} kayıt kısmi olarak saklandı)" if partial else ""))
+            run_id = store.save_run(provider.key, partial, "partial" if partial else "error", str(e),
+                                    self.phases.summary(provider.key), self.completeness.get(provider.key))
+            self.save_snapshots(provider.key, run_id)
+            return []
+        if tariffs:
+            # API'nin de görebilmesi için sonucu depoya yaz; önceki snapshot'la fark da burada çıkarılır
+            status = self.run_status(provider.key)
+            run_id = store.save_run(provider.key, tariffs, status, timings=self.phases.summary(provider.key),
+                                    completeness=self.completeness.get(provider.key))
+            self.save_snapshots(provider.key, run_id)
+            if status == "partial":
+                print(f"⚠️ {provider.name} eksik çekildi; sonuç saklandı ama son snapshot değiştirilmedi.")
+            else:
+                changes = store.change_summary(run_id)
+                print(f"🔁 {provider.name} değişiklikleri: {changes['added']} yeni, "
+                      f"{changes['removed']} kaldırılan, {changes['changed']} değişen")
+        return tariffs
+
+    def partial_results(self, provider) -> list[dict]:
+        """Records extracted before a scrape broke off, normalized like a full result."""
+        return normalize([t for t in self.checkpoints.get(provider.key, []) if t], provider.name)
+
     async def run(self):
-        """Run the scraper for all configured URLs."""
+        """Run the scraper for all enabled providers in config.json."""
         all_tariffs = []
+        own_pool = self.pool is None
+        if own_pool:
+            # Tüm siteler için tek tarayıcı kullan
+            self.pool = BrowserPool.from_config(self.config)
         
-        for site in self.config.get('urls', []):
-            name = site.get('name', 'Unknown')
-            url = site.get('url', '')
-            
-            print(f"\n{'='*50}")
-            print(f"📱 {name} tarifelerini çekiyor...")
-            print(f"{'='*50}")
-            
-            if 'vodafone' in url.lower():
-                tariffs = await self.scrape_vodafone(url)
+        try:
+            # Operatörleri paralel çek, sonuçları config sırasıyla birleştir
+            registry = ProviderRegistry.from_config(self.config)
+            results = await asyncio.gather(*(self._scrape_provider(provider) for provider in registry.enabled()))
+            for tariffs in results:
                 all_tariffs.extend(tariffs)
-            else:
-                print(f"⚠️  {name} için scraper henüz eklenmedi")
+        finally:
+            if own_pool:
+                await self.pool.stop()
+                self.pool = None
         
         if all_tariffs:
             output_path = self.config.get('output_file', 'tarifeler.xlsx')
@@ -504,10 +1286,100 @@ class TarifeScraper:
             print("\n❌ Hiç tarife bulunamadı!")
 
 
-async def main():
-    scraper = TarifeScraper()
+def reextract_archive(config: dict, provider_key: str = None, run_id: int = None, limit: int = None,
+                      jobs: int = None, save: bool = False) -> list[dict]:
+    """Re-run the extraction on archived runs without a browser, in parallel across CPU cores.
+
+    Each result is compared with the tariffs stored for that run; with `save`
+    the re-extracted tariffs are stored as "reextracted" runs, which keep the
+    history but never replace the latest snapshot.
+    """
+    archive = SnapshotArchive.from_config(config) or SnapshotArchive(
+        config.get('archive', {}).get('path', 'archive'), config.get('database', 'tarifeler.db'))
+    registry = ProviderRegistry.from_config(config)
+    store = TariffStore.from_config(config)
+    runs = [run for run in archive.runs(provider_key, run_id, limit) if run['provider_key'] in registry]
+    if not runs:
+        print("❌ Arşivde uygun run bulunamadı")
+        return []
+
+    started = time.perf_counter()
+    print(f"🗄️ {len(runs)} arşivlenmiş run yeniden çıkarılıyor ({jobs or os.cpu_count()} süreç)...")
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        outputs = list(executor.map(
+            page_extract.reextract,
+            [str(archive.root)] * len(runs),
+            [run['provider_key'] for run in runs],
+            [run['entries'] for run in runs],
+        ))
+
+    results = []
+    for run, output in zip(runs, outputs):
+        key = run['provider_key']
+        records = normalize(output['records'], registry.get(key).name)
+        stored = store.run_tariffs(run['run_id'])
+        summary = dict.fromkeys(('added', 'removed', 'changed'), 0)
+        for change in diff(stored, records, key):
+            summary[change['kind']] += 1
+        print(f"🔍 Run {run['run_id']} ({key}): {len(records)} kayıt (kayıtlı {len(stored)}), "
+              f"tamlık {output['complete']}/{output['expected']}; {summary['added']} fazla, "
+              f"{summary['removed']} eksik, {summary['changed']} farklı")
+        result = {'run_id': run['run_id'], 'provider': key, 'count': len(records), 'stored': len(stored),
+                  'expected': output['expected'], 'complete': output['complete'], **summary}
+        if save and records:
+            expected = output['expected']
+            result['saved_run_id'] = store.save_run(
+                key, records, "reextracted", f"Run {run['run_id']} arşivinden yeniden çıkarıldı",
+                completeness={'expected': expected, 'complete': output['complete'],
+                              'ratio': round(output['complete'] / expected, 3) if expected else 0.0})
+        results.append(result)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {len(runs)} run {elapsed:.2f} sn'de yeniden çıkarıldı")
+    return results
+
+
+async def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Operatör tarifelerini çeker.")
+    parser.add_argument("--config", default=os.environ.get("TARIFE_CONFIG") or "config.json",
+                        help="config.json yolu (varsayılan: TARIFE_CONFIG ya da ./config.json)")
+    parser.add_argument("--worker", action="store_true",
+                        help="API'nin SQLite iş kuyruğunu dinleyen scrape worker'ı olarak çalış")
+    parser.add_argument("--reextract", action="store_true",
+                        help="Tarayıcı açmadan arşivlenmiş sayfalardan tarifeleri yeniden çıkar")
+    parser.add_argument("--provider", help="--reextract: yalnızca bu operatörün run'ları")
+    parser.add_argument("--run", type=int, help="--reextract: yalnızca bu run")
+    parser.add_argument("--limit", type=int, help="--reextract: en yeni N run")
+    parser.add_argument("--jobs", type=int, help="--reextract: paralel süreç sayısı (varsayılan: CPU sayısı)")
+    parser.add_argument("--save", action="store_true",
+                        help="--reextract: sonuçları 'reextracted' run olarak depoya yaz")
+    args = parser.parse_args(argv)
+
+    if args.reextract:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        reextract_archive(config, args.provider, args.run, args.limit, args.jobs, args.save)
+        return
+
+    if args.worker:
+        from engine import ScrapeWorker
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        worker = asyncio.ensure_future(ScrapeWorker(config).run())
+        # docker stop / systemd SIGTERM gönderir; worker başlamamış işleri kuyruğa bırakarak kapanır
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, worker.cancel)
+        try:
+            await worker
+        except asyncio.CancelledError:
+            print("👋 Scrape worker durduruldu")
+        return
+
+    scraper = TarifeScraper(args.config)
     await scraper.run()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
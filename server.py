@@ -4,123 +4,460 @@ FastAPI backend for cross-operator tariff comparison.
 """
 
 import asyncio
+import gzip
+import hashlib
 import json
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
-# Import scraper
-from scraper import TarifeScraper
-
-app = FastAPI(title="Magenta", version="1.0.0")
-
-# Store last scrape results in memory
-all_provider_data = {
-    "vodafone": [],
-    "turkcell": [],
-    "turkcell_mevcut": []
-}
-last_scrape = {
-    "timestamp": None,
-    "status": "idle",
-    "message": "",
-    "current_provider": None
-}
-
-async def run_scraping_task(provider: str):
-    """Background task to run the scraper."""
-    global last_scrape, all_provider_data
+try:
+    import brotli
+except ImportError:  # brotli opsiyonel; yoksa yalnızca gzip kullanılır
+    brotli = None
+
+from assets import load_assets
+from events import EventBus
+from engine import ScrapeEngine
+from exporter import FORMATS, cached_export, write_csv, write_parquet, write_xlsx
+from jobs import QueueClient
+from providers import ProviderRegistry
+from store import CHANGE_KINDS, JobQueue, ProviderLock, TariffStore
+from tariffs import GB_BANDS, SORT_KEYS, TariffIndex
+
+# config.json yolu; TARIFE_CONFIG ile başka bir dosya verilebilir (ör. yük testi)
+CONFIG_PATH = Path(os.environ.get("TARIFE_CONFIG") or Path(__file__).parent / "config.json")
+# Tüm worker'ların paylaştığı SQLite tarife deposu
+store: Optional[TariffStore] = None
+# Scrape işlerinin arayüzü: "inline" modda süreç içi ScrapeEngine, "worker" modda SQLite kuyruğu (QueueClient)
+backend: Optional[Union[ScrapeEngine, QueueClient]] = None
+# Uygulama açılışında okunan config.json
+config: dict = {}
+# config.json'daki `providers` bölümünden kurulan operatör eklentileri
+providers: Optional[ProviderRegistry] = None
+# Açılışta bir kez okunan, sıkıştırılmış varyantlarıyla bellekte tutulan dashboard dosyaları
+static_assets: dict = {}
+# Dışa aktarımlar veri sürümüne göre burada önbelleklenir
+EXPORT_DIR = Path(__file__).parent / "exports"
+export_lock = asyncio.Lock()
+# Scrape ilerlemesi ve veri değişiklikleri için SSE kanalı
+events = EventBus()
+# /api/tariffs yanıtı ETag başına bir kez serialize edilir
+_tariffs_response = {"etag": None, "bodies": {}}
+# Son snapshot'ın sorgu indeksleri; veri sürümü değişince bir kez yeniden kurulur
+tariff_index: Optional[TariffIndex] = None
+_index_lock = asyncio.Lock()
+# Filtreli /api/tariffs ve /api/compare yanıtları (ETag -> {encoding: body})
+_query_responses = {}
+QUERY_PARAMS = {"provider", "category", "min_gb", "max_gb", "min_price", "max_price", "sort", "order", "offset", "limit"}
+# Operatör -> son arka plan yenilemesinin başladığı an (time.monotonic)
+_revalidations = {}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the tariff store and the scrape backend for the lifetime of the app."""
+    global backend, store, config, providers, static_assets
+    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    static_assets = load_assets(Path(__file__).parent)
+    store = TariffStore.from_config(config)
+    providers = ProviderRegistry.from_config(config)
+    if config.get('jobs', {}).get('mode', 'inline') == "worker":
+        # Chromium ayrı worker sürecinde (`python scraper.py --worker`); API yalnızca kuyruğa iş yazar
+        backend = QueueClient.from_config(
+            config, JobQueue.from_config(config), ProviderLock.from_config(config), events.publish, data_changed
+        )
+    else:
+        backend = ScrapeEngine(config, store, providers, publish=events.publish, on_data_changed=data_changed)
+    await backend.start()
     try:
-        last_scrape["status"] = "running"
-        last_scrape["message"] = f"{provider} scraper başlatıldı..."
-        last_scrape["current_provider"] = provider
-        
-        scraper = TarifeScraper()
-        tariffs = []
-        
-        url = ""
-        provider_key = provider.lower()
-        if provider_key == "vodafone":
-            url = "https://www.vodafone.com.tr/numara-tasima-yeni-hat/tarifeler?homeheader=post-vodafoneluol"
-            tariffs = await scraper.scrape_vodafone(url)
-        elif provider_key == "turkcell":
-            url = "https://www.turkcell.com.tr/trc/turkcellli-olmak/paket-secimi"
-            tariffs = await scraper.scrape_turkcell(url)
-        elif provider_key == "turkcell_mevcut":
-            url = "https://www.turkcell.com.tr/paket-ve-tarifeler/4-5-g-hizinda?paymentType=faturali-hat"
-            tariffs = await scraper.scrape_turkcell_mevcut(url)
-        
-        # Save to Excel
-        if tariffs:
-            all_provider_data[provider_key] = tariffs
-            output_path = scraper.config.get('output_file', 'tarifeler.xlsx')
-            # Consolidate all for excel? For now just the current one as before.
-            # Actually, let's just save current.
-            scraper.save_to_excel(tariffs, output_path)
-        
-        last_scrape["timestamp"] = datetime.now().isoformat()
-        last_scrape["status"] = "completed"
-        last_scrape["message"] = f"{len(tariffs)} {provider} tarifesi başarıyla çekildi."
-        
-    except Exception as e:
-        last_scrape["status"] = "error"
-        last_scrape["message"] = f"Hata: {str(e)}"
-        print(f"Scrape Error: {e}")
+        yield
+    finally:
+        await backend.stop()
+
+
+app = FastAPI(title="Magenta", version="1.0.0", lifespan=lifespan)
+
+async def data_changed():
+    """A scrape group wrote new data: warm the query indexes and tell the dashboards."""
+    # Sorgu indekslerini ilk istekte değil scrape biter bitmez kur
+    index = await current_index()
+    events.publish("data_changed", {"version": index.version})
+
+
+def serve_asset(request: Request, path: str) -> Response:
+    """Serve a preloaded asset: picks the precompressed variant and answers 304 on a matching ETag."""
+    asset = static_assets.get(path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı")
+    encoding = _accepted_encoding(request)
+    if encoding not in asset.bodies:
+        encoding = "gzip" if "gzip" in asset.bodies and "gzip" in request.headers.get("accept-encoding", "") else None
+    headers = {"ETag": asset.etag(encoding), "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+    if _etag_matches(request, asset.etag(encoding)):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=asset.body(encoding), media_type=asset.media_type, headers=headers)
+
 
 @app.get("/", response_class=HTMLResponse)
-async def index():
+async def index(request: Request):
     """Serve the main HTML page."""
-    html_path = Path(__file__).parent / "index.html"
-    return HTMLResponse(content=html_path.read_text(encoding="utf-8"))
+    return serve_asset(request, "/")
 
 @app.get("/logo.png")
-async def serve_logo():
+async def serve_logo(request: Request):
     """Serve the logo image."""
-    logo_path = Path(__file__).parent / "logo.png"
-    if not logo_path.exists():
-        raise HTTPException(status_code=404, detail="Logo not found")
-    return FileResponse(path=logo_path, media_type="image/png")
+    return serve_asset(request, "/logo.png")
 
 @app.get("/api/scrape")
-async def start_scrape(background_tasks: BackgroundTasks, provider: str = "vodafone"):
-    """Start the scraper in the background."""
-    global last_scrape
-    if last_scrape["status"] == "running":
-        return {"success": False, "message": "Scraper zaten çalışıyor."}
-    
-    last_scrape["status"] = "running"
-    last_scrape["message"] = f"{provider} işlemi başlatılıyor..."
-    background_tasks.add_task(run_scraping_task, provider)
+async def start_scrape(provider: str = "vodafone", force: bool = False):
+    """Queue scrape jobs; `force` bypasses the detail page cache."""
+    provider_key = provider.lower()
+    if provider_key != "all" and provider_key not in providers:
+        return {"success": False, "message": f"Bilinmeyen operatör: {provider}"}
     
-    return {"success": True, "message": f"{provider} scraping işlemi başlatıldı."}
+    keys = [p.key for p in providers.enabled()] if provider_key == "all" else [provider_key]
+    # Aynı operatör için kuyrukta bekleyen iş varsa yenisi açılmaz, mevcut iş döner
+    jobs = await backend.submit_group(keys, "manual", {"force_refresh": force})
+    return {"success": True, "message": f"{provider} scraping işlemi kuyruğa alındı.", "jobs": [job.id for job in jobs]}
+
+
+@app.get("/api/providers")
+async def list_providers():
+    """Registered providers and the settings that shape their scrapes."""
+    return {"providers": [provider.describe() for provider in providers]}
+
+
+@app.get("/api/jobs")
+async def list_jobs(provider: Optional[str] = None, status: Optional[str] = None, limit: int = 50):
+    """Recent jobs (newest first), the configured schedules, circuit breakers and the held provider locks."""
+    jobs = backend.find(provider_key=provider, status=status)[:max(1, limit)]
+    return {
+        "jobs": [job.to_dict() for job in jobs],
+        "schedules": backend.schedule_info(),
+        "circuits": backend.circuits(),
+        "locks": await asyncio.to_thread(backend.lock_holders)
+    }
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Inspect one job."""
+    job = backend.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    return job.to_dict()
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued, running or retrying job."""
+    if backend.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    if not await backend.cancel(job_id):
+        return {"success": False, "message": "İş zaten tamamlanmış."}
+    return {"success": True, "message": "İş iptal ediliyor."}
+
+
+def _accepted_encoding(request: Request) -> Optional[str]:
+    """Pick the best response encoding the client accepts: br, then gzip."""
+    accepted = request.headers.get("accept-encoding", "")
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match header contains `etag` (weak or strong)."""
+    header = request.headers.get("if-none-match", "")
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates or "*" in candidates
+
+
+def _build_index(version: str) -> TariffIndex:
+    """Build the query indexes of the latest snapshot; runs in a worker thread and touches no shared state."""
+    datasets = {key: [] for key in providers.keys()}
+    datasets.update(store.latest())
+    return TariffIndex(datasets, version, config.get('query', {}).get('gb_bands') or GB_BANDS)
+
+
+async def current_index() -> TariffIndex:
+    """Query indexes of the latest snapshot, rebuilt only when the dataset version changes.
+
+    The index is built off the event loop; swapping it in and dropping the cached
+    responses happen together on the loop, under a lock so concurrent requests share one rebuild.
+    """
+    global tariff_index
+    version = await asyncio.to_thread(store.version)
+    if tariff_index is None or tariff_index.version != version:
+        async with _index_lock:
+            if tariff_index is None or tariff_index.version != version:
+                index = await asyncio.to_thread(_build_index, version)
+                tariff_index = index
+                _query_responses.clear()
+    return tariff_index
+
+
+async def cached_json(request: Request, key: str, build) -> Response:
+    """JSON response for a query of the current index, serialized once per dataset version and query."""
+    index = await current_index()
+    etag = '"' + hashlib.sha1(f"{index.version}:{key}".encode("utf-8")).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    bodies = _query_responses.get(etag)
+    if bodies is None:
+        if len(_query_responses) >= config.get('query', {}).get('cache_entries', 256):
+            _query_responses.pop(next(iter(_query_responses), None), None)
+        body = json.dumps({"version": index.version, **build(index)}, ensure_ascii=False).encode("utf-8")
+        bodies = _query_responses[etag] = {None: body}
+    encoding = _accepted_encoding(request)
+    if encoding not in bodies:
+        bodies[encoding] = _compress(bodies[None], encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=bodies[encoding], media_type="application/json", headers=headers)
+
+
+def _provider_filter(provider: Optional[str]) -> Optional[list]:
+    """Split a comma-separated `provider` parameter; unknown keys are a 400."""
+    if not provider:
+        return None
+    keys = [key.strip().lower() for key in provider.split(",") if key.strip()]
+    unknown = [key for key in keys if key not in providers]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Bilinmeyen operatör: {', '.join(unknown)}")
+    return keys
+
+
+async def query_tariffs(request: Request) -> Response:
+    """Filtered, sorted page of the latest snapshot (the query-parameter form of /api/tariffs)."""
+    params = request.query_params
+    try:
+        numbers = {name: float(params[name]) if params.get(name) else None
+                   for name in ("min_gb", "max_gb", "min_price", "max_price")}
+        offset = max(0, int(params.get("offset", 0)))
+        limit = int(params.get("limit", 50))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Sayısal parametreler geçersiz")
+    sort = params.get("sort", "price")
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Sıralama anahtarı şunlardan biri olmalı: {', '.join(SORT_KEYS)}")
+    order = params.get("order", "asc")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order 'asc' ya da 'desc' olmalı")
+    limit = min(max(1, limit), config.get('query', {}).get('max_limit', 200))
+    provider_keys = _provider_filter(params.get("provider"))
+    category = params.get("category") or None
+    key = json.dumps([provider_keys, category, numbers, sort, order, offset, limit], sort_keys=True)
+    return await cached_json(request, key, lambda index: index.query(
+        providers=provider_keys, category=category, sort=sort, descending=order == "desc",
+        offset=offset, limit=limit, **numbers))
+
+
+async def freshness() -> dict:
+    """Age and staleness of each provider's latest snapshot against its `freshness_ttl_hours`."""
+    times = await asyncio.to_thread(store.snapshot_times)
+    now = datetime.now()
+    refreshing = {job.provider_key for job in backend.active()} if backend else set()
+    info = {}
+    for provider in providers:
+        key = provider.key
+        ttl = provider.settings.get('freshness_ttl_hours', 12) * 3600
+        scraped_at = times.get(key)
+        age = (now - datetime.fromisoformat(scraped_at)).total_seconds() if scraped_at else None
+        info[key] = {
+            "scraped_at": scraped_at,
+            "age_seconds": round(age) if age is not None else None,
+            "ttl_seconds": ttl,
+            "stale": age is None or age > ttl,
+            "refreshing": key in refreshing,
+        }
+    return info
+
+
+async def revalidate(provider_key: str) -> bool:
+    """Queue one background refresh of a stale provider; a burst of requests shares it."""
+    if any(job.provider_key == provider_key for job in backend.active()):
+        return False
+    # Başarısız yenilemeler her istekte yeniden tetiklenmesin
+    cooldown = config.get('jobs', {}).get('revalidate_cooldown_seconds', 300)
+    last = _revalidations.get(provider_key)
+    if last is not None and time.monotonic() - last < cooldown:
+        return False
+    _revalidations[provider_key] = time.monotonic()
+    print(f"♻️ {provider_key} verisi bayat, arka planda yenileniyor")
+    await backend.submit(provider_key, "revalidate")
+    return True
+
+
+def _tariffs_body(status: dict) -> bytes:
+    """Full /api/tariffs body: every provider's latest snapshot plus the status block (runs in a thread)."""
+    datasets = {key: [] for key in providers.keys()}
+    datasets.update(store.latest())
+    return json.dumps({"providers": datasets, **status}, ensure_ascii=False, default=str).encode("utf-8")
+
 
 @app.get("/api/tariffs")
-async def get_tariffs():
-    """Get the last scraped tariffs and current status."""
+async def get_tariffs(request: Request):
+    """Get the last scraped tariffs and current status.
+
+    Always answers from the last good snapshot; stale providers are refreshed in
+    the background (stale-while-revalidate). The ETag is derived from the dataset
+    version, the status block and the staleness flags, so unchanged data costs a
+    304 instead of re-serializing every provider's list. The ever-changing age
+    goes into the `Age` header rather than the cached body.
+
+    With any of the query parameters (provider, category, min_gb, max_gb,
+    min_price, max_price, sort, order, offset, limit) only a filtered page of
+    the snapshot is returned, served from the precomputed query indexes.
+    """
+    fresh = await freshness()
+    for key, info in fresh.items():
+        if info["stale"] and info["scraped_at"] and not info["refreshing"] and await revalidate(key):
+            info["refreshing"] = True
+    if QUERY_PARAMS.intersection(request.query_params):
+        return await query_tariffs(request)
+    status = backend.status_snapshot()
+    status["freshness"] = {
+        key: {k: v for k, v in info.items() if k != "age_seconds"} for key, info in fresh.items()
+    }
+    version = await asyncio.to_thread(store.version)
+    status_json = json.dumps(status, sort_keys=True, default=str)
+    etag = '"' + hashlib.sha1(f"{version}:{status_json}".encode("utf-8")).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    ages = [info["age_seconds"] for info in fresh.values() if info["age_seconds"] is not None]
+    if ages:
+        # En eski snapshot'ın yaşı
+        headers["Age"] = str(max(ages))
+
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if _tariffs_response["etag"] != etag:
+        # Tüm snapshot'ı okuyup serialize etmek event loop'u tutmasın
+        body = await asyncio.to_thread(_tariffs_body, status)
+        _tariffs_response["etag"] = etag
+        _tariffs_response["bodies"] = {None: body}
+
+    encoding = _accepted_encoding(request)
+    bodies = _tariffs_response["bodies"]
+    if encoding not in bodies:
+        bodies[encoding] = await asyncio.to_thread(_compress, bodies[None], encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=bodies[encoding], media_type="application/json", headers=headers)
+
+
+@app.get("/api/compare")
+async def compare_tariffs(request: Request, provider: Optional[str] = None, ranking: int = 20):
+    """Cheapest tariff per GB band across providers, plus the price-per-GB ranking."""
+    provider_keys = _provider_filter(provider)
+    ranking = min(max(0, ranking), config.get('query', {}).get('max_limit', 200))
+    key = json.dumps(["compare", provider_keys, ranking])
+    return await cached_json(request, key, lambda index: {
+        "bands": index.compare(provider_keys),
+        "price_per_gb": index.ranking(provider_keys, ranking),
+    })
+
+
+@app.get("/api/changes")
+async def list_changes(provider: Optional[str] = None, kind: Optional[str] = None, after: Optional[int] = None,
+                       before: Optional[int] = None, limit: int = 100):
+    """Change feed between snapshots; poll with `after=<last id>` to receive only new deltas."""
+    if kind and kind not in CHANGE_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind şunlardan biri olmalı: {', '.join(CHANGE_KINDS)}")
+    if provider and provider not in providers:
+        raise HTTPException(status_code=400, detail=f"Bilinmeyen operatör: {provider}")
+    limit = min(max(1, limit), config.get('query', {}).get('max_limit', 200))
+    changes = await asyncio.to_thread(store.changes, provider, kind, after, before, limit)
+    ids = [change["id"] for change in changes]
     return {
-        "providers": all_provider_data,
-        "timestamp": last_scrape["timestamp"],
-        "status": last_scrape["status"],
-        "message": last_scrape["message"],
-        "current_provider": last_scrape["current_provider"]
+        "changes": changes,
+        # Sonraki sayfa: yoklama için `after`, geçmişe gitmek için `before`
+        "next_after": max(ids) if ids else after,
+        "next_before": min(ids) if ids and after is None else None,
     }
 
 
+@app.get("/api/events")
+async def stream_events():
+    """Server-sent events: scrape status, per-link progress and "data_changed"."""
+    return StreamingResponse(
+        events.subscribe(initial=[("status", backend.status_snapshot())]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: run counters and per-phase duration histograms of the scrape backend."""
+    return PlainTextResponse(backend.metrics_text(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/download")
-async def download_excel():
-    """Download the Excel file."""
-    excel_path = Path(__file__).parent / "tarifeler.xlsx"
-    if not excel_path.exists():
+async def download_excel(format: str = "xlsx", history: bool = False):
+    """Download the latest snapshot (or the full history) as xlsx, csv or parquet.
+
+    Files are cached per dataset version, so repeated downloads do not rebuild them.
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Desteklenmeyen format: {format}")
+
+    if history:
+        name = "tarife-gecmisi"
+        version = await asyncio.to_thread(store.history_version)
+        datasets = None
+    else:
+        name = "tarifeler"
+        version = await asyncio.to_thread(store.version)
+        datasets = await asyncio.to_thread(store.latest)
+    if not version:
         raise HTTPException(status_code=404, detail="Excel dosyası bulunamadı. Önce scraping yapın.")
+
+    def build(path):
+        if history:
+            rows = store.iter_history()
+            if format == "xlsx":
+                write_xlsx({"Geçmiş": rows}, path, comparison=False)
+        else:
+            rows = (t for tariffs in datasets.values() for t in tariffs)
+            if format == "xlsx":
+                write_xlsx(datasets, path)
+        if format == "csv":
+            write_csv(rows, path)
+        elif format == "parquet":
+            write_parquet(rows, path)
+
+    async with export_lock:
+        try:
+            path = await asyncio.to_thread(cached_export, EXPORT_DIR, name, version, format, build)
+        except RuntimeError as e:
+            raise HTTPException(status_code=501, detail=str(e))
     return FileResponse(
-        path=excel_path,
-        filename="tarifeler.xlsx",
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        path=path,
+        filename=f"{name}.{format}",
+        media_type=FORMATS[format]
     )
 
 
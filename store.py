@@ -0,0 +1,650 @@
+"""
+Tariff Store
+Scrape sonuçlarını geçmişiyle birlikte saklayan gömülü SQLite deposu.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+
+from tariffs import Tariff, diff
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    provider_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT,
+    tariff_count INTEGER NOT NULL DEFAULT 0,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    timings TEXT,
+    completeness TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_provider ON scrape_runs (provider_key, finished_at);
+
+CREATE TABLE IF NOT EXISTS tariffs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES scrape_runs (id),
+    provider_key TEXT NOT NULL,
+    provider TEXT,
+    category TEXT,
+    name TEXT,
+    gb TEXT,
+    minutes TEXT,
+    sms TEXT,
+    price INTEGER,
+    no_commitment_price INTEGER,
+    scraped_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tariffs_run ON tariffs (run_id);
+CREATE INDEX IF NOT EXISTS idx_tariffs_provider ON tariffs (provider_key, scraped_at);
+
+-- Ardışık snapshot'lar arasındaki eklenen / kaldırılan / değişen tarifeler
+CREATE TABLE IF NOT EXISTS tariff_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES scrape_runs (id),
+    previous_run_id INTEGER NOT NULL REFERENCES scrape_runs (id),
+    provider_key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    tariff_key TEXT NOT NULL,
+    name TEXT,
+    gb TEXT,
+    old_price INTEGER,
+    new_price INTEGER,
+    fields TEXT,
+    record TEXT,
+    changed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_changes_provider ON tariff_changes (provider_key, id);
+CREATE INDEX IF NOT EXISTS idx_changes_run ON tariff_changes (run_id);
+
+-- Her operatörün en son başarılı run'ı; son snapshot'ı okumak tek bir join'dir
+CREATE TABLE IF NOT EXISTS latest_runs (
+    provider_key TEXT PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES scrape_runs (id)
+);
+"""
+
+DETAIL_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detail_cache (
+    url TEXT PRIMARY KEY,
+    validator TEXT,
+    text_hash TEXT,
+    record TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_detail_cache_used ON detail_cache (last_used);
+"""
+
+LOCK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS provider_locks (
+    provider_key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+QUEUE_SCHEMA = """
+-- API süreçlerinin kuyruğa koyduğu, scrape worker'ının çalıştırdığı işler
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    id TEXT PRIMARY KEY,
+    provider_key TEXT NOT NULL,
+    trigger TEXT NOT NULL,
+    options TEXT,
+    group_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    next_attempt_at TEXT,
+    claimed_by TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_seq ON scrape_jobs (seq);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON scrape_jobs (status, claimed_by);
+
+-- Worker'ın API süreçlerine paylaştığı durum, zamanlama, devre ve metrik bilgisi
+CREATE TABLE IF NOT EXISTS worker_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+JOB_FINISHED_STATES = ('completed', 'failed', 'cancelled', 'skipped')
+
+TARIFF_FIELDS = ('category', 'name', 'gb', 'minutes', 'sms', 'price', 'no_commitment_price', 'provider')
+CHANGE_KINDS = ('added', 'removed', 'changed')
+
+
+class TariffStore:
+    """SQLite-backed store of scrape runs and their tariff rows."""
+
+    def __init__(self, path: str = "tarifeler.db"):
+        self.path = path
+        self._local = threading.local()
+        self._cache_version = None
+        self._cache = None
+        self._times_version = None
+        self._times = None
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Eski veritabanlarına aşama süreleri kolonunu ekle
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(scrape_runs)")}
+            if 'timings' not in columns:
+                conn.execute("ALTER TABLE scrape_runs ADD COLUMN timings TEXT")
+            if 'completeness' not in columns:
+                conn.execute("ALTER TABLE scrape_runs ADD COLUMN completeness TEXT")
+
+    @classmethod
+    def from_config(cls, config: dict) -> "TariffStore":
+        """Build a store from the `database` setting of config.json."""
+        return cls(config.get('database', 'tarifeler.db'))
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection; WAL lets several workers read while one writes."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def start_run(self, provider_key: str) -> int:
+        """Record a running scrape and return its id."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO scrape_runs (provider_key, status, started_at) VALUES (?, 'running', ?)",
+                (provider_key, datetime.now().isoformat())
+            )
+            return cursor.lastrowid
+
+    def finish_run(self, run_id: int, status: str, message: str = "", tariffs: list[dict] = None,
+                   timings: dict = None, completeness: dict = None) -> dict:
+        """Close a run and write its tariffs in a single transaction.
+
+        Only completed runs with tariffs become the provider's latest snapshot
+        ("partial" runs keep their tariffs but leave the snapshot alone);
+        when they replace an earlier one, the differences are written to
+        `tariff_changes`. Returns the change counts per kind.
+        `timings` (per-phase summary) and `completeness` ({expected, complete, ratio})
+        are stored as JSON.
+        """
+        summary = dict.fromkeys(CHANGE_KINDS, 0)
+        tariffs = tariffs or []
+        finished_at = datetime.now().isoformat()
+        with self._connect() as conn:
+            provider_key = conn.execute(
+                "SELECT provider_key FROM scrape_runs WHERE id = ?", (run_id,)
+            ).fetchone()['provider_key']
+            conn.execute(
+                "UPDATE scrape_runs SET status = ?, message = ?, tariff_count = ?, finished_at = ?, timings = ?, "
+                "completeness = ? WHERE id = ?",
+                (status, message, len(tariffs), finished_at, json.dumps(timings) if timings else None,
+                 json.dumps(completeness) if completeness else None, run_id)
+            )
+            conn.executemany(
+                "INSERT INTO tariffs (run_id, provider_key, provider, category, name, gb, minutes, sms, price, "
+                "no_commitment_price, scraped_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, provider_key, t.get('provider'), t.get('category'), t.get('name'), t.get('gb'),
+                     t.get('minutes'), t.get('sms'), t.get('price'), t.get('no_commitment_price'), finished_at)
+                    for t in tariffs
+                ]
+            )
+            if status == "completed" and tariffs:
+                previous = conn.execute(
+                    "SELECT run_id FROM latest_runs WHERE provider_key = ?", (provider_key,)
+                ).fetchone()
+                if previous:
+                    # İlk snapshot taban çizgisidir; değişiklikler sonraki run'lardan itibaren yazılır
+                    summary = self._record_changes(conn, provider_key, previous['run_id'], run_id, tariffs, finished_at)
+                conn.execute(
+                    "INSERT INTO latest_runs (provider_key, run_id) VALUES (?, ?) "
+                    "ON CONFLICT (provider_key) DO UPDATE SET run_id = excluded.run_id",
+                    (provider_key, run_id)
+                )
+        return summary
+
+    def _record_changes(self, conn, provider_key: str, previous_run_id: int, run_id: int, tariffs: list[dict],
+                        changed_at: str) -> dict:
+        """Diff the new tariffs against the previous snapshot and store the changes."""
+        rows = conn.execute("SELECT * FROM tariffs WHERE run_id = ? ORDER BY id", (previous_run_id,)).fetchall()
+        previous = [{field: row[field] for field in TARIFF_FIELDS} for row in rows]
+        changes = diff(previous, tariffs, provider_key)
+        conn.executemany(
+            "INSERT INTO tariff_changes (run_id, previous_run_id, provider_key, kind, tariff_key, name, gb, "
+            "old_price, new_price, fields, record, changed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (run_id, previous_run_id, provider_key, change['kind'], change['key'], change['name'], change['gb'],
+                 change['old']['price'] if change['old'] else None,
+                 change['new']['price'] if change['new'] else None,
+                 json.dumps(change['fields'], ensure_ascii=False),
+                 json.dumps(change['new'] or change['old'], ensure_ascii=False), changed_at)
+                for change in changes
+            ]
+        )
+        summary = dict.fromkeys(CHANGE_KINDS, 0)
+        for change in changes:
+            summary[change['kind']] += 1
+        return summary
+
+    def changes(self, provider_key: str = None, kind: str = None, after: int = None, before: int = None,
+                limit: int = 100) -> list[dict]:
+        """Page of the change feed.
+
+        With `after` the changes newer than that id are returned oldest first, so a
+        poller can pass the last id it saw; otherwise the newest changes (older
+        than `before`, if given) are returned newest first.
+        """
+        query = "SELECT * FROM tariff_changes WHERE 1 = 1"
+        params = []
+        if provider_key:
+            query += " AND provider_key = ?"
+            params.append(provider_key)
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        if after is not None:
+            query += " AND id > ? ORDER BY id"
+            params.append(after)
+        else:
+            if before is not None:
+                query += " AND id < ?"
+                params.append(before)
+            query += " ORDER BY id DESC"
+        rows = self._connect().execute(query + " LIMIT ?", (*params, limit)).fetchall()
+        changes = []
+        for row in rows:
+            change = dict(row)
+            change['fields'] = json.loads(change['fields']) if change['fields'] else {}
+            change['record'] = json.loads(change['record']) if change['record'] else None
+            changes.append(change)
+        return changes
+
+    def change_summary(self, run_id: int) -> dict:
+        """Change counts per kind recorded by one run."""
+        summary = dict.fromkeys(CHANGE_KINDS, 0)
+        rows = self._connect().execute(
+            "SELECT kind, COUNT(*) AS n FROM tariff_changes WHERE run_id = ? GROUP BY kind", (run_id,)
+        )
+        for row in rows:
+            summary[row['kind']] = row['n']
+        return summary
+
+    def save_run(self, provider_key: str, tariffs: list[dict], status: str = "completed", message: str = "",
+                 timings: dict = None, completeness: dict = None) -> int:
+        """Record a finished run in one go (used by the CLI)."""
+        run_id = self.start_run(provider_key)
+        self.finish_run(run_id, status, message, tariffs, timings, completeness)
+        return run_id
+
+    def run_tariffs(self, run_id: int) -> list[dict]:
+        """Tariffs stored by one run, in the order they were written."""
+        rows = self._connect().execute("SELECT * FROM tariffs WHERE run_id = ? ORDER BY id", (run_id,)).fetchall()
+        return [self._record(row) for row in rows]
+
+    def version(self) -> int:
+        """Dataset version: changes whenever any provider's latest snapshot changes."""
+        row = self._connect().execute("SELECT COALESCE(SUM(run_id), 0) AS v FROM latest_runs").fetchone()
+        return row['v']
+
+    def latest(self) -> dict:
+        """Return {provider_key: [tariff, ...]} from the latest snapshot of each provider.
+
+        The result is cached in memory until the dataset version changes.
+        """
+        version = self.version()
+        if self._cache is not None and self._cache_version == version:
+            return self._cache
+
+        rows = self._connect().execute(
+            "SELECT t.* FROM tariffs t JOIN latest_runs l ON t.run_id = l.run_id ORDER BY t.id"
+        ).fetchall()
+        providers = {}
+        for row in rows:
+            providers.setdefault(row['provider_key'], []).append(self._record(row))
+
+        self._cache = providers
+        self._cache_version = version
+        return providers
+
+    def snapshot_times(self) -> dict:
+        """{provider_key: finished_at} of each provider's latest snapshot, cached per dataset version."""
+        version = self.version()
+        if self._times is not None and self._times_version == version:
+            return self._times
+        rows = self._connect().execute(
+            "SELECT l.provider_key, r.finished_at FROM latest_runs l JOIN scrape_runs r ON r.id = l.run_id"
+        ).fetchall()
+        self._times = {row['provider_key']: row['finished_at'] for row in rows}
+        self._times_version = version
+        return self._times
+
+    def history_version(self) -> int:
+        """Version of the full history: the id of the newest tariff row."""
+        row = self._connect().execute("SELECT COALESCE(MAX(id), 0) AS v FROM tariffs").fetchone()
+        return row['v']
+
+    def iter_history(self):
+        """Yield every stored tariff row, oldest first, without loading them all into memory."""
+        cursor = self._connect().execute("SELECT * FROM tariffs ORDER BY id")
+        for row in cursor:
+            yield self._record(row)
+
+    @staticmethod
+    def _record(row) -> dict:
+        """Stored row as an API record; rows written before normalization get the same types."""
+        record = {field: row[field] for field in TARIFF_FIELDS}
+        record['scraped_at'] = row['scraped_at']
+        return Tariff.from_record(record).to_record()
+
+    def last_finished_at(self):
+        """Timestamp of the newest snapshot across providers."""
+        row = self._connect().execute(
+            "SELECT MAX(r.finished_at) AS ts FROM scrape_runs r JOIN latest_runs l ON r.id = l.run_id"
+        ).fetchone()
+        return row['ts']
+
+
+class DetailCache:
+    """Per-URL cache of extracted detail-page records with TTL and LRU size bound."""
+
+    def __init__(self, path: str = "tarifeler.db", ttl_hours: float = 24, max_entries: int = 500):
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.executescript(DETAIL_CACHE_SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: dict, section: str) -> "DetailCache":
+        """Build a cache from config.json's `database` and the provider's cache settings."""
+        settings = config.get('providers', {}).get(section, {})
+        return cls(
+            config.get('database', 'tarifeler.db'),
+            ttl_hours=settings.get('cache_ttl_hours', 24),
+            max_entries=settings.get('cache_max_entries', 500),
+        )
+
+    def get(self, url: str):
+        """Return the cached entry for `url`, or None if missing or older than the TTL."""
+        row = self._conn.execute("SELECT * FROM detail_cache WHERE url = ?", (url,)).fetchone()
+        if row is None or time.time() - row['fetched_at'] > self.ttl_seconds:
+            return None
+        return {
+            'validator': row['validator'],
+            'text_hash': row['text_hash'],
+            'record': json.loads(row['record']),
+        }
+
+    def touch(self, url: str):
+        """Mark an entry as used without refreshing its TTL."""
+        with self._conn:
+            self._conn.execute("UPDATE detail_cache SET last_used = ? WHERE url = ?", (time.time(), url))
+
+    def put(self, url: str, validator: str, text_hash: str, record: dict):
+        """Store a freshly fetched record; this also restarts the TTL."""
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO detail_cache (url, validator, text_hash, record, fetched_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET validator = excluded.validator, "
+                "text_hash = excluded.text_hash, record = excluded.record, fetched_at = excluded.fetched_at, "
+                "last_used = excluded.last_used",
+                (url, validator, text_hash, json.dumps(record, ensure_ascii=False), now, now)
+            )
+
+    def prune(self):
+        """Drop expired entries, then the least recently used ones beyond `max_entries`."""
+        with self._conn:
+            self._conn.execute("DELETE FROM detail_cache WHERE fetched_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM detail_cache WHERE url NOT IN "
+                "(SELECT url FROM detail_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class ProviderLock:
+    """Cross-process scrape lock per provider; an expired lock can be taken over."""
+
+    def __init__(self, path: str = "tarifeler.db"):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(LOCK_SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ProviderLock":
+        """Build a lock table in the `database` file of config.json."""
+        return cls(config.get('database', 'tarifeler.db'))
+
+    def _connect(self) -> sqlite3.Connection:
+        # Kilit işlemleri seyrek ve farklı thread'lerden gelir; her seferinde kısa ömürlü bağlantı
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def acquire(self, provider_key: str, owner: str, ttl_seconds: float) -> bool:
+        """Take the lock for `ttl_seconds`; False if another owner holds an unexpired lock."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO provider_locks (provider_key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (provider_key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE provider_locks.expires_at < ? OR provider_locks.owner = excluded.owner",
+                (provider_key, owner, now + ttl_seconds, now)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, provider_key: str, owner: str):
+        """Release the lock if `owner` still holds it."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM provider_locks WHERE provider_key = ? AND owner = ?", (provider_key, owner))
+
+    def holders(self) -> dict:
+        """{provider_key: owner} of the currently held, unexpired locks."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT provider_key, owner FROM provider_locks WHERE expires_at >= ?", (time.time(),)
+            ).fetchall()
+        return dict(rows)
+
+
+class JobQueue:
+    """SQLite job queue between the API processes and the scrape worker.
+
+    API processes `enqueue` jobs and read them back; the worker `claim`s queued
+    rows, runs them and `save`s every state change. `seq` grows with each write,
+    so `changes(after)` lets an API process follow job updates by polling.
+    """
+
+    def __init__(self, path: str = "tarifeler.db", history: int = 200):
+        self.path = path
+        self.history = history
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(QUEUE_SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "JobQueue":
+        """Build the queue in the `database` file of config.json."""
+        return cls(config.get('database', 'tarifeler.db'), config.get('jobs', {}).get('history', 200))
+
+    def _connect(self) -> sqlite3.Connection:
+        # Kuyruk birden çok süreçten ve thread'den kullanılır; her işlemde kısa ömürlü bağlantı
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _job(row) -> dict:
+        """Queue row in the shape of `jobs.Job.to_dict()`."""
+        return {
+            "id": row['id'],
+            "provider": row['provider_key'],
+            "trigger": row['trigger'],
+            "options": json.loads(row['options']) if row['options'] else {},
+            "group": row['group_id'],
+            "status": row['status'],
+            "attempts": row['attempts'],
+            "error": row['error'],
+            "result": json.loads(row['result']) if row['result'] else None,
+            "created_at": row['created_at'],
+            "started_at": row['started_at'],
+            "finished_at": row['finished_at'],
+            "next_attempt_at": row['next_attempt_at'],
+        }
+
+    def enqueue(self, job: dict) -> dict:
+        """Queue a job; an already queued job of the same provider is returned instead of a duplicate."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM scrape_jobs WHERE provider_key = ? AND status = 'queued' ORDER BY seq LIMIT 1",
+                (job['provider'],)
+            ).fetchone()
+            if row is not None:
+                return self._job(row)
+            conn.execute(
+                "INSERT INTO scrape_jobs (id, provider_key, trigger, options, group_id, status, created_at, seq) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM scrape_jobs))",
+                (job['id'], job['provider'], job['trigger'], json.dumps(job['options']), job['group'],
+                 job['created_at'])
+            )
+            self._prune(conn)
+        return {**job, "status": "queued"}
+
+    def claim(self, worker: str) -> list[dict]:
+        """Take every unclaimed queued job for `worker`, oldest first."""
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "UPDATE scrape_jobs SET claimed_by = ?, seq = (SELECT MAX(seq) + 1 FROM scrape_jobs) "
+                "WHERE claimed_by IS NULL AND status = 'queued' RETURNING *",
+                (worker,)
+            ).fetchall()
+        return [self._job(row) for row in sorted(rows, key=lambda row: row['created_at'])]
+
+    def save(self, job: dict, worker: str):
+        """Write the worker's view of a job (also jobs it queued itself, e.g. from a cron schedule)."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO scrape_jobs (id, provider_key, trigger, options, group_id, status, attempts, error, "
+                "result, created_at, started_at, finished_at, next_attempt_at, claimed_by, seq) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM scrape_jobs)) "
+                "ON CONFLICT (id) DO UPDATE SET status = excluded.status, attempts = excluded.attempts, "
+                "error = excluded.error, result = excluded.result, started_at = excluded.started_at, "
+                "finished_at = excluded.finished_at, next_attempt_at = excluded.next_attempt_at, "
+                "claimed_by = excluded.claimed_by, seq = excluded.seq",
+                (job['id'], job['provider'], job['trigger'], json.dumps(job['options']), job['group'], job['status'],
+                 job['attempts'], job['error'], json.dumps(job['result']) if job['result'] is not None else None,
+                 job['created_at'], job['started_at'], job['finished_at'], job['next_attempt_at'], worker)
+            )
+            if job['status'] in JOB_FINISHED_STATES:
+                self._prune(conn)
+
+    def release(self, worker: str):
+        """Hand the jobs `worker` claimed but never started back to the queue (on worker shutdown)."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE scrape_jobs SET claimed_by = NULL WHERE claimed_by = ? AND status = 'queued'", (worker,)
+            )
+
+    def recover(self, worker: str) -> int:
+        """On worker start: requeue jobs an earlier worker claimed and fail the ones it left running.
+
+        Only one scrape worker runs per database, so any other claim belongs to a stopped process.
+        Returns the number of failed jobs.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE scrape_jobs SET claimed_by = NULL WHERE status = 'queued' AND claimed_by != ?", (worker,)
+            )
+            cursor = conn.execute(
+                "UPDATE scrape_jobs SET status = 'failed', error = 'Worker durdu', finished_at = ?, "
+                "seq = (SELECT MAX(seq) + 1 FROM scrape_jobs) WHERE status IN ('running', 'retrying') AND claimed_by != ?",
+                (datetime.now().isoformat(), worker)
+            )
+            return cursor.rowcount
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Cancel an unclaimed job at once, or flag a claimed one for its worker; False if already finished."""
+        now = datetime.now().isoformat()
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "UPDATE scrape_jobs SET status = 'cancelled', finished_at = ?, "
+                "seq = (SELECT MAX(seq) + 1 FROM scrape_jobs) WHERE id = ? AND claimed_by IS NULL AND status = 'queued'",
+                (now, job_id)
+            )
+            if cursor.rowcount:
+                return True
+            placeholders = ", ".join("?" * len(JOB_FINISHED_STATES))
+            cursor = conn.execute(
+                f"UPDATE scrape_jobs SET cancel_requested = 1 WHERE id = ? AND status NOT IN ({placeholders})",
+                (job_id, *JOB_FINISHED_STATES)
+            )
+            return cursor.rowcount == 1
+
+    def cancel_requests(self, worker: str) -> list[str]:
+        """Ids of `worker`'s jobs with a pending cancellation; each is returned once."""
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "UPDATE scrape_jobs SET cancel_requested = 2 WHERE claimed_by = ? AND cancel_requested = 1 RETURNING id",
+                (worker,)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def get(self, job_id: str):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM scrape_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def changes(self, after: int) -> tuple[list[dict], int]:
+        """Jobs written since sequence number `after`, and the newest sequence number."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM scrape_jobs WHERE seq > ? ORDER BY seq", (after,)).fetchall()
+        return [self._job(row) for row in rows], (rows[-1]['seq'] if rows else after)
+
+    def _prune(self, conn):
+        """Forget the oldest finished jobs beyond `history`."""
+        placeholders = ", ".join("?" * len(JOB_FINISHED_STATES))
+        conn.execute(
+            f"DELETE FROM scrape_jobs WHERE status IN ({placeholders}) AND id NOT IN "
+            "(SELECT id FROM scrape_jobs ORDER BY seq DESC LIMIT ?)",
+            (*JOB_FINISHED_STATES, self.history)
+        )
+
+    def set_state(self, key: str, value):
+        """Publish one piece of worker state (JSON-serializable) to the API processes."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO worker_state (key, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (key, json.dumps(value, ensure_ascii=False), time.time())
+            )
+
+    def states(self, after: float = 0.0) -> tuple[dict, dict]:
+        """{key: value} written by `set_state` since `after` (a timestamp), and {key: write time} for the same keys."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT key, value, updated_at FROM worker_state WHERE updated_at > ? ORDER BY updated_at", (after,)
+            ).fetchall()
+        return {row['key']: json.loads(row['value']) for row in rows}, {row['key']: row['updated_at'] for row in rows}
@@ -0,0 +1,412 @@
+"""
+Tariffs
+Tarife kayıtlarının tipli modeli: Türkçe sayı biçimlerini ve "Sınırsız" işaretlerini sayıya çevirir,
+uzun geçmişleri sütun dizilerinde (array) tutar.
+"""
+
+import heapq
+import math
+import re
+from array import array
+from itertools import islice
+from dataclasses import dataclass
+
+
+UNLIMITED = math.inf
+UNLIMITED_TEXT = "Sınırsız"
+# Karşılaştırma ASCII'ye katlanmış küçük harf metin üzerinde yapılır (bkz. _fold)
+UNLIMITED_MARKERS = ('sinirsiz', 'limitsiz', 'unlimited', 'sonsuz')
+NUMERIC_FIELDS = ('gb', 'minutes', 'sms', 'price', 'no_commitment_price')
+LABEL_FIELDS = ('provider', 'category')
+
+NUMBER_RE = re.compile(r'\d[\d.,]*')
+THOUSANDS_RE = re.compile(r'\d{1,3}(?:\.\d{3})+')
+FOLD_TABLE = str.maketrans("İIıŞşÇçĞğÜüÖö", "iiissccgguuoo")
+
+
+def _fold(text: str) -> str:
+    """Lower-case Turkish text and fold it to ASCII ("SINIRSIZ" and "Sınırsız" both become "sinirsiz")."""
+    return text.translate(FOLD_TABLE).lower()
+
+
+def parse_number(value):
+    """Parse an amount or price as written on the operator sites.
+
+    "1.000" -> 1000.0, "1.250,00 TL" -> 1250.0, "2,5 GB" -> 2.5, "Sınırsız" -> UNLIMITED.
+    Returns None when the value holds no number.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if isinstance(value, float) and math.isnan(value) else float(value)
+    text = _fold(str(value))
+    if any(marker in text for marker in UNLIMITED_MARKERS):
+        return UNLIMITED
+    match = NUMBER_RE.search(text)
+    if not match:
+        return None
+    digits = match.group().rstrip('.,')
+    if ',' in digits:
+        # Türkçe ondalık virgül; noktalar binlik ayırıcı
+        digits = digits.replace('.', '').replace(',', '.')
+    elif THOUSANDS_RE.fullmatch(digits):
+        digits = digits.replace('.', '')
+    try:
+        return float(digits)
+    except ValueError:
+        return None
+
+
+def format_amount(value) -> str:
+    """Display form of a parsed amount: "20", "1.5", "Sınırsız" or "" when unknown."""
+    if value is None or math.isnan(value):
+        return ''
+    if value == UNLIMITED:
+        return UNLIMITED_TEXT
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+def _price(value):
+    """Prices are kept as int when whole, so the JSON output keeps its old shape."""
+    if value is None or math.isnan(value) or value == UNLIMITED:
+        return None
+    return int(value) if value.is_integer() else round(value, 2)
+
+
+@dataclass(slots=True)
+class Tariff:
+    """One normalized tariff; amounts are floats (UNLIMITED for "Sınırsız"), None when unknown."""
+
+    provider: str
+    category: str
+    name: str
+    gb: float = None
+    minutes: float = None
+    sms: float = None
+    price: float = None
+    no_commitment_price: float = None
+    scraped_at: str = None
+
+    @classmethod
+    def from_record(cls, record: dict, provider: str = None) -> "Tariff":
+        """Normalization stage: build a Tariff from a raw scraper or store record."""
+        price = parse_number(record.get('price'))
+        no_commitment = parse_number(record.get('no_commitment_price'))
+        return cls(
+            provider=record.get('provider') or provider or '',
+            category=(record.get('category') or 'Diğer Tarifeler').strip(),
+            name=str(record.get('name') or '').strip(),
+            gb=parse_number(record.get('gb')),
+            minutes=parse_number(record.get('minutes')),
+            sms=parse_number(record.get('sms')),
+            # 0 "fiyat bulunamadı" anlamında kullanılıyordu
+            price=price if price else None,
+            no_commitment_price=no_commitment if no_commitment else None,
+            scraped_at=record.get('scraped_at'),
+        )
+
+    def to_record(self) -> dict:
+        """Record in the shape the API, the store and the exports use."""
+        record = {
+            'category': self.category,
+            'name': self.name,
+            'gb': format_amount(self.gb),
+            'minutes': format_amount(self.minutes),
+            'sms': format_amount(self.sms),
+            'price': _price(self.price) or 0,
+            'no_commitment_price': _price(self.no_commitment_price),
+            'provider': self.provider,
+        }
+        if self.scraped_at is not None:
+            record['scraped_at'] = self.scraped_at
+        return record
+
+
+def normalize(records, provider: str = None) -> list[dict]:
+    """Normalize raw records: consistent types, parsed Turkish numbers and unlimited markers."""
+    return [Tariff.from_record(record, provider).to_record() for record in records]
+
+
+class TariffColumns:
+    """Tariffs held column-wise: numeric fields in `array('d')` (NaN = unknown),
+    provider and category as small integer codes into a shared label list.
+
+    A row costs a few dozen bytes instead of a dict per tariff, and sorting or
+    filtering walks a single flat array.
+    """
+
+    def __init__(self):
+        self.labels = []
+        self._codes = {}
+        self.provider = array('I')
+        self.category = array('I')
+        self.name = []
+        self.scraped_at = []
+        self.gb = array('d')
+        self.minutes = array('d')
+        self.sms = array('d')
+        self.price = array('d')
+        self.no_commitment_price = array('d')
+
+    @classmethod
+    def from_records(cls, records, provider: str = None) -> "TariffColumns":
+        columns = cls()
+        for record in records:
+            columns.append(Tariff.from_record(record, provider))
+        return columns
+
+    def _code(self, label: str) -> int:
+        code = self._codes.get(label)
+        if code is None:
+            code = self._codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+    def append(self, tariff: Tariff):
+        self.provider.append(self._code(tariff.provider))
+        self.category.append(self._code(tariff.category))
+        self.name.append(tariff.name)
+        self.scraped_at.append(tariff.scraped_at)
+        for field in NUMERIC_FIELDS:
+            value = getattr(tariff, field)
+            getattr(self, field).append(math.nan if value is None else value)
+
+    def __len__(self) -> int:
+        return len(self.name)
+
+    def tariff(self, index: int) -> Tariff:
+        values = {}
+        for field in NUMERIC_FIELDS:
+            value = getattr(self, field)[index]
+            values[field] = None if math.isnan(value) else value
+        return Tariff(
+            provider=self.labels[self.provider[index]],
+            category=self.labels[self.category[index]],
+            name=self.name[index],
+            scraped_at=self.scraped_at[index],
+            **values,
+        )
+
+    def records(self, indexes=None) -> list[dict]:
+        """Rows (all, or the given indexes in order) in the API record shape."""
+        indexes = range(len(self)) if indexes is None else indexes
+        return [self.tariff(i).to_record() for i in indexes]
+
+    def cheapest_by(self, field: str = 'gb') -> dict:
+        """{value: index} of the cheapest priced row for each known, positive value of `field`."""
+        column = self.price
+        best = {}
+        for i, value in enumerate(getattr(self, field)):
+            price = column[i]
+            if math.isnan(value) or value <= 0 or math.isnan(price):
+                continue
+            current = best.get(value)
+            if current is None or price < column[current]:
+                best[value] = i
+        return best
+
+
+
+SORT_KEYS = ('price', 'gb', 'minutes', 'sms', 'no_commitment_price', 'price_per_gb')
+# GB bantlarının üst sınırları; her tarife sığdığı ilk banda düşer
+GB_BANDS = (5, 10, 20, 30, 50, 100, UNLIMITED)
+
+
+class TariffIndex:
+    """Query indexes over the latest snapshot, built once per dataset version.
+
+    Each provider's rows are kept in TariffColumns with the order of every sort
+    key precomputed, so a filtered, sorted page only walks ready-made index lists.
+    """
+
+    def __init__(self, datasets: dict, version=None, bands: tuple = GB_BANDS):
+        self.version = version
+        # Son bant her zaman sınırsız paketleri de kapsar
+        self.bands = tuple(bands) if bands and bands[-1] == UNLIMITED else tuple(bands) + (UNLIMITED,)
+        self.columns = {}
+        self.price_per_gb = {}
+        self.orders = {}
+        for key, records in datasets.items():
+            columns = self.columns[key] = TariffColumns.from_records(records)
+            self.price_per_gb[key] = array('d', (
+                price / gb if 0 < gb < UNLIMITED else math.nan
+                for price, gb in zip(columns.price, columns.gb)
+            ))
+            self.orders[key] = {sort_key: self._order(key, sort_key) for sort_key in SORT_KEYS}
+        self._comparison = self._compare()
+
+    def _column(self, key: str, sort_key: str):
+        if sort_key == 'price_per_gb':
+            return self.price_per_gb[key]
+        return getattr(self.columns[key], sort_key)
+
+    def _order(self, key: str, sort_key: str) -> tuple:
+        """(known indexes in ascending order, indexes with an unknown value)."""
+        column = self._column(key, sort_key)
+        known = [i for i in range(len(column)) if not math.isnan(column[i])]
+        known.sort(key=column.__getitem__)
+        return known, [i for i in range(len(column)) if math.isnan(column[i])]
+
+    def record(self, key: str, index: int) -> dict:
+        """API record of one row, with its provider key and price per GB."""
+        record = self.columns[key].tariff(index).to_record()
+        record['provider_key'] = key
+        per_gb = self.price_per_gb[key][index]
+        record['price_per_gb'] = None if math.isnan(per_gb) else round(per_gb, 2)
+        return record
+
+    def _matches(self, key: str, category: str, gb_range: tuple, price_range: tuple):
+        """Row predicate for one provider; None when the category does not occur there at all."""
+        columns = self.columns[key]
+        code = columns._codes.get(category) if category else None
+        if category and code is None:
+            return None
+        categories, gb, price = columns.category, columns.gb, columns.price
+        gb_low, gb_high = gb_range
+        price_low, price_high = price_range
+
+        def matches(i):
+            if code is not None and categories[i] != code:
+                return False
+            if gb_range != (None, None) and not (
+                    (gb_low is None or gb[i] >= gb_low) and (gb_high is None or gb[i] <= gb_high)):
+                return False
+            return price_range == (None, None) or (
+                (price_low is None or price[i] >= price_low) and (price_high is None or price[i] <= price_high))
+        return matches
+
+    def query(self, providers=None, category: str = None, min_gb: float = None, max_gb: float = None,
+              min_price: float = None, max_price: float = None, sort: str = 'price', descending: bool = False,
+              offset: int = 0, limit: int = 50) -> dict:
+        """One page of matching rows across providers, ordered by `sort` with unknown values last.
+
+        Range filters never match rows whose value is unknown.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Bilinmeyen sıralama anahtarı: {sort}")
+        known, unknown = [], []
+        for key in self.columns:
+            if providers and key not in providers:
+                continue
+            matches = self._matches(key, category, (min_gb, max_gb), (min_price, max_price))
+            if matches is None:
+                continue
+            column = self._column(key, sort)
+            ordered, missing = self.orders[key][sort]
+            known.append([(column[i], key, i) for i in ordered if matches(i)])
+            unknown.extend((key, i) for i in missing if matches(i))
+
+        # Operatör başına hazır sıralı listeler birleştirilir; istek başına sıralama yapılmaz
+        rows = [(key, i) for _, key, i in heapq.merge(*known, key=lambda row: row[0])]
+        if descending:
+            rows.reverse()
+        rows.extend(unknown)
+        return {
+            "total": len(rows),
+            "offset": offset,
+            "limit": limit,
+            "sort": sort,
+            "items": [self.record(key, i) for key, i in rows[offset:offset + limit]],
+        }
+
+    def _band(self, gb: float):
+        for position, bound in enumerate(self.bands):
+            if gb <= bound:
+                return position
+        return None
+
+    def _compare(self) -> list:
+        """Cheapest priced row of each provider per GB band."""
+        best = {}
+        for key, columns in self.columns.items():
+            for i in self.orders[key]['price'][0]:
+                gb = columns.gb[i]
+                if math.isnan(gb) or gb <= 0:
+                    continue
+                band = self._band(gb)
+                # Fiyata göre sıralı dolaşıldığı için banttaki ilk satır en ucuzu
+                if band is not None:
+                    best.setdefault(band, {}).setdefault(key, i)
+        comparison = []
+        for band in sorted(best):
+            low = self.bands[band - 1] if band else 0
+            high = self.bands[band]
+            offers = {key: self.record(key, i) for key, i in best[band].items()}
+            comparison.append({
+                "band": f"{format_amount(float(low))}+ GB" if high == UNLIMITED else
+                        f"{format_amount(float(low))}-{format_amount(float(high))} GB",
+                "min_gb": low,
+                "max_gb": None if high == UNLIMITED else high,
+                "providers": offers,
+                "cheapest": min(offers, key=lambda key: offers[key]['price']),
+            })
+        return comparison
+
+    def compare(self, providers=None) -> list:
+        """Per GB band, the cheapest tariff of each provider and the overall winner."""
+        if not providers:
+            return self._comparison
+        comparison = []
+        for band in self._comparison:
+            offers = {key: record for key, record in band["providers"].items() if key in providers}
+            if offers:
+                comparison.append({**band, "providers": offers,
+                                   "cheapest": min(offers, key=lambda key: offers[key]['price'])})
+        return comparison
+
+    def ranking(self, providers=None, limit: int = 20) -> list:
+        """Tariffs with a known price and a finite GB amount, cheapest per GB first."""
+        ordered = [
+            [(self.price_per_gb[key][i], key, i) for i in self.orders[key]['price_per_gb'][0]]
+            for key in self.columns if not providers or key in providers
+        ]
+        ranked = heapq.merge(*ordered, key=lambda row: row[0])
+        return [self.record(key, i) for _, key, i in islice(ranked, limit)]
+
+
+# Değişiklik olarak raporlanan alanlar; ad ve GB zaten eşleştirme anahtarının parçası
+DIFF_FIELDS = ('price', 'no_commitment_price', 'minutes', 'sms', 'category')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def tariff_key(record: dict, provider_key: str = '') -> str:
+    """Stable match key across runs: provider + case/accent-folded name + parsed GB."""
+    name = WHITESPACE_RE.sub(' ', _fold(str(record.get('name') or ''))).strip()
+    return f"{provider_key}|{name}|{format_amount(parse_number(record.get('gb')))}"
+
+
+def _keyed(records, provider_key: str) -> dict:
+    """{key: record}; repeated keys within one snapshot get a "#2", "#3"... suffix in order."""
+    keyed = {}
+    seen = {}   # temel anahtar -> bu snapshot'ta kaçıncı kez görüldüğü
+    for record in records:
+        base = tariff_key(record, provider_key)
+        n = seen[base] = seen.get(base, 0) + 1
+        keyed[base if n == 1 else f"{base}#{n}"] = record
+    return keyed
+
+
+def diff(previous, current, provider_key: str = '') -> list[dict]:
+    """Added, removed and changed tariffs between two snapshots of one provider, in linear time.
+
+    Records are compared after normalization, so "1.000" and "1000" are not a change.
+    """
+    before = _keyed(normalize(previous), provider_key)
+    after = _keyed(normalize(current), provider_key)
+    changes = []
+    for key, record in after.items():
+        old = before.get(key)
+        if old is None:
+            changes.append({"kind": "added", "key": key, "name": record['name'], "gb": record['gb'],
+                            "old": None, "new": record, "fields": {}})
+            continue
+        fields = {field: [old.get(field), record.get(field)] for field in DIFF_FIELDS
+                  if old.get(field) != record.get(field)}
+        if fields:
+            changes.append({"kind": "changed", "key": key, "name": record['name'], "gb": record['gb'],
+                            "old": old, "new": record, "fields": fields})
+    for key, record in before.items():
+        if key not in after:
+            changes.append({"kind": "removed", "key": key, "name": record['name'], "gb": record['gb'],
+                            "old": record, "new": None, "fields": {}})
+    return changes